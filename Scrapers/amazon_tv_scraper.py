@@ -1,8 +1,18 @@
-import requests, re, random, time
-from bs4 import BeautifulSoup
+import requests, re, random, sys, time
+from parser_backend import make_soup
 from datetime import datetime
 import csv
 import os
+import mysql.connector
+from db_writer import BufferedWriter
+from parse_pool import ParsePipeline, parse_workers_from_env
+from checkpoint import CrawlCheckpoint
+from work_queue import open_queue, run_worker, worker_name
+from extract import (
+    classify, BrandMatcher, AMAZON_RESOLUTION, AMAZON_PANEL,
+    AMAZON_SIZE_INCH_RE, AMAZON_SIZE_CM_RE, AMAZON_ASIN_RE, TITLE_PUNCT_RE,
+    NON_DIGIT_RE, INT_RE, DECIMAL_RE, DISCOUNT_RE, UNAVAILABLE_RE
+)
 
 
 # =========================
@@ -47,20 +57,20 @@ KNOWN_BRANDS = sorted({
 # =========================
 # EXTRACTION HELPERS
 # =========================
+BRAND_MATCHER = BrandMatcher(KNOWN_BRANDS)
+
 def extract_brand(title):
-    text = " " + title.lower() + " "
-    for b in KNOWN_BRANDS:
-        if re.search(rf"\b{re.escape(b.lower())}\b", text):
-            return b
-    return title.split()[0].title() if title else None
+    if not title:
+        return None
+    return BRAND_MATCHER.find(title) or title.split()[0].title()
 
 def extract_screen_size(title):
     if not title:
         return None
-    m = re.search(r"(\d{2,3})\s*(inch|inches|\")", title.lower())
+    m = AMAZON_SIZE_INCH_RE.search(title.lower())
     if m:
         return int(m.group(1))
-    m = re.search(r"(\d{2,3})\s*cm", title.lower())
+    m = AMAZON_SIZE_CM_RE.search(title.lower())
     if m:
         return round(int(m.group(1)) / 2.54)
     return None
@@ -70,43 +80,18 @@ def extract_screen_size(title):
 # =========================
 
 def extract_panel_technology(title):
-    if not title:
-        return None
-    t = title.upper()
-
-    if "MINI LED" in t: return "Mini LED"
-    if "QLED" in t: return "QLED"
-    if "OLED" in t: return "OLED"
-    if "NANOCELL" in t: return "NanoCell"
-    if "ULED" in t: return "ULED"
-    if "CRYSTAL" in t: return "Crystal LED"
-    if "LED" in t: return "LED"
-
-    return None
+    return classify(title, AMAZON_PANEL)
 
 
 def extract_screen_resolution(title):
-    if not title:
-        return None
-    t = title.lower()
-
-    if "8k" in t or "4320p" in t or "7680" in t:
-        return "8K"
-    if "4k" in t or "ultra hd" in t or "uhd" in t or "2160p" in t or "3840" in t:
-        return "4K"
-    if "full hd" in t or "fhd" in t or "1080p" in t:
-        return "Full HD"
-    if re.search(r"\bhd\b", t) or "720p" in t:
-        return "HD"
-
-    return None
+    return classify(title, AMAZON_RESOLUTION)
 
 
 
 def extract_model_id(title):
     if not title:
         return None
-    tokens = re.sub(r"[()\[\],]", " ", title.upper()).split()
+    tokens = TITLE_PUNCT_RE.sub(" ", title.upper()).split()
     for t in tokens[::-1]:
         if any(c.isalpha() for c in t) and any(c.isdigit() for c in t):
             return t
@@ -115,16 +100,15 @@ def extract_model_id(title):
 def extract_asin(url):
     if not url:
         return None
-    m = re.search(r"/dp/([A-Z0-9]{10})", url)
+    m = AMAZON_ASIN_RE.search(url)
     return m.group(1) if m else None
 
 def parse_price(txt):
     try:
-        return int(re.sub(r"\D", "", txt))
+        return int(NON_DIGIT_RE.sub("", txt))
     except:
         return None
 
-scraped_time = datetime.now().replace(second=0, microsecond=0)
 # =========================
 # AMAZON URL (UNCHANGED)
 # =========================
@@ -141,20 +125,126 @@ def get_url(min_p, max_p, page):
     return base_url
 
 # =========================
-# MAIN SCRAPER (NO FILTERS)
+# CARD PARSING
 # =========================
-def scrape_amazon_tv_full():
+CARD_RE = re.compile(r'data-component-type="s-search-result"')
+
+def parse_card(c, scraped_time):
+    title = c.find("h2").get_text(strip=True) if c.find("h2") else None
+    a = c.find("a", href=True)
+    product_url = "https://www.amazon.in" + a["href"].split("?")[0] if a else None
+
+    sp = c.find("span", class_="a-price-whole")
+    op = c.find("span", class_="a-offscreen")
+    disc = c.find("span", string=DISCOUNT_RE)
+    rating_val = c.find("span", class_="a-size-small")
+    rating_cnt = c.find("span", class_="s-underline-text")
+    img = c.find("img", class_="s-image")
+
+    rv = None
+    if rating_val:
+        m = DECIMAL_RE.search(rating_val.text)
+        if m:
+            rv = float(m.group())
+
+    rc = None
+    if rating_cnt:
+        m = INT_RE.search(rating_cnt.text)
+        if m:
+            rc = int(m.group())
+
+    stock_status = "In Stock"
+
+    unavailable = c.find("span", class_="a-size-small", string=UNAVAILABLE_RE)
+    if unavailable:
+        stock_status = "Out of Stock"
+
+    # CSV row without the running "No" column, the writer numbers rows
+    return (
+        "Amazon",
+        extract_asin(product_url),                 # Product ID
+        extract_brand(title),                      # Brand
+        extract_model_id(title),                   # Model ID
+        title,                                     # Full Name
+        extract_panel_technology(title),           # Display Type
+        extract_screen_resolution(title),
+        parse_price(sp.text) if sp else None,      # Sale Price
+        parse_price(op.text) if op else None,      # Original Cost
+        int(NON_DIGIT_RE.sub("",disc.text)) if disc else None,
+        rv,                                        # Rating
+        rc,                                        # rating_count
+        stock_status,
+        scraped_time,
+        product_url,
+        img["src"] if img else None
+    )
+
+def parse_page(html, scraped_time):
+    # Runs inline or inside a parse worker process - returns plain row tuples
+    soup = make_soup(html)
+    cards = soup.find_all("div", {"data-component-type": "s-search-result"})
+    return [parse_card(c, scraped_time) for c in cards]
 
+# =========================
+# CRAWL SETUP
+# =========================
+PRICE_RANGES = [
+    ("5000-24999", 5000, 24999),
+    ("25000-49999", 25000, 49999),
+    ("50000-59999", 50000, 59999),
+    ("60000-69999", 60000, 69999),
+    ("70000-79999", 70000, 79999),
+    ("80000-89999", 80000, 89999),
+    ("90000-99999", 90000, 99999),
+    ("100000-149999", 100000, 149999),
+    ("150000-199999", 150000, 199999),
+    ("200000+", 200000, 999999),
+]
+
+CSV_PATH = "amazon_tvs_final_fixed21.csv"
+
+def get_mysql_connection():
+    return mysql.connector.connect(
+        host="localhost",
+        user="root",
+        password="Kpkr@153",
+        database="colabcloud",
+        autocommit=False
+    )
+
+# Distributed workers write to amazon_tv ( read by etl/amazon_std.py ), same columns as the CSV
+insert_sql = """
+INSERT INTO amazon_tv (
+    platform, product_id, brand, model_id, full_name, display_type, screen_resolution,
+    sale_price, original_cost, discount, rating, rating_count, stock_status,
+    scraped_at, product_url, image_url
+) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+"""
+
+def open_session():
     session = requests.Session()
     session.get("https://www.amazon.in", headers=get_headers(), timeout=30)
     time.sleep(2)
+    return session
+
+def count_pages(session, min_p, max_p):
+    r = session.get(get_url(min_p, max_p, 1), headers=get_headers(), timeout=30)
+    soup = make_soup(r.text)
 
+    return max(
+        [int(s.text) for s in soup.find_all("span", class_="s-pagination-item s-pagination-disabled") if s.text.isdigit()],
+        default=1
+    )
+
+def open_csv(path):
+    """Append to the CSV, returns (file, csv writer, last row number)"""
+    # the running "No" column continues after the rows already in the file
     row_no = 0
-    if os.path.exists("amazon_tvs_final_fixed21.csv"):
-        with open("amazon_tvs_final_fixed21.csv", "r", encoding="utf-8") as f:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
             row_no = max(0, sum(1 for _ in f) - 1)
 
-    file = open("amazon_tvs_final_fixed21.csv", "a", newline="", encoding="utf-8")
+    file = open(path, "a", newline="", encoding="utf-8")
     writer = csv.writer(file)
 
     # write header only once (optional safeguard)
@@ -166,21 +256,37 @@ def scrape_amazon_tv_full():
             "Rating","rating_count","Stock Status",
             "Scraped At","Product URL","Image URL"
         ])
+    return file, writer, row_no
+
+# =========================
+# MAIN SCRAPER (NO FILTERS)
+# =========================
+def scrape_amazon_tv_full():
+
+    # A crashed crawl is resumed - same scraped_at, finished pages and written products are skipped
+    checkpoint = CrawlCheckpoint("amazon")
+    scraped_time = checkpoint.scraped_at
 
+    session = open_session()
 
+    file, writer, row_no = open_csv(CSV_PATH)
 
-    PRICE_RANGES = [
-        ("5000-24999", 5000, 24999),
-        ("25000-49999", 25000, 49999),
-        ("50000-59999", 50000, 59999),
-        ("60000-69999", 60000, 69999),
-        ("70000-79999", 70000, 79999),
-        ("80000-89999", 80000, 89999),
-        ("90000-99999", 90000, 99999),
-        ("100000-149999", 100000, 149999),
-        ("150000-199999", 150000, 199999),
-        ("200000+", 200000, 999999),
-    ]
+    def write_rows(rows):
+        nonlocal row_no
+        # Product ID is the second column, a product already written in this run is skipped
+        rows = checkpoint.new_rows(rows, 1)
+        for row in rows:
+            row_no += 1
+            writer.writerow([row_no, *row])
+        file.flush()
+        # recorded only now that the rows are in the file
+        checkpoint.committed(rows, 1)
+        return len(rows)
+
+    # Pipeline mode (SCRAPER_PARSE_WORKERS=n) - parsing runs in n worker processes
+    # while this loop keeps fetching, write_rows stays the only CSV writer
+    workers = parse_workers_from_env()
+    pipeline = ParsePipeline(parse_page, write_rows, workers=workers) if workers else None
 
     grand_total = 0
 
@@ -189,83 +295,35 @@ def scrape_amazon_tv_full():
         print(f"\nPRICE RANGE: {label}")
         range_total = 0
 
-        r = session.get(get_url(min_p, max_p, 1), headers=get_headers(), timeout=30)
-        soup = BeautifulSoup(r.text, "lxml")
-
-        pages = max(
-            [int(s.text) for s in soup.find_all("span", class_="s-pagination-item s-pagination-disabled") if s.text.isdigit()],
-            default=1
-        )
+        # the page count of a range is only fetched once per run
+        done = checkpoint.done_pages(label)
+        pages = checkpoint.planned_pages(label)
+        if not pages:
+            pages = count_pages(session, min_p, max_p)
+            checkpoint.add_units((label, page) for page in range(1, pages + 1))
 
-        print(f"   Total Pages: {pages}")
+        print(f"   Total Pages: {pages}  ( {len(done)} done earlier )")
 
         for page in range(1, pages + 1):
 
+            if page in done:
+                continue
+
             r = session.get(get_url(min_p, max_p, page), headers=get_headers(), timeout=30)
-            soup = BeautifulSoup(r.text, "lxml")
-
-            cards = soup.find_all("div", {"data-component-type": "s-search-result"})
-            print(f"   Page {page}: {len(cards)} products found")
-
-            page_count = 0
-
-            for c in cards:
-                title = c.find("h2").get_text(strip=True) if c.find("h2") else None
-                a = c.find("a", href=True)
-                product_url = "https://www.amazon.in" + a["href"].split("?")[0] if a else None
-
-                sp = c.find("span", class_="a-price-whole")
-                op = c.find("span", class_="a-offscreen")
-                disc = c.find("span", string=re.compile("% off"))
-                rating_val = c.find("span", class_="a-size-small")
-                rating_cnt = c.find("span", class_="s-underline-text")
-                img = c.find("img", class_="s-image")
-
-                rv = None
-                if rating_val:
-                    m = re.search(r"\d+(\.\d+)?", rating_val.text)
-                    if m:
-                        rv = float(m.group())
-
-                rc = None
-                if rating_cnt:
-                    m = re.search(r"\d+", rating_cnt.text)
-                    if m:
-                        rc = int(m.group())
-                
-                stock_status = "In Stock"
-
-                unavailable = c.find("span", class_="a-size-small", string=re.compile("unavailable", re.I))
-                if unavailable:
-                    stock_status = "Out of Stock"
-
-
-                row_no += 1
-                
-                writer.writerow([
-                    row_no,
-                    "Amazon",
-                    extract_asin(product_url),                 # Product ID
-                    extract_brand(title),                      # Brand
-                    extract_model_id(title),                   # Model ID
-                    title,                                     # Full Name
-                    extract_panel_technology(title),           # Display Type
-                    extract_screen_resolution(title),
-                    parse_price(sp.text) if sp else None,      # Sale Price
-                    parse_price(op.text) if op else None,      # Original Cost
-                    int(re.sub(r"\D","",disc.text)) if disc else None,
-                    rv,                                        # Rating
-                    rc,                                        # rating_count
-                    stock_status,
-                    scraped_time,
-                    product_url,
-                    img["src"] if img else None
-                ])
-                file.flush()
-
-                
-
-                page_count += 1
+
+            cards_count = len(CARD_RE.findall(r.text))
+            print(f"   Page {page}: {cards_count} products found")
+
+            # a page is marked done once its rows are in the file, a restart skips it
+            if pipeline:
+                pipeline.submit(
+                    r.text, scraped_time,
+                    after=lambda rows, label=label, page=page: checkpoint.mark_done(label, page, len(rows))
+                )
+                page_count = cards_count
+            else:
+                page_count = write_rows(parse_page(r.text, scraped_time))
+                checkpoint.mark_done(label, page, page_count)
 
             print(f"      Inserted: {page_count}")
             range_total += page_count
@@ -273,7 +331,12 @@ def scrape_amazon_tv_full():
 
         print(f"   TOTAL FOR RANGE {label}: {range_total}")
         grand_total += range_total
+
+    if pipeline:
+        pipeline.close()
     file.close()
+    checkpoint.finish()
+    checkpoint.close()
 
     
 
@@ -281,8 +344,72 @@ def scrape_amazon_tv_full():
     print(f"GRAND TOTAL SCRAPED: {grand_total}")
     print("==============================")
 
+# =========================
+# DISTRIBUTED CRAWL (work_queue.py)
+# =========================
+def plan(queue):
+    # Planner - count the pages of every price range and queue one unit per page
+    scraped_time = datetime.now().replace(second=0, microsecond=0)
+    session = open_session()
+
+    units = []
+    for label, min_p, max_p in PRICE_RANGES:
+        pages = count_pages(session, min_p, max_p)
+        print(f"{label}: {pages} pages")
+        units += [
+            (f"{label}:{page}", {"label": label, "min_p": min_p, "max_p": max_p, "page": page, "scraped_at": scraped_time})
+            for page in range(1, pages + 1)
+        ]
+        time.sleep(1)
+
+    queued = queue.enqueue(units)
+    print(f"Queued {queued} pages of {len(PRICE_RANGES)} price ranges")
+    return queued
+
+WORKER_BATCH = int(os.getenv("AMAZON_WORKER_BATCH", "4"))   # pages leased at once
+
+def work(queue):
+    # Worker - rows go to amazon_tv through the buffered writer like the Flipkart
+    # and Croma workers, the units are completed once their rows are committed
+    worker = worker_name()
+    session = open_session()
+    conn = get_mysql_connection()
+
+    with BufferedWriter(conn, insert_sql, batch_size=250) as writer:
+
+        def handle(tasks):
+            done = {}
+            for task in tasks:
+                unit = task.payload
+                r = session.get(get_url(unit["min_p"], unit["max_p"], unit["page"]), headers=get_headers(), timeout=30)
+                if r.status_code != 200:
+                    continue
+                rows = parse_page(r.text, datetime.fromisoformat(unit["scraped_at"]))
+                writer.add_many(rows)
+                done[task.id] = len(rows)
+                print(f"   {worker} {task.unit}: {len(rows)} products")
+                time.sleep(1)
+            writer.flush()
+            return done
+
+        pages = run_worker(queue, handle, batch=WORKER_BATCH, worker=worker)
+
+    conn.close()
+    print(f"Pages done by this worker: {pages}  Rows written: {writer.written}")
+
 # =========================
 # RUN
 # =========================
 if __name__ == "__main__":
-    scrape_amazon_tv_full()
\ No newline at end of file
+    # plan / work - distributed crawl through the work queue, any number of workers on any host
+    if len(sys.argv) > 1 and sys.argv[1] in ("plan", "work"):
+        crawl_queue = open_queue("amazon", get_mysql_connection)
+        if sys.argv[1] == "plan":
+            crawl_queue.clear()
+            plan(crawl_queue)
+        else:
+            work(crawl_queue)
+        print(f"Queue: {crawl_queue.counts()}")
+        crawl_queue.close()
+    else:
+        scrape_amazon_tv_full()
\ No newline at end of file
@@ -0,0 +1,167 @@
+'''
+Micro benchmark for the shared extraction layer ( extract.py )
+
+Runs the old per-card code ( regexes built / looked up on every call, one
+pattern per brand ) and the new precompiled code over the same cards and
+prints the per-card time of both. The outputs are compared as well, so the
+benchmark doubles as a check that nothing changed.
+
+Usage:
+    python bench_extract.py                       # built-in sample cards
+    python bench_extract.py saved_pages/*.html    # recorded Flipkart / Amazon listing pages
+'''
+
+import re, sys, time
+
+import amazon_tv_scraper as amazon
+import croma_tv_scraper as croma
+from extract import classify, FLIPKART_RESOLUTION, FLIPKART_PANEL
+
+SAMPLE_TITLES = [
+    "Samsung 108 cm (43 inches) Crystal 4K Vista Ultra HD Smart LED TV UA43CUE60AKLXL (Black)",
+    "LG 139 cm (55 inches) 4K Ultra HD Smart OLED TV OLED55C3PSA (Black)",
+    "Sony Bravia 164 cm (65 inches) XR Series 4K Ultra HD Smart Mini LED Google TV XR-65X95L",
+    "Acerpure 80 cm (32 inches) HD Ready Smart LED Google TV AP32HG1 (Black)",
+    "Redmi Xiaomi 80 cm (32 inches) F Series HD Ready Smart LED Fire TV L32MA-FVIN",
+    "TCL 126 cm (50 inches) Metallic Bezel-Less Series 4K Ultra HD Smart QLED Google TV 50C61B",
+    "Black & Decker 60 cm (24 inches) HD Ready LED TV BXTV24HD",
+    "Amazon Fire TV 108 cm (43 inches) 4-Series 4K Ultra HD Smart LED TV",
+    "VW 100 cm (40 inches) Frameless Series Full HD Android Smart LED TV VW40F1",
+    "Micromax 81 cm (32 inches) HD Ready LED TV 32T7260HD",
+]
+
+SAMPLE_SPECS = [
+    "Model ID: UA43CUE60AKLXL", "Launch Year: 2023", "Operating System: Tizen",
+    "Ultra HD (4K) 3840 x 2160 Pixels", "Total Sound Output: 20 W",
+    "1 Year Warranty on Product and 1 Year Additional on Panel", "Neo QLED Display",
+    "HD Ready 1366 x 768 Pixels", "Full HD 1920 x 1080 Pixels", "Mini LED Backlight",
+]
+
+
+# =========================
+# OLD CODE ( as it was before extract.py )
+# =========================
+def old_extract_brand(title):
+    text = " " + title.lower() + " "
+    for b in amazon.KNOWN_BRANDS:
+        if re.search(rf"\b{re.escape(b.lower())}\b", text):
+            return b
+    return title.split()[0].title() if title else None
+
+def old_amazon_resolution(title):
+    t = title.lower()
+    if "8k" in t or "4320p" in t or "7680" in t:
+        return "8K"
+    if "4k" in t or "ultra hd" in t or "uhd" in t or "2160p" in t or "3840" in t:
+        return "4K"
+    if "full hd" in t or "fhd" in t or "1080p" in t:
+        return "Full HD"
+    if re.search(r"\bhd\b", t) or "720p" in t:
+        return "HD"
+    return None
+
+def old_croma_panel(text):
+    t = text.upper()
+    for pattern, label in [
+        (r"MINI\s*LED", "Mini LED"), (r"QNED", "QNED"), (r"QLED", "QLED"),
+        (r"OLED", "OLED"), (r"NANOCELL", "NanoCell"), (r"\bLED\b", "LED"),
+    ]:
+        if re.search(pattern, t):
+            return label
+    return "Unknown"
+
+def old_flipkart_spec(txt, screen_resolution=None, panel_technology=None):
+    re.search(r"Model\s*ID[:\s]*(.+)", txt, re.I)
+    re.search(r"\b(19|20)\d{2}\b", txt)
+    if re.search(r"HD\s*Ready", txt, re.I):
+        screen_resolution = "HD"
+    elif re.search(r"Full\s*HD", txt, re.I):
+        screen_resolution = "Full HD"
+    elif re.search(r"Ultra\s*HD|\b4K\b", txt, re.I):
+        screen_resolution = "4K"
+    elif re.search(r"\b8K\b", txt, re.I):
+        screen_resolution = "8K"
+    if re.search(r"Mini\s*LED", txt, re.I):
+        panel_technology = "Mini LED"
+    elif re.search(r"Neo\s*QLED", txt, re.I):
+        panel_technology = "Neo QLED"
+    elif re.search(r"\bQLED\b", txt, re.I):
+        panel_technology = "QLED"
+    elif re.search(r"\bOLED\b", txt, re.I):
+        panel_technology = "OLED"
+    elif re.search(r"Nano\s*Cell", txt, re.I):
+        panel_technology = "NanoCell"
+    elif re.search(r"\bLED\b", txt, re.I):
+        panel_technology = "LED"
+    re.search(r"Total\s*Sound\s*Output[:\s]*(.+)", txt, re.I)
+    re.search(r"Warranty", txt, re.I)
+    return screen_resolution, panel_technology
+
+
+# =========================
+# NEW CODE
+# =========================
+def new_flipkart_spec(txt, screen_resolution=None, panel_technology=None):
+    from extract import MODEL_ID_RE, YEAR_RE, SOUND_RE, WARRANTY_RE
+    MODEL_ID_RE.search(txt)
+    YEAR_RE.search(txt)
+    screen_resolution = classify(txt, FLIPKART_RESOLUTION, screen_resolution)
+    panel_technology = classify(txt, FLIPKART_PANEL, panel_technology)
+    SOUND_RE.search(txt)
+    WARRANTY_RE.search(txt)
+    return screen_resolution, panel_technology
+
+
+def old_card(title, specs):
+    out = [old_extract_brand(title), old_amazon_resolution(title), old_croma_panel(title)]
+    out += [old_flipkart_spec(txt) for txt in specs]
+    return out
+
+def new_card(title, specs):
+    out = [amazon.extract_brand(title), amazon.extract_screen_resolution(title), croma.extract_panel_type(title)]
+    out += [new_flipkart_spec(txt) for txt in specs]
+    return out
+
+
+def load_cards(paths):
+    # Titles and spec lines from recorded listing pages ( parsed once, not timed )
+    from bs4 import BeautifulSoup
+    cards = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "lxml")
+        for tv in soup.find_all("div", class_="nZIRY7"):
+            title = tv.find("div", class_="RG5Slk")
+            specs = [li.get_text(strip=True) for li in tv.select("div.CMXw7N li")]
+            if title:
+                cards.append((title.get_text(strip=True), specs))
+        for c in soup.find_all("div", {"data-component-type": "s-search-result"}):
+            if c.find("h2"):
+                cards.append((c.find("h2").get_text(strip=True), []))
+    return cards
+
+
+def run(func, cards, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for title, specs in cards:
+            func(title, specs)
+    return (time.perf_counter() - start) / (rounds * len(cards))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        cards = load_cards(sys.argv[1:])
+    else:
+        cards = [(t, SAMPLE_SPECS) for t in SAMPLE_TITLES]
+
+    mismatches = sum(old_card(t, s) != new_card(t, s) for t, s in cards)
+    rounds = max(1, 20000 // len(cards))
+
+    old = run(old_card, cards, rounds)
+    new = run(new_card, cards, rounds)
+
+    print(f"Cards: {len(cards)}  Rounds: {rounds}  Output mismatches: {mismatches}")
+    print(f"Old extraction: {old * 1e6:8.1f} us / card")
+    print(f"New extraction: {new * 1e6:8.1f} us / card")
+    print(f"Speedup:        {old / new:8.2f} x")
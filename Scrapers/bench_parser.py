@@ -0,0 +1,65 @@
+'''
+Parser backend benchmark - BeautifulSoup vs lxml ( parser_backend.py )
+
+Every backend runs in its own child process, so the peak RSS of one does not
+hide the other. The child parses the saved pages with the scraper's own
+parse function ( all extract_* helpers included ) and reports pages / second
+and peak RSS.
+
+Usage:
+    python bench_parser.py flipkart saved_pages/flipkart_*.html
+    python bench_parser.py amazon saved_pages/amazon_*.html
+    python bench_parser.py croma saved_pages/croma_listing.html
+'''
+
+import os, resource, subprocess, sys, time
+from datetime import datetime
+
+BACKENDS = [ "bs4", "lxml" ]
+ROUNDS = 5
+
+
+def parse_function( site ):
+    if site == "flipkart":
+        import flipkart_tv_scraper
+        return lambda html: flipkart_tv_scraper.parse_page( html, datetime.now() )
+    if site == "amazon":
+        import amazon_tv_scraper
+        return lambda html: amazon_tv_scraper.parse_page( html, datetime.now() )
+    if site == "croma":
+        import croma_tv_scraper
+        return croma_tv_scraper.parse_listing
+    raise SystemExit( f"Unknown site: {site}" )
+
+
+def child( site, paths ):
+    parse = parse_function( site )
+    pages = []
+    for path in paths:
+        with open( path, encoding = "utf-8" ) as f:
+            pages.append( f.read() )
+
+    rows = 0
+    start = time.perf_counter()
+    for _ in range( ROUNDS ):
+        for html in pages:
+            rows += len( parse( html ))
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KB on linux
+    peak_mb = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024
+    print( f"{ os.environ[ 'SCRAPER_PARSER' ]:6} { ROUNDS * len( pages ) / elapsed:10.1f} pages/s "
+           f"{ peak_mb:10.1f} MB peak RSS { rows // ROUNDS:8} rows" )
+
+
+if __name__ == "__main__":
+    if len( sys.argv ) < 3:
+        raise SystemExit( __doc__ )
+
+    if os.getenv( "BENCH_CHILD" ):
+        child( sys.argv[1], sys.argv[2:] )
+    else:
+        print( f"backend    pages/s        peak RSS        rows" )
+        for backend in BACKENDS:
+            env = { **os.environ, "SCRAPER_PARSER": backend, "BENCH_CHILD": "1" }
+            subprocess.run([ sys.executable, __file__, *sys.argv[1:] ], env = env, check = True )
@@ -0,0 +1,115 @@
+'''
+Work queue scaling benchmark - 1, 2, 4 ... Flipkart workers against a fixture server
+
+1. A local HTTP server answers every listing URL with one of the saved pages,
+   after FIXTURE_LATENCY seconds ( default 0.2 ), like a slow remote site
+2. For every worker count a fresh SQLite queue ( work_queue.py ) gets the
+   same units - price range x page - and that many worker processes run
+   flipkart_tv_scraper.work() until it is empty
+3. Rows are counted instead of written, so only fetch + parse + queue is timed
+
+Every worker keeps its own politeness bucket ( FLIPKART_WORKER_RATE, set to
+BENCH_RATE here ), so with enough server threads pages/s should grow linearly
+with the workers.
+
+Usage:
+    python bench_work_queue.py saved_pages/flipkart_*.html
+    BENCH_PAGES=400 BENCH_WORKERS=1,2,4,8 python bench_work_queue.py saved_pages/flipkart_*.html
+'''
+
+import asyncio, os, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGES = int( os.getenv( "BENCH_PAGES", "200" ))
+WORKERS = [ int( n ) for n in os.getenv( "BENCH_WORKERS", "1,2,4,8" ).split( "," ) ]
+LATENCY = float( os.getenv( "FIXTURE_LATENCY", "0.2" ))
+RATE = os.getenv( "BENCH_RATE", "4" )
+
+
+def fixture_server( paths ):
+    pages = []
+    for path in paths:
+        with open( path, "rb" ) as f:
+            pages.append( f.read() )
+
+    class Handler( BaseHTTPRequestHandler ):
+
+        def do_GET( self ):
+            time.sleep( LATENCY )
+            body = pages[ hash( self.path ) % len( pages ) ]
+            self.send_response( 200 )
+            self.send_header( "Content-Type", "text/html; charset=utf-8" )
+            self.send_header( "Content-Length", str( len( body )))
+            self.end_headers()
+            self.wfile.write( body )
+
+        def log_message( self, *args ):
+            pass
+
+    server = ThreadingHTTPServer(( "127.0.0.1", 0 ), Handler )
+    server.daemon_threads = True
+    threading.Thread( target = server.serve_forever, daemon = True ).start()
+    return server
+
+
+def child():
+    import flipkart_tv_scraper
+    from work_queue import SqliteWorkQueue
+
+    queue = SqliteWorkQueue( "flipkart", path = os.environ[ "CRAWL_QUEUE_PATH" ] )
+    rows = []
+    asyncio.run( flipkart_tv_scraper.work( queue, rows.extend ))
+    print( len( rows ))
+
+
+def plan( path ):
+    from work_queue import SqliteWorkQueue
+
+    queue = SqliteWorkQueue( "flipkart", path = path )
+    # total_pages = page, so no page is expected to hold exactly 24 cards
+    queue.enqueue(
+        ( f"bench:{page}", { "lable": "bench", "min_p": 0, "max_p": page, "page": page, "total_pages": page, "scraped_at": "2026-01-01 00:00:00" })
+        for page in range( 1, PAGES + 1 )
+    )
+    queue.close()
+
+
+if __name__ == "__main__":
+    if os.getenv( "BENCH_CHILD" ):
+        child()
+        sys.exit()
+
+    if len( sys.argv ) < 2:
+        raise SystemExit( __doc__ )
+
+    server = fixture_server( sys.argv[1:] )
+    base = f"http://127.0.0.1:{ server.server_address[1] }"
+    print( f"{ PAGES } pages, { LATENCY }s latency, { RATE } req/s per worker" )
+    print( f"workers    seconds     pages/s    speedup       rows" )
+
+    first = None
+    for workers in WORKERS:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join( tmp, "queue.sqlite" )
+            plan( path )
+            env = {
+                **os.environ, "BENCH_CHILD": "1", "CRAWL_QUEUE_PATH": path,
+                "FLIPKART_BASE_URL": base, "FLIPKART_WORKER_RATE": RATE,
+            }
+
+            start = time.perf_counter()
+            procs = [
+                subprocess.Popen([ sys.executable, __file__ ], env = env, stdout = subprocess.PIPE, text = True )
+                for _ in range( workers )
+            ]
+            rows = 0
+            for proc in procs:
+                out, _ = proc.communicate()
+                rows += int( out.strip().splitlines()[ -1 ] )
+            elapsed = time.perf_counter() - start
+
+        pages_per_second = PAGES / elapsed
+        first = first or pages_per_second
+        print( f"{ workers:7} { elapsed:10.1f} { pages_per_second:11.1f} { pages_per_second / first:9.2f}x { rows:10}" )
+
+    server.shutdown()
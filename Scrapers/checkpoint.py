@@ -0,0 +1,241 @@
+'''
+Resumable crawl checkpoints shared by the scrapers
+
+1. Every crawl is a run ( scraper + run_id ) in a small local SQLite file.
+   A run that did not finish is picked up again by the next start of the
+   same scraper, with the same scraped_at, so the resumed rows belong to the
+   same snapshot
+2. The work of a run is split in units - ( price range, page ) for the
+   listing scrapers. A unit is marked done once its rows are committed, a
+   restarted crawl skips the units that are done
+3. The stored product ids of a run are kept too, a row of a product that is
+   already stored is not written twice ( pages overlap while prices move,
+   Croma deep scrapes one product at a time )
+4. Rows sit in the parse pool and the writer's buffer for a while. Products
+   and units handed to the writer stay pending in memory until the writer
+   reports the commit with their rows ( committed(), BufferedWriter's
+   on_flush ), a crash before that writes them again after the restart
+5. Small values of a run can be saved as JSON ( the collected Croma
+   listings ), so a restart does not have to collect them again
+
+Several worker processes sharing one crawl use the work queue
+( work_queue.py ) instead.
+
+CRAWL_RESUME=0 always starts a new run.
+'''
+
+import json, os, sqlite3, threading, uuid
+from datetime import datetime
+
+RESUME = os.getenv( "CRAWL_RESUME", "1" ) == "1"
+
+
+class CrawlCheckpoint:
+
+    def __init__( self, scraper, path = "crawl_checkpoint.sqlite", run_id = None, resume = RESUME, scraped_at = None ):
+        self.scraper = scraper
+        self.lock = threading.Lock()
+        # handed to the writer, recorded once the writer committed their rows
+        self.pending_products = set()
+        self.written_units = []
+        self.conn = sqlite3.connect( path, check_same_thread = False, timeout = 30 )
+        self.conn.executescript( """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id      TEXT PRIMARY KEY,
+                scraper     TEXT NOT NULL,
+                scraped_at  TEXT NOT NULL,
+                started_at  TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS units (
+                run_id     TEXT NOT NULL,
+                unit       TEXT NOT NULL,
+                page       INTEGER NOT NULL,
+                status     TEXT NOT NULL DEFAULT 'pending',
+                rows       INTEGER,
+                PRIMARY KEY ( run_id, unit, page )
+            );
+            CREATE TABLE IF NOT EXISTS products (
+                run_id     TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                PRIMARY KEY ( run_id, product_id )
+            );
+            CREATE TABLE IF NOT EXISTS run_values (
+                run_id TEXT NOT NULL,
+                key    TEXT NOT NULL,
+                value  TEXT NOT NULL,
+                PRIMARY KEY ( run_id, key )
+            );
+        """ )
+
+        run = None
+        if run_id:
+            run = self.conn.execute( "SELECT run_id, scraped_at FROM runs WHERE run_id = ?", ( run_id, )).fetchone()
+        elif resume:
+            run = self.conn.execute(
+                "SELECT run_id, scraped_at FROM runs WHERE scraper = ? AND finished_at IS NULL "
+                "ORDER BY started_at DESC LIMIT 1",
+                ( scraper, )
+            ).fetchone()
+
+        if run:
+            self.run_id, scraped = run
+            self.scraped_at = datetime.fromisoformat( scraped )
+            self.resumed = True
+            print( f"Resuming crawl {self.run_id} ( {len( self.done_units() )} units done )" )
+        else:
+            self.run_id = run_id or f"{ scraper }-{ datetime.now():%Y%m%d%H%M%S}-{ uuid.uuid4().hex[ :6 ] }"
+            self.scraped_at = scraped_at or datetime.now().replace( second = 0, microsecond = 0 )
+            self.resumed = False
+            self.conn.execute(
+                "INSERT INTO runs ( run_id, scraper, scraped_at, started_at ) VALUES ( ?, ?, ?, ? )",
+                ( self.run_id, scraper, self.scraped_at.isoformat( sep = " " ), datetime.now().isoformat( sep = " " ))
+            )
+        self.conn.commit()
+
+    # ---------------- units ----------------
+
+    def add_units( self, units ):
+        """Plan units ( ( unit, page ) pairs ), units that are already known keep their state"""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO units ( run_id, unit, page ) VALUES ( ?, ?, ? )",
+                [ ( self.run_id, unit, page ) for unit, page in units ]
+            )
+            self.conn.commit()
+
+    def planned_pages( self, unit ):
+        """Pages planned for a unit, 0 when it was never planned"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM units WHERE run_id = ? AND unit = ?", ( self.run_id, unit )
+            ).fetchone()[0]
+
+    def done_pages( self, unit ):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT page FROM units WHERE run_id = ? AND unit = ? AND status = 'done'", ( self.run_id, unit )
+            )
+            return { page for page, in rows }
+
+    def done_units( self ):
+        with self.lock:
+            rows = self.conn.execute( "SELECT unit, page FROM units WHERE run_id = ? AND status = 'done'", ( self.run_id, ))
+            return set( rows )
+
+    def pending_units( self ):
+        """Planned units that are not done yet"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM units WHERE run_id = ? AND status != 'done'", ( self.run_id, )
+            ).fetchone()[0]
+
+    def mark_done( self, unit, page, rows = None ):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO units ( run_id, unit, page, status, rows ) VALUES ( ?, ?, ?, 'done', ? ) "
+                "ON CONFLICT ( run_id, unit, page ) DO UPDATE SET status = 'done', rows = excluded.rows",
+                ( self.run_id, unit, page, rows )
+            )
+            self.conn.commit()
+
+    def unit_written( self, unit, page, rows = None ):
+        """Every row of the unit is with the writer, it is marked done with the writer's next commit"""
+        with self.lock:
+            self.written_units.append(( unit, page, rows ))
+
+    # ---------------- products ----------------
+
+    def seen_products( self, product_ids ):
+        """The given product ids that were already parsed in this run"""
+        ids = [ pid for pid in product_ids if pid ]
+        found = set()
+        with self.lock:
+            # stay below SQLite's bound parameter limit
+            for i in range( 0, len( ids ), 500 ):
+                chunk = ids[ i:i + 500 ]
+                rows = self.conn.execute(
+                    f"SELECT product_id FROM products "
+                    f"WHERE run_id = ? AND product_id IN ({ ','.join( '?' * len( chunk )) })",
+                    [ self.run_id, *chunk ]
+                )
+                found.update( pid for pid, in rows )
+        return found
+
+    def new_rows( self, rows, pid_index ):
+        """
+        Rows whose product was neither stored nor handed to a writer in this
+        run yet. Their ids stay pending until committed() records them
+        """
+        rows = list( rows )
+        seen = self.seen_products( row[ pid_index ] for row in rows )
+        fresh = []
+        with self.lock:
+            for row in rows:
+                pid = row[ pid_index ]
+                if pid and ( pid in seen or pid in self.pending_products ):
+                    continue
+                if pid:
+                    self.pending_products.add( pid )
+                fresh.append( row )
+        return fresh
+
+    def committed( self, rows, pid_index ):
+        """
+        The writer committed `rows` ( BufferedWriter on_flush ) - record their
+        products, and mark done the units handed to the writer before this
+        commit, their rows were all in it
+        """
+        ids = { row[ pid_index ] for row in rows if row[ pid_index ] }
+        with self.lock:
+            units, self.written_units = self.written_units, []
+            self.pending_products -= ids
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO products VALUES ( ?, ? )",
+                [ ( self.run_id, pid ) for pid in ids ]
+            )
+            self.conn.executemany(
+                "INSERT INTO units ( run_id, unit, page, status, rows ) VALUES ( ?, ?, ?, 'done', ? ) "
+                "ON CONFLICT ( run_id, unit, page ) DO UPDATE SET status = 'done', rows = excluded.rows",
+                [ ( self.run_id, unit, page, count ) for unit, page, count in units ]
+            )
+            self.conn.commit()
+
+    # ---------------- run values ----------------
+
+    def save( self, key, value ):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO run_values VALUES ( ?, ?, ? )",
+                ( self.run_id, key, json.dumps( value, default = str ))
+            )
+            self.conn.commit()
+
+    def load( self, key, default = None ):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM run_values WHERE run_id = ? AND key = ?", ( self.run_id, key )
+            ).fetchone()
+        return json.loads( row[0] ) if row else default
+
+    # ---------------- run ----------------
+
+    def finish( self ):
+        """
+        Close the run when every planned unit is done - the next start begins
+        a new run. Returns False ( run stays open to resume ) otherwise.
+        """
+        pending = self.pending_units()
+        if pending:
+            print( f"Crawl {self.run_id} has {pending} units left, the next start resumes it" )
+            return False
+        with self.lock:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                ( datetime.now().isoformat( sep = " " ), self.run_id )
+            )
+            self.conn.commit()
+        return True
+
+    def close( self ):
+        self.conn.close()
@@ -1,6 +1,10 @@
+import os
+import queue
+import sys
 import time
-import re
 import pymysql
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -8,8 +12,15 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from parser_backend import make_soup
+from parse_pool import ParsePipeline, parse_workers_from_env
+from db_writer import BufferedWriter
+from model_cache import ModelNumberCache
+from checkpoint import CrawlCheckpoint
+from work_queue import open_queue, run_worker
+from extract import classify, CROMA_RESOLUTION, CROMA_PANEL, CROMA_PID_RE, CROMA_MODEL_LABEL_RE
 
 # ---------------- DB CONFIG ----------------
 DB_CONFIG = {
@@ -19,13 +30,20 @@ DB_CONFIG = {
     "database": "colabcloud"
 }
 
-
+# ---------------- DEEP SCRAPE CONFIG ----------------
+DRIVER_POOL_SIZE = int(os.getenv("CROMA_DRIVERS", "4"))   # parallel product page workers
+DETAIL_WAIT = 10                                          # max seconds to wait for a product page
+COMMIT_EVERY = 30                                         # rows per commit for every worker
+MODEL_CACHE_TTL_DAYS = float(os.getenv("CROMA_MODEL_TTL_DAYS", "7"))  # re-verify cached model numbers after this
 
 scraped_time = datetime.now().replace(second=0, microsecond=0)
 
 # ---------------- DRIVER -------------------
-def get_driver():
+def get_driver(headless=False):
     options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
     options.add_argument("--start-maximized")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -38,13 +56,46 @@ def get_driver():
         options=options
     )
 
+class DriverPool:
+    """Long lived headless drivers shared by the deep scrape workers"""
+
+    def __init__(self, size):
+        self.size = size
+        self.drivers = queue.Queue()
+        for _ in range(size):
+            self.drivers.put(get_driver(headless=True))
+
+    @contextmanager
+    def driver(self):
+        driver = self.drivers.get()
+        try:
+            yield driver
+        finally:
+            self.drivers.put(driver)
+
+    def close(self):
+        while not self.drivers.empty():
+            self.drivers.get_nowait().quit()
+
+
+def load_product_page(driver, url):
+    # Explicit wait - continue as soon as the spec table is there, not after a fixed sleep
+    driver.get(url)
+    try:
+        WebDriverWait(driver, DETAIL_WAIT).until(
+            EC.presence_of_element_located((By.XPATH, "//h4[contains(text(),'Model Number')]"))
+        )
+    except TimeoutException:
+        pass
+    return driver.page_source
+
 # ---------------- COLLECTION -----------------
 def collect_listings():
     driver = get_driver()
     driver.get("https://www.croma.com/televisions-accessories/televisions/c/997")
     wait = WebDriverWait(driver, 15)
 
-    print(f"Starting Scrape at: {SCRAPE_TIME_STR}")
+    print(f"Starting Scrape at: {scraped_time}")
     print("Collecting product listings...")
     
     for _ in range(30): 
@@ -56,78 +107,36 @@ def collect_listings():
         except:
             break
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+    html = driver.page_source
     driver.quit()
 
-    items = soup.find_all("li", class_="product-item")
+    items = parse_listing(html)
     print("-" * 30)
     print(f"TOTAL PRODUCTS EXTRACTED: {len(items)}")
     print("-" * 30)
     return items
 
 def extract_screen_resolution(text):
-    if not text:
-        return "Unknown"
-
-    t = text.upper()
-
-    if re.search(r"\b8K\b", t):
-        return "8K"
-    if re.search(r"ULTRA\s*HD|\b4K\b", t):
-        return "4K"
-    if re.search(r"FULL\s*HD", t):
-        return "Full HD"
-    if re.search(r"HD\s*READY|\bHD\b", t):
-        return "HD"
-
-    return "Unknown"
+    return classify(text, CROMA_RESOLUTION, "Unknown")
 
 
 def extract_panel_type(text):
-    if not text:
-        return "Unknown"
+    return classify(text, CROMA_PANEL, "Unknown")
 
-    t = text.upper()
-
-    if re.search(r"MINI\s*LED", t):
-        return "Mini LED"
-    if re.search(r"QNED", t):
-        return "QNED"
-    if re.search(r"QLED", t):
-        return "QLED"
-    if re.search(r"OLED", t):
-        return "OLED"
-    if re.search(r"NANOCELL", t):
-        return "NanoCell"
-    if re.search(r"\bLED\b", t):
-        return "LED"
-
-    return "Unknown"
-
-
-
-# ---------------- PROCESSING -----------------
-def stage_products(items):
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    driver = get_driver()
 
 
-    insert_sql = """
-    INSERT INTO croma_stg 
-    (product_id, platform, brand, model_number, full_name, display_type, 
-     sale_price, original_cost, discount, rating, stock_status, 
-     product_url, image_url, scraped_at, panel_type) 
-    VALUES (%s, 'Croma', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
-
-    for idx, item in enumerate(items, start=1):
+# ---------------- PARSING -----------------
+def parse_listing(html):
+    """Listing page -> plain tuples, safe to send to parse worker processes"""
+    soup = make_soup(html, features="html.parser")
+    listings = []
+    for idx, item in enumerate(soup.find_all("li", class_="product-item"), start=1):
         try:
             link = item.find("a", href=True)
             if not link: continue
             
             product_url = "https://www.croma.com" + link["href"]
-            product_id = re.search(r"/p/(\d+)", product_url).group(1)
+            product_id = CROMA_PID_RE.search(product_url).group(1)
 
             full_name = item.find("h3").text.strip()
             brand = full_name.split()[0]
@@ -147,46 +156,236 @@ def stage_products(items):
             img = item.find("img")
             image_url = img.get("data-src") or img.get("src") if img else "N/A"
 
-            # DEEP SCRAPE for Model Number
-            driver.get(product_url)
-            time.sleep(1)
-            psoup = BeautifulSoup(driver.page_source, "html.parser")
+            # Used when the product page is skipped because its model number is cached
+            listing_stock = "Out of Stock" if "Out of Stock" in item.get_text(" ") else "In Stock"
 
-            model_number = "N/A"
-            lbl = psoup.find("h4", string=re.compile("Model Number", re.I))
-            if lbl:
-                val = lbl.find_parent("li").find_next_sibling("li")
-                model_number = val.text.strip() if val else "N/A"
+            listings.append((
+                product_id, brand, full_name, sale_price, original_cost,
+                discount, rating, product_url, image_url, listing_stock
+            ))
+        except Exception as e:
+            print(f"Error at item {idx}: {e}")
+    return listings
 
-            stock_status = "Out of Stock" if "Out of Stock" in driver.page_source else "In Stock"
-            
-            screen_type = extract_screen_resolution(full_name)
-            panel_type = extract_panel_type(full_name)
 
+def parse_detail(html):
+    """Product page -> (model_number, stock_status)"""
+    psoup = make_soup(html, features="html.parser")
 
-            # Execute INSERT using the GLOBAL constant SCRAPE_TIME_STR
-            cursor.execute(insert_sql, (
-                product_id, brand, model_number, full_name, screen_type,
-                sale_price, original_cost, discount, rating, stock_status,
-                product_url, image_url, scraped_time, panel_type
-            ))
-                
-            conn.commit() 
-            
+    model_number = "N/A"
+    lbl = psoup.find("h4", string=CROMA_MODEL_LABEL_RE)
+    if lbl:
+        val = lbl.find_parent("li").find_next_sibling("li")
+        model_number = val.text.strip() if val else "N/A"
 
-        except Exception as e:
-            print(f"Error at item {idx}: {e}")
-            continue
+    stock_status = "Out of Stock" if "Out of Stock" in html else "In Stock"
+    return model_number, stock_status
+
+
+def make_row(listing, model_number, stock_status, scraped_time):
+    (product_id, brand, full_name, sale_price, original_cost,
+     discount, rating, product_url, image_url, _) = listing
+
+    screen_type = extract_screen_resolution(full_name)
+    panel_type = extract_panel_type(full_name)
+
+    return (
+        product_id, brand, model_number, full_name, screen_type,
+        sale_price, original_cost, discount, rating, stock_status,
+        product_url, image_url, scraped_time, panel_type
+    )
+
+
+def build_row(html, listing, scraped_time):
+    """Runs inline or inside a parse worker process - returns the croma_stg row"""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8")
+
+    model_number, stock_status = parse_detail(html)
+
+    return [make_row(listing, model_number, stock_status, scraped_time)]
+
+
+# ---------------- PROCESSING -----------------
+insert_sql = """
+INSERT INTO croma_stg 
+(product_id, platform, brand, model_number, full_name, display_type, 
+ sale_price, original_cost, discount, rating, stock_status, 
+ product_url, image_url, scraped_at, panel_type) 
+VALUES (%s, 'Croma', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def remember_on_commit(checkpoint):
+    """BufferedWriter on_flush - products count as stored once their rows are committed"""
+    return (lambda rows: checkpoint.committed(rows, 0)) if checkpoint else None
+
+
+def write_and_remember(writer, cache, rows, checkpoint=None):
+    # a product already stored by an earlier attempt of this run is not written again
+    if checkpoint:
+        rows = checkpoint.new_rows(rows, 0)
+    writer.add_many(rows)
+    cache.put_many((row[0], row[2]) for row in rows if row[2] != "N/A")
+
+
+def stage_products(listings, pool, cache, pipeline=None, checkpoint=None):
+    """One worker - a pooled driver and its own connection, committing every COMMIT_EVERY rows"""
+    conn = pymysql.connect(**DB_CONFIG)
+
+    with pool.driver() as driver, BufferedWriter(
+        conn, insert_sql, batch_size=COMMIT_EVERY, on_flush=remember_on_commit(checkpoint)
+    ) as writer:
+        for idx, listing in enumerate(listings, start=1):
+            try:
+                # DEEP SCRAPE for Model Number
+                html = load_product_page(driver, listing[7])
+
+                # Pipeline mode - the page is parsed in a worker while the driver loads the next one
+                if pipeline:
+                    pipeline.submit(html, listing, scraped_time)
+                    continue
+
+                write_and_remember(writer, cache, build_row(html, listing, scraped_time), checkpoint)
+
+            except Exception as e:
+                print(f"Error at item {idx}: {e}")
+                continue
 
-    driver.quit()
     conn.close()
 
+def stage_cached(items, cache, checkpoint=None):
+    """Products whose model number was verified within the TTL skip the product page,
+    their rows are written straight away - returns the items that need a deep scrape"""
+    known = cache.fresh(item[0] for item in items)
+    if known:
+        rows = [make_row(item, known[item[0]], item[-1], scraped_time) for item in items if item[0] in known]
+        conn = pymysql.connect(**DB_CONFIG)
+        with BufferedWriter(conn, insert_sql, batch_size=COMMIT_EVERY, on_flush=remember_on_commit(checkpoint)) as writer:
+            writer.add_many(checkpoint.new_rows(rows, 0) if checkpoint else rows)
+        conn.close()
+    items = [item for item in items if item[0] not in known]
+    print(f"Model number cached: {len(known)}  Deep scrape needed: {len(items)}")
+    return items
+
 def main():
+    global scraped_time
+
+    # A crashed crawl is resumed - same scraped_at, the collected listings are reused
+    # and products already stored are not deep scraped again
+    checkpoint = CrawlCheckpoint("croma")
+    scraped_time = checkpoint.scraped_at
+
+    items = checkpoint.load("listings")
+    if items is None:
+        items = collect_listings()
+        checkpoint.save("listings", items)
+    else:
+        print(f"Reusing {len(items)} listings collected earlier in this run")
+
+    done = checkpoint.seen_products(item[0] for item in items)
+    items = [item for item in items if item[0] not in done]
+    if done:
+        print(f"Already stored in this run: {len(done)}")
+
+    cache = ModelNumberCache(ttl_days=MODEL_CACHE_TTL_DAYS)
+    items = stage_cached(items, cache, checkpoint)
+
+    # Pipeline mode (SCRAPER_PARSE_WORKERS=n) - one writer connection for every worker's rows
+    workers = parse_workers_from_env()
+    pipeline = None
+    if workers and items:
+        writer_conn = pymysql.connect(**DB_CONFIG)
+        pipeline_writer = BufferedWriter(
+            writer_conn, insert_sql, batch_size=COMMIT_EVERY, on_flush=remember_on_commit(checkpoint)
+        )
+        pipeline = ParsePipeline(
+            build_row, lambda rows: write_and_remember(pipeline_writer, cache, rows, checkpoint), workers=workers
+        )
+
+    # Every pooled driver works through its own share of the products in parallel
+    if items:
+        pool = DriverPool(min(DRIVER_POOL_SIZE, len(items)))
+        try:
+            shards = [items[i::pool.size] for i in range(pool.size)]
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                list(executor.map(lambda shard: stage_products(shard, pool, cache, pipeline, checkpoint), shards))
+        finally:
+            pool.close()
+
+    if pipeline:
+        pipeline.close()
+        pipeline_writer.flush()
+        writer_conn.close()
+
+    cache.close()
+
+    # Products whose page kept failing stay open - the next start retries only those,
+    # once every listing is stored the next start collects a new run
+    missing = len(items) - len(checkpoint.seen_products(item[0] for item in items))
+    if missing:
+        print(f"{missing} products not stored, the next start resumes crawl {checkpoint.run_id}")
+    else:
+        checkpoint.finish()
+    checkpoint.close()
+
+# ---------------- DISTRIBUTED CRAWL (work_queue.py) -----------------
+WORKER_BATCH = int(os.getenv("CROMA_WORKER_BATCH", "10"))   # product pages leased at once
+
+def plan(queue):
+    """Planner - collect the listings, queue one unit per product page"""
     items = collect_listings()
-    # Batch processing for stability
-    batch_size = 30
-    for i in range(0, len(items), batch_size):
-        stage_products(items[i:i + batch_size])
+    cache = ModelNumberCache(ttl_days=MODEL_CACHE_TTL_DAYS)
+    items = stage_cached(items, cache)
+    cache.close()
+
+    queued = queue.enqueue(
+        (item[0], {"listing": item, "scraped_at": scraped_time}) for item in items
+    )
+    print(f"Queued {queued} product pages")
+    return queued
+
+def work(queue):
+    """Worker - one headless driver, rows are committed before their units are completed"""
+    cache = ModelNumberCache(ttl_days=MODEL_CACHE_TTL_DAYS)
+    driver = get_driver(headless=True)
+    conn = pymysql.connect(**DB_CONFIG)
+
+    with BufferedWriter(conn, insert_sql, batch_size=COMMIT_EVERY) as writer:
+
+        def handle(tasks):
+            done = {}
+            for task in tasks:
+                listing = task.payload["listing"]
+                try:
+                    html = load_product_page(driver, listing[7])
+                    rows = build_row(html, listing, datetime.fromisoformat(task.payload["scraped_at"]))
+                    write_and_remember(writer, cache, rows)
+                    done[task.id] = len(rows)
+                except Exception as e:
+                    print(f"Error at {task.unit}: {e}")
+            writer.flush()
+            return done
+
+        try:
+            products = run_worker(queue, handle, batch=WORKER_BATCH)
+        finally:
+            driver.quit()
+
+    conn.close()
+    cache.close()
+    print(f"Products done by this worker: {products}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # plan / work - distributed deep scrape through the work queue, any number of workers on any host
+    if len(sys.argv) > 1 and sys.argv[1] in ("plan", "work"):
+        crawl_queue = open_queue("croma", lambda: pymysql.connect(**DB_CONFIG))
+        if sys.argv[1] == "plan":
+            crawl_queue.clear()
+            plan(crawl_queue)
+        else:
+            work(crawl_queue)
+        print(f"Queue: {crawl_queue.counts()}")
+        crawl_queue.close()
+    else:
+        main()
@@ -0,0 +1,58 @@
+'''
+Buffered row writer shared by the scrapers
+
+1. Parsed rows are kept in memory instead of being inserted one by one
+2. When batch_size rows are collected they are written with one executemany
+   ( mysql connector turns that into a single multi row INSERT ) and one commit
+3. Used as a context manager - whatever is still buffered is flushed when the
+   block ends, even if the crawl crashed half way
+4. on_flush( rows ) is called after every commit with the rows it wrote ( an
+   empty list when nothing was buffered ), the crawl checkpoint records
+   products and pages there, never before their rows are in the database
+'''
+
+
+class BufferedWriter:
+
+    def __init__( self, conn, insert_sql, batch_size = 250, on_flush = None ):
+        self.conn = conn
+        self.insert_sql = insert_sql
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.cursor = conn.cursor()
+        self.rows = []
+        self.written = 0
+        self.commits = 0
+
+    def add( self, row ):
+        self.rows.append( row )
+        if len( self.rows ) >= self.batch_size:
+            self.flush()
+
+    def add_many( self, rows ):
+        for row in rows:
+            self.add( row )
+
+    def flush( self ):
+        rows, self.rows = self.rows, []
+        if rows:
+            try:
+                self.cursor.executemany( self.insert_sql, rows )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self.rows = rows
+                raise
+            self.written += len( rows )
+            self.commits += 1
+        if self.on_flush:
+            self.on_flush( rows )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        try:
+            self.flush()
+        finally:
+            self.cursor.close()
@@ -0,0 +1,66 @@
+'''
+Brand normalization benchmark - per-row apply vs normalize_brands() ( brands.py )
+
+Builds a synthetic frame of raw brand strings the way the scrapers deliver
+them ( mixed case, padding, ® / ™ symbols, aliases, unknown brands and
+missing values ), runs the old row-by-row normalize_brand() and the
+vectorized normalize_brands() over it and prints both timings. The outputs
+are compared as well, so the benchmark doubles as a check that nothing changed.
+
+Usage:
+    python bench_brands.py              # 1,000,000 rows
+    python bench_brands.py 5000000
+'''
+
+import sys, time
+
+import numpy as np
+import pandas as pd
+
+from brands import VALID_TV_BRANDS, BRAND_ALIASES, normalize_brands
+
+
+def normalize_brand( brand ):
+    """The old amazon_std.py version, one Python call per row"""
+    if pd.isna( brand ) or brand is None:
+        return "UNKNOWN"
+
+    brand = str( brand ).upper().strip()
+    brand = brand.replace( "®", "" ).replace( "Â", "" ).replace( "™", "" ).strip()
+
+    if brand in BRAND_ALIASES:
+        return BRAND_ALIASES[ brand ]
+    if brand in VALID_TV_BRANDS:
+        return brand
+    return "UNKNOWN"
+
+
+def synthetic_brands( rows, seed = 7 ):
+    rng = np.random.default_rng( seed )
+    base = sorted( VALID_TV_BRANDS ) + [ "Black & Decker", "Redmi", "Amazon", "Fire", "Generic" ]
+    variants = []
+    for brand in base:
+        variants += [ brand, brand.lower(), brand.title(), f"  { brand } ", f"{ brand }®", f"{ brand }™ " ]
+    variants.append( None )
+    return pd.Series( rng.choice( np.array( variants, dtype = object ), size = rows ), name = "brand" )
+
+
+def timed( func ):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rows = int( sys.argv[1] ) if len( sys.argv ) > 1 else 1_000_000
+    brands = synthetic_brands( rows )
+    print( f"{ rows:,} rows, { brands.nunique( dropna = False )} distinct raw brands" )
+
+    old, old_seconds = timed( lambda: brands.apply( normalize_brand ))
+    new, new_seconds = timed( lambda: normalize_brands( brands, VALID_TV_BRANDS ))
+
+    print( f"apply( normalize_brand )   { old_seconds:8.3f}s" )
+    print( f"normalize_brands()         { new_seconds:8.3f}s   ( { old_seconds / new_seconds:.1f}x )" )
+
+    mismatches = ( old != new.astype( object )).sum()
+    print( "outputs match" if not mismatches else f"{ mismatches } rows differ" )
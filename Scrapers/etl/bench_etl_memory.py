@@ -0,0 +1,56 @@
+'''
+ETL memory benchmark - whole-table reads vs chunked, typed reads ( etl_read.py )
+
+Every step runs in its own child process, in pipeline order, so its peak RSS
+is not hidden by an earlier step. Each chunk size given on the command line
+is one full pass over the steps ( 0 = read whole tables like before ).
+
+The steps run with --full, so every pass rebuilds the ETL tables from the raw
+tables - run it against a copy of the database.
+
+Usage:
+    python bench_etl_memory.py                  # 0 and 50000
+    python bench_etl_memory.py 0 10000 100000
+'''
+
+import contextlib, importlib, io, os, resource, subprocess, sys, time
+
+STEPS = [
+    "croma_std",
+    "flipkart_std",
+    "amazon_std",
+    "unify_tv",
+    "tv_price_master",
+    "tv_brand_master",
+    "tv_platform_master",
+    "tv_product_master",
+    "model_deal_summary",
+    "identity_resolution",
+]
+
+
+def child( step ):
+    from db_connection import get_engine
+
+    module = importlib.import_module( step )
+    start = time.perf_counter()
+    # the steps print their own progress, keep the report readable
+    with contextlib.redirect_stdout( io.StringIO() ):
+        module.run( get_engine() )
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is KB on linux
+    peak_mb = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024
+    print( f"{ os.environ[ 'ETL_CHUNKSIZE' ]:>9} { step:<20} { elapsed:8.1f}s { peak_mb:10.1f} MB peak RSS" )
+
+
+if __name__ == "__main__":
+    if os.getenv( "BENCH_CHILD" ):
+        child( sys.argv[1] )
+    else:
+        chunksizes = sys.argv[1:] or [ "0", "50000" ]
+        print( f"chunksize step                     time        peak RSS" )
+        for chunksize in chunksizes:
+            env = { **os.environ, "ETL_CHUNKSIZE": chunksize, "BENCH_CHILD": "1" }
+            for step in STEPS:
+                subprocess.run([ sys.executable, __file__, step, "--full" ], env = env, check = True )
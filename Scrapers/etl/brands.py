@@ -0,0 +1,73 @@
+'''
+Brand normalization shared by the three *_std scripts
+
+1. Every raw brand is upper cased, stripped and cleaned of ® / Â / ™
+2. Aliases are mapped to one spelling ( BRAND_ALIASES )
+3. With valid_brands ( Amazon, whose brand is guessed from the title ) any
+   other brand becomes UNKNOWN. Missing brands are always UNKNOWN
+4. The string work runs once per distinct raw value ( pd.factorize ) and the
+   result is broadcast back to every row, so a million rows with a few
+   hundred brands cost a few hundred string operations
+'''
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# VALID TV BRANDS
+# --------------------------------------------------
+VALID_TV_BRANDS = {
+    "ACER", "ACERPURE", "AISEN", "AIWA", "AMAZONBASICS", "BLAUPUNKT", "BPL",
+    "BUSH", "COOCAA", "COMPAQ", "CORNEA", "CROMA", "DAIWA", "DYANORA",
+    "ELISTA", "GEEPAS", "HAIER", "HAIKAWA", "HISENSE", "HUIDI", "HYEON",
+    "HYUNDAI", "IBELL", "IFFALCON", "IMPEX", "INFINIX", "INTEX", "ITEL",
+    "JVC", "KARBONN", "KODAK", "LG", "LIMEBERRY", "LLOYD", "LUGOSI",
+    "LUMIO", "MADURA", "MARQ", "MASHIVA", "METZ", "MI", "MICROMAX",
+    "MITASHI", "MOTOROLA", "MTC", "NACSON", "NEXAVISION", "NIKASHI", "NU",
+    "ONEPLUS", "ONIDA", "PANASONIC", "PHILIPS", "REALME", "REINTECH",
+    "RELIANCE", "SAMSUNG", "SANSUI", "SANYO", "SEVISION", "SHARP", "SHINCO",
+    "SKYWALL", "SKYLIVE", "SONY", "STARSHINE", "STUDYNLEARN", "TCL",
+    "TG", "THOMSON", "TIVORA", "TOSHIBA", "TRUSENSE", "UNIMAX", "UNIBOOM",
+    "UREN", "VASAP", "VIDEOCON", "VISTEK", "VU", "VW", "VZY", "WESTINGHOUSE",
+    "WESTON", "WOBBLE", "WYBOR", "XIAOMI", "ZEBRONICS"
+}
+
+# --------------------------------------------------
+# BRAND ALIASES (for normalization)
+# --------------------------------------------------
+BRAND_ALIASES = {
+    
+    "AISEN®": "AISEN",
+    "acer": "ACER",
+    "AISENÂ®": "AISEN",
+    "BLACK & DECKER": "BLACK+DECKER",
+    "BLACK+DECKER": "BLACK+DECKER",
+}
+
+SYMBOLS_RE = "[®Â™]"
+
+
+def normalize_brands( brands, valid_brands = None ):
+    """Vectorized brand normalization, returns a categorical Series aligned with `brands`"""
+    codes, uniques = pd.factorize( brands, use_na_sentinel = True )
+
+    clean = (
+        pd.Series( uniques, dtype = object ).astype( str )
+          .str.upper()
+          .str.strip()
+          .str.replace( SYMBOLS_RE, "", regex = True )
+          .str.strip()
+    )
+
+    aliased = clean.map( BRAND_ALIASES )
+    if valid_brands is not None:
+        clean = clean.where( clean.isin( valid_brands ), "UNKNOWN" )
+    clean = aliased.fillna( clean )
+
+    # missing brands ( code -1 ) point at the extra UNKNOWN at the end
+    lookup = np.append( clean.to_numpy( dtype = object ), "UNKNOWN" )
+    return pd.Series(
+        pd.Categorical( lookup[ codes ] ),
+        index = brands.index,
+        name = brands.name
+    )
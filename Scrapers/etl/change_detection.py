@@ -0,0 +1,128 @@
+'''
+Content-hash change detection for the standardization step
+
+The scrapers insert a full row per product on every run, even when nothing
+about the product changed. The standardization step keeps only the rows
+that say something new:
+
+1. Every standardized row gets a hash of its price-relevant fields
+   ( HASH_COLUMNS - prices, discount, rating, stock )
+2. product_content_hash keeps the last hash of every ( platform, product_id ),
+   the scraped_at of its last change ( changed_at ) and of its last sighting
+   ( last_seen, the heartbeat )
+3. A row is stored only when its hash differs from the previous snapshot of
+   the product, so the *_standardized tables, tvs_unified and everything after
+   them only carry changes. "Still listed at this price" is last_seen
+4. The hash table is written after the rows, a failed run leaves it behind
+   the data, never ahead of it
+
+ETL_CHANGED_ONLY=0 turns it off and keeps every snapshot like before.
+'''
+
+import os
+
+import pandas as pd
+from sqlalchemy import select
+
+from schema import ensure_table
+from etl_io import upsert_frame
+
+CHANGED_ONLY = os.getenv( "ETL_CHANGED_ONLY", "1" ) == "1"
+
+HASH_COLUMNS = [ "sale_price", "original_cost", "discount", "rating", "stock_status" ]
+NUMERIC_COLUMNS = [ "sale_price", "original_cost", "discount", "rating" ]
+KEY = [ "platform", "product_id" ]
+
+
+def content_hash( frame ):
+    """Hex hash of HASH_COLUMNS per row, independent of dtypes and float noise"""
+    values = frame.reindex( columns = HASH_COLUMNS )
+    values = values.assign(
+        **{ c: pd.to_numeric( values[ c ], errors = "coerce" ).astype( "float64" ).round( 2 ) for c in NUMERIC_COLUMNS },
+        stock_status = values[ "stock_status" ].astype( object )
+    )
+    return pd.util.hash_pandas_object( values, index = False ).map( "{:016x}".format )
+
+
+class ChangeFilter:
+    """
+    Drops the rows of a standardized chunk that repeat the previous snapshot
+    of their product. Chunks must come in scraped_at order ( etl_state.py
+    reads them that way ), state carries over from chunk to chunk.
+    full = True starts from an empty state, like the rebuilt table it feeds.
+    """
+
+    def __init__( self, engine, full = False ):
+        self.engine = engine
+        self.full = full
+        self.state = {}         # ( platform, product_id ) -> ( hash, changed_at, last_seen )
+        self.loaded = set()
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def _load( self, platform ):
+        self.loaded.add( platform )
+        if self.full:
+            return
+        table = ensure_table( self.engine, "product_content_hash" )
+        with self.engine.connect() as conn:
+            for row in conn.execute(
+                select( table.c.product_id, table.c.content_hash, table.c.changed_at, table.c.last_seen )
+                .where( table.c.platform == platform )
+            ):
+                self.state[( platform, row.product_id )] = ( row.content_hash, row.changed_at, row.last_seen )
+
+    def filter( self, frame ):
+        self.rows_in += len( frame )
+        if frame.empty:
+            return frame
+
+        for platform in frame[ "platform" ].dropna().unique():
+            if platform not in self.loaded:
+                self._load( platform )
+
+        frame = frame.sort_values( "scraped_at", kind = "stable" )
+        hashes = content_hash( frame )
+
+        # previous snapshot of the same product inside the chunk ...
+        previous = hashes.groupby([ frame[ "platform" ], frame[ "product_id" ]], sort = False ).shift( 1 ).astype( object )
+        # ... or from the state for its first row in the chunk
+        first = previous.isna()
+        previous[ first ] = pd.Series(
+            [ self.state.get( key, ( None, ))[0] for key in zip( frame.loc[ first, "platform" ], frame.loc[ first, "product_id" ] ) ],
+            index = previous.index[ first ], dtype = object
+        )
+        changed = ( hashes.astype( object ) != previous ).to_numpy()
+
+        latest = frame[ KEY + [ "scraped_at" ]].assign( content_hash = hashes ).drop_duplicates( subset = KEY, keep = "last" )
+        last_change = frame.loc[ changed, KEY + [ "scraped_at" ]].drop_duplicates( subset = KEY, keep = "last" )
+        changed_at = dict( zip( zip( last_change[ "platform" ], last_change[ "product_id" ] ), last_change[ "scraped_at" ] ))
+
+        for platform, product_id, scraped_at, digest in latest.itertuples( index = False ):
+            key = ( platform, product_id )
+            if pd.isna( product_id ):
+                continue
+            stored = self.state.get( key, ( None, None, None ))
+            self.state[ key ] = ( digest, changed_at.get( key, stored[1] ), scraped_at )
+
+        frame = frame[ changed ]
+        self.rows_out += len( frame )
+        return frame
+
+    def filter_chunks( self, chunks ):
+        for chunk in chunks:
+            yield self.filter( chunk )
+
+    def save( self ):
+        """Write the hashes and heartbeats back, after the rows are stored"""
+        if not self.state:
+            return 0
+        ensure_table( self.engine, "product_content_hash" )
+        state = pd.DataFrame(
+            [( *key, *value ) for key, value in self.state.items() ],
+            columns = KEY + [ "content_hash", "changed_at", "last_seen" ]
+        )
+        for c in [ "changed_at", "last_seen" ]:
+            state[ c ] = pd.to_datetime( state[ c ] )
+        print( f"Change detection kept { self.rows_out } of { self.rows_in } rows" )
+        return upsert_frame( state, "product_content_hash", self.engine, key_columns = KEY )
@@ -0,0 +1,141 @@
+'''
+Query plan check - the API's hot queries must use the managed indexes
+
+1. Every query in HOT_QUERIES is EXPLAINed against the ETL database
+   ( db_connection.get_engine(), MySQL or SQLite )
+2. A query passes when its plan reads the table through the expected index
+   ( or the primary key ), it fails on a full table scan or another index
+3. Prints one line per query and exits with 1 if any of them failed, so it
+   can run after the ETL or in CI against a loaded database
+
+Missing managed tables are created first ( schema.py ), so it also runs on
+an empty database. MySQL may prefer a full scan on a nearly empty table,
+check against a database with real data.
+
+Usage:
+    python check_query_plans.py
+'''
+
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from db_connection import get_engine
+from schema import metadata
+
+PRIMARY = "PRIMARY"
+
+# name, table, query, parameters, index the plan has to use
+HOT_QUERIES = [
+    (
+        "model prices ( alerts, compare )", "tv_platform_latest_master",
+        "SELECT platform, sale_price FROM tv_platform_latest_master "
+        "WHERE model_id = :model_id AND sale_price > 0 ORDER BY sale_price ASC",
+        { "model_id": "UA55AU7700" }, "idx_tv_platform_latest_master_model_scraped",
+    ),
+    (
+        "model price history ( charts )", "tv_platform_latest_master",
+        "SELECT platform, scraped_at, sale_price FROM tv_platform_latest_master "
+        "WHERE model_id = :model_id AND scraped_at >= :start_date ORDER BY scraped_at",
+        { "model_id": "UA55AU7700", "start_date": datetime( 2026, 1, 1 ) }, "idx_tv_platform_latest_master_model_scraped",
+    ),
+    (
+        "model exists ( wishlist )", "tv_platform_latest_master",
+        "SELECT model_id FROM tv_platform_latest_master WHERE model_id = :model_id LIMIT 1",
+        { "model_id": "UA55AU7700" }, "idx_tv_platform_latest_master_model_scraped",
+    ),
+    (
+        "brand listings", "tv_platform_latest_master",
+        "SELECT model_id, sale_price FROM tv_platform_latest_master WHERE brand = :brand",
+        { "brand": "SAMSUNG" }, "idx_tv_platform_latest_master_brand",
+    ),
+    (
+        "price range", "tv_platform_latest_master",
+        "SELECT model_id FROM tv_platform_latest_master WHERE sale_price BETWEEN :low AND :high",
+        { "low": 20000, "high": 30000 }, "idx_tv_platform_latest_master_sale_price",
+    ),
+    (
+        "recent price changes", "tv_platform_latest_master",
+        "SELECT model_id FROM tv_platform_latest_master WHERE scraped_at >= :since",
+        { "since": datetime( 2026, 1, 1 ) }, "idx_tv_platform_latest_master_scraped",
+    ),
+    (
+        "newest scrapes", "tv_platform_latest_master",
+        "SELECT model_id FROM tv_platform_latest_master WHERE last_seen >= :since",
+        { "since": datetime( 2026, 1, 1 ) }, "idx_tv_platform_latest_master_last_seen",
+    ),
+    (
+        "model history ( tvs_unified )", "tvs_unified",
+        "SELECT platform, scraped_at, sale_price FROM tvs_unified "
+        "WHERE model_id = :model_id AND scraped_at >= :start_date",
+        { "model_id": "UA55AU7700", "start_date": datetime( 2026, 1, 1 ) }, "idx_tvs_unified_model_scraped",
+    ),
+    (
+        "product by model", "tv_product_master",
+        "SELECT brand, full_name FROM tv_product_master WHERE model_id = :model_id",
+        { "model_id": "UA55AU7700" }, PRIMARY,
+    ),
+    (
+        "brand summary", "tv_brand_master",
+        "SELECT total_models FROM tv_brand_master WHERE brand = :brand",
+        { "brand": "SAMSUNG" }, PRIMARY,
+    ),
+    (
+        "best deals page", "model_deal_summary",
+        "SELECT model_id FROM model_deal_summary ORDER BY price_difference DESC, model_id DESC LIMIT 24",
+        {}, "idx_model_deal_summary_savings",
+    ),
+    (
+        "best deals by rating", "model_deal_summary",
+        "SELECT model_id FROM model_deal_summary ORDER BY rating_sort DESC, model_id DESC LIMIT 24",
+        {}, "idx_model_deal_summary_rating",
+    ),
+]
+
+
+def sqlite_plan( conn, sql, params ):
+    """( index used or None, plan text ) from EXPLAIN QUERY PLAN"""
+    details = [ row[ -1 ] for row in conn.execute( text( f"EXPLAIN QUERY PLAN { sql }" ), params ) ]
+    plan = " | ".join( details )
+    for detail in details:
+        if " USING PRIMARY KEY" in detail or " USING INTEGER PRIMARY KEY" in detail:
+            return PRIMARY, plan
+        if " USING INDEX " in detail or " USING COVERING INDEX " in detail:
+            index = detail.split( " INDEX " )[ 1 ].split()[0]
+            # SQLite implements a table's PRIMARY KEY as sqlite_autoindex_<table>_1
+            return ( PRIMARY if index.startswith( "sqlite_autoindex_" ) else index ), plan
+    return None, plan
+
+
+def mysql_plan( conn, sql, params ):
+    """( index used or None, plan text ) from EXPLAIN, type ALL is a full scan"""
+    rows = [ dict( row._mapping ) for row in conn.execute( text( f"EXPLAIN { sql }" ), params ) ]
+    plan = " | ".join( f"type={ r[ 'type' ] } key={ r[ 'key' ] } rows={ r[ 'rows' ] }" for r in rows )
+    keys = [ r[ "key" ] for r in rows if r[ "key" ] and r[ "type" ] != "ALL" ]
+    return ( keys[0] if keys else None ), plan
+
+
+def check( engine ):
+    explain = mysql_plan if engine.dialect.name == "mysql" else sqlite_plan
+    failures = 0
+    with engine.connect() as conn:
+        for name, table, sql, params, expected in HOT_QUERIES:
+            index, plan = explain( conn, sql, params )
+            ok = index == expected
+            failures += not ok
+            print( f"{ 'ok  ' if ok else 'FAIL' } { name:<36} { index or 'full scan' }" )
+            if not ok:
+                print( f"     expected { expected }: { plan }" )
+    return failures
+
+
+if __name__ == "__main__":
+    engine = get_engine()
+    # only missing tables are created, a missing index on a table must show up
+    for table in { q[1] for q in HOT_QUERIES }:
+        metadata.tables[ table ].create( engine, checkfirst = True )
+
+    failures = check( engine )
+    print( f"{ len( HOT_QUERIES ) - failures } of { len( HOT_QUERIES ) } hot queries use their index" )
+    sys.exit( 1 if failures else 0 )
@@ -0,0 +1,68 @@
+'''
+Watermark check - an incremental run with no new scrapes must read nothing
+but the last scrape it already saw
+
+1. Every job in etl_state is matched to the table it reads from
+2. The rows newer than the job's watermark are counted, bound the same way
+   as in the job's query ( watermark_query() in etl_state.py ). The rows at
+   the watermark are left out, the jobs read them again on purpose ( a
+   crawl still running commits more rows with the same scraped_at )
+3. Prints one line per job and exits with 1 if any job would read rows
+
+Run it right after an ETL run, before the scrapers add new rows. A job
+that still finds rows does not bind its watermark in the column's format
+and re-reads history on every run.
+
+Usage:
+    python check_watermarks.py
+'''
+
+import sys
+
+from sqlalchemy import select
+
+from db_connection import get_engine
+from etl_state import watermark_query
+from schema import ensure_table
+
+# job -> raw table of the *_std jobs
+SOURCES = {
+    "croma_std": "croma_tvsss",
+    "flipkart_std": "flipkart_products_new",
+    "amazon_std": "amazon_tv",
+}
+
+
+def job_query( job ):
+    """( query, parameters ) counting the rows of the job's source after its watermark"""
+    if job.startswith( "unify_tv:" ):
+        source = job.split( ":", 1 )[1]
+        return watermark_query( f"select count(*) from { source } where scraped_at > :watermark" ), {}
+    if job.startswith( "tv_price_master:" ):
+        return watermark_query(
+            "select count(*) from tvs_unified where platform = :platform and scraped_at > :watermark"
+        ), { "platform": job.split( ":", 1 )[1] }
+    if job in SOURCES:
+        return watermark_query( f"select count(*) from { SOURCES[ job ] } where scraped_at > :watermark" ), {}
+    return None, None
+
+
+def check( engine ):
+    table = ensure_table( engine, "etl_state" )
+    failures = 0
+    with engine.connect() as conn:
+        jobs = conn.execute( select( table.c.job, table.c.watermark ).order_by( table.c.job )).all()
+        for job, watermark in jobs:
+            query, params = job_query( job )
+            if query is None or watermark is None:
+                continue
+            rows = conn.execute( query, { **params, "watermark": watermark } ).scalar()
+            failures += rows > 0
+            print( f"{ 'ok  ' if rows == 0 else 'FAIL' } { job:<40} { rows } rows after { watermark }" )
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check( get_engine() )
+    print( f"{ failures } jobs would read rows again" )
+    sys.exit( 1 if failures else 0 )
@@ -0,0 +1,183 @@
+'''
+Bulk writes for the ETL
+
+1. bulk_insert() loads a DataFrame into a table
+   - MySQL with ETL_LOAD_INFILE=1: the frame is staged to a local TSV file and
+     loaded with LOAD DATA LOCAL INFILE ( the server needs local_infile=ON )
+   - otherwise multi-row INSERT statements of ETL_BULK_ROWS rows ( default
+     5000 ), which is also the path for SQLite during local runs
+   - ignore=True skips rows whose unique key already exists
+2. replace_table() rebuilds a whole table from a DataFrame, or from an
+   iterable of chunks, into a shadow table and swaps it in at the end -
+   RENAME TABLE on MySQL, DROP + ALTER TABLE RENAME on SQLite - so readers
+   never see an empty or half-loaded table
+'''
+
+import os, tempfile
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, insert, inspect, text
+
+from etl_io import frame_records, widen_floats
+from schema import metadata
+
+LOAD_INFILE = os.getenv( "ETL_LOAD_INFILE", "0" ) == "1"
+BULK_ROWS = int( os.getenv( "ETL_BULK_ROWS", "5000" ))
+
+# SQLite allows 32766 bound parameters per statement
+SQLITE_MAX_PARAMS = 32000
+
+
+def _table( engine, name ):
+    """Managed table from schema.py, or the table as it is in the database"""
+    if name in metadata.tables:
+        return metadata.tables[ name ]
+    return Table( name, MetaData(), autoload_with = engine )
+
+
+def _tsv_column( values ):
+    if pd.api.types.is_datetime64_any_dtype( values ):
+        out = values.dt.strftime( "%Y-%m-%d %H:%M:%S.%f" )
+    else:
+        out = values.astype( str )
+    out = (
+        out.str.replace( "\\", "\\\\", regex = False )
+           .str.replace( "\t", "\\t", regex = False )
+           .str.replace( "\n", "\\n", regex = False )
+           .str.replace( "\r", "\\r", regex = False )
+    )
+    return out.where( values.notna(), "\\N" )
+
+
+def _load_infile( conn, table, frame, ignore ):
+    frame = widen_floats( frame )
+    columns = [ _tsv_column( frame[ c ] ) for c in frame.columns ]
+    lines = columns[0].str.cat( columns[ 1: ], sep = "\t" ) if len( columns ) > 1 else columns[0]
+
+    with tempfile.NamedTemporaryFile( "w", suffix = ".tsv", encoding = "utf-8", delete = False ) as f:
+        f.write( "\n".join( lines ))
+        f.write( "\n" )
+        path = f.name
+
+    try:
+        conn.execute(
+            text(
+                f"LOAD DATA LOCAL INFILE :path { 'IGNORE' if ignore else '' } INTO TABLE { table.name } "
+                f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ( { ', '.join( frame.columns ) } )"
+            ),
+            { "path": path }
+        )
+    finally:
+        os.remove( path )
+
+
+def _insert_statement( engine, table, ignore ):
+    stmt = insert( table )
+    if ignore:
+        stmt = stmt.prefix_with( "IGNORE" if engine.dialect.name == "mysql" else "OR IGNORE" )
+    return stmt
+
+
+def bulk_insert( frame, table, engine, ignore = False, conn = None ):
+    """
+    Insert every row of `frame` into `table` ( a name or a Table ) with as
+    few round trips as possible
+    """
+    if frame.empty:
+        return 0
+
+    if conn is None:
+        with engine.begin() as conn:
+            return bulk_insert( frame, table, engine, ignore, conn )
+
+    if not isinstance( table, Table ):
+        table = _table( engine, table )
+    frame = frame[[ c for c in frame.columns if c in table.c ]]
+
+    if engine.dialect.name == "mysql" and LOAD_INFILE:
+        _load_infile( conn, table, frame, ignore )
+        return len( frame )
+
+    rows = BULK_ROWS
+    if engine.dialect.name == "sqlite":
+        rows = max( 1, min( rows, SQLITE_MAX_PARAMS // len( frame.columns )))
+
+    stmt = _insert_statement( engine, table, ignore )
+    records = frame_records( frame )
+    for i in range( 0, len( records ), rows ):
+        # one INSERT ... VALUES (...), (...), ... per batch
+        conn.execute( stmt.values( records[ i:i + rows ] ))
+    return len( records )
+
+
+def _create_shadow( engine, name, shadow, sample ):
+    with engine.begin() as conn:
+        conn.execute( text( f"DROP TABLE IF EXISTS { shadow }" ))
+
+    if name not in metadata.tables:
+        # not managed yet - take the columns from the frame itself
+        sample.head( 0 ).to_sql( shadow, engine, index = False )
+        return Table( shadow, MetaData(), autoload_with = engine )
+
+    table = metadata.tables[ name ].to_metadata( MetaData(), name = shadow )
+    if engine.dialect.name == "sqlite":
+        # SQLite index names are global, they are created after the swap
+        for index in list( table.indexes ):
+            table.indexes.discard( index )
+    table.create( engine )
+    return table
+
+
+def _swap( engine, name, shadow ):
+    exists = inspect( engine ).has_table( name )
+
+    if engine.dialect.name == "mysql":
+        with engine.begin() as conn:
+            if exists:
+                # one statement, readers see the old table or the new one
+                conn.execute( text( f"DROP TABLE IF EXISTS { name }__old" ))
+                conn.execute( text( f"RENAME TABLE { name } TO { name }__old, { shadow } TO { name }" ))
+                conn.execute( text( f"DROP TABLE { name }__old" ))
+            else:
+                conn.execute( text( f"RENAME TABLE { shadow } TO { name }" ))
+        return
+
+    with engine.begin() as conn:
+        if exists:
+            conn.execute( text( f"DROP TABLE { name }" ))
+        conn.execute( text( f"ALTER TABLE { shadow } RENAME TO { name }" ))
+        if name in metadata.tables:
+            for index in metadata.tables[ name ].indexes:
+                index.create( conn )
+
+
+def replace_table( engine, name, data, ignore = True ):
+    """
+    Rebuild `name` from a DataFrame or an iterable of DataFrames through
+    a shadow table. Rows with a duplicate unique key are skipped unless
+    ignore = False. Returns the number of rows loaded.
+    """
+    chunks = [ data ] if isinstance( data, pd.DataFrame ) else data
+    shadow = f"{ name }__shadow"
+    shadow_table = None
+    rows = 0
+
+    try:
+        for chunk in chunks:
+            if shadow_table is None:
+                shadow_table = _create_shadow( engine, name, shadow, chunk )
+            rows += bulk_insert( chunk, shadow_table, engine, ignore )
+
+        if shadow_table is None:
+            if name not in metadata.tables:
+                return 0
+            # nothing to load, a managed table is still swapped for an empty one
+            shadow_table = _create_shadow( engine, name, shadow, None )
+    except Exception:
+        with engine.begin() as conn:
+            conn.execute( text( f"DROP TABLE IF EXISTS { shadow }" ))
+        raise
+
+    _swap( engine, name, shadow )
+    return rows
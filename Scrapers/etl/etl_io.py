@@ -0,0 +1,105 @@
+'''
+Shared write helpers for the ETL scripts
+
+upsert_frame() writes a DataFrame into a managed table ( see schema.py ):
+new keys are inserted, existing keys are updated. MySQL uses
+INSERT ... ON DUPLICATE KEY UPDATE, SQLite uses INSERT ... ON CONFLICT.
+
+upsert_newer() is an upsert that only overwrites a stored row when the
+incoming row is at least as new ( compared on scraped_at ), so batches can
+arrive in any order.
+'''
+
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+
+from schema import metadata
+
+
+def widen_floats( frame ):
+    """
+    float32 columns of a typed read ( etl_read.py ) are prices and ratings,
+    widen them back so 4.1 is not stored as 4.099999904632568
+    """
+    for c in frame.columns[ frame.dtypes == "float32" ]:
+        frame = frame.assign( **{ c: frame[ c ].astype( "float64" ).round( 2 ) })
+    return frame
+
+
+def frame_records( frame ):
+    """DataFrame -> list of dicts with NaN / NaT turned into None"""
+    frame = widen_floats( frame )
+    frame = frame.astype( object ).where( frame.notna(), None )
+    return frame.to_dict( orient = "records" )
+
+
+def _upsert_statement( engine, table, columns, key_columns ):
+    update_columns = [ c for c in columns if c not in key_columns ]
+
+    if engine.dialect.name == "mysql":
+        stmt = mysql.insert( table )
+        if not update_columns:
+            return stmt.prefix_with( "IGNORE" )
+        return stmt.on_duplicate_key_update({ c: stmt.inserted[ c ] for c in update_columns })
+
+    stmt = sqlite.insert( table )
+    if not update_columns:
+        return stmt.on_conflict_do_nothing()
+    return stmt.on_conflict_do_update(
+        index_elements = key_columns,
+        set_ = { c: stmt.excluded[ c ] for c in update_columns }
+    )
+
+
+def upsert_frame( frame, table_name, engine, key_columns, batch_size = 1000 ):
+    """Insert or update every row of `frame` in `table_name`, keyed on key_columns"""
+    if frame.empty:
+        return 0
+
+    table = metadata.tables[ table_name ]
+    columns = [ c for c in frame.columns if c in table.c ]
+    stmt = _upsert_statement( engine, table, columns, key_columns )
+    records = frame_records( frame[ columns ] )
+
+    with engine.begin() as conn:
+        for i in range( 0, len( records ), batch_size ):
+            conn.execute( stmt, records[ i:i + batch_size ] )
+
+    return len( records )
+
+
+def _upsert_newer_statement( engine, table, columns, key_columns, order_column ):
+    update_columns = [ c for c in columns if c not in key_columns and c != order_column ]
+
+    if engine.dialect.name == "mysql":
+        stmt = mysql.insert( table )
+        newer = stmt.inserted[ order_column ] >= table.c[ order_column ]
+        # MySQL applies the assignments left to right, the order column must change last
+        return stmt.on_duplicate_key_update([
+            *[ ( c, func.IF( newer, stmt.inserted[ c ], table.c[ c ] )) for c in update_columns ],
+            ( order_column, func.GREATEST( stmt.inserted[ order_column ], table.c[ order_column ] )),
+        ])
+
+    stmt = sqlite.insert( table )
+    return stmt.on_conflict_do_update(
+        index_elements = key_columns,
+        set_ = { c: stmt.excluded[ c ] for c in update_columns + [ order_column ] },
+        where = stmt.excluded[ order_column ] >= table.c[ order_column ]
+    )
+
+
+def upsert_newer( frame, table_name, engine, key_columns, order_column = "scraped_at", batch_size = 1000 ):
+    """Upsert keyed on key_columns, an existing row is only replaced by a newer one"""
+    if frame.empty:
+        return 0
+
+    table = metadata.tables[ table_name ]
+    columns = [ c for c in frame.columns if c in table.c ]
+    stmt = _upsert_newer_statement( engine, table, columns, key_columns, order_column )
+    records = frame_records( frame[ columns ] )
+
+    with engine.begin() as conn:
+        for i in range( 0, len( records ), batch_size ):
+            conn.execute( stmt, records[ i:i + batch_size ] )
+
+    return len( records )
@@ -0,0 +1,62 @@
+'''
+Chunked, typed reads for the ETL scripts
+
+1. read_chunks() streams a query with a server side cursor ( stream_results )
+   and yields ETL_CHUNKSIZE rows at a time ( default 50000, 0 reads the whole
+   result in one frame like before )
+2. typed() gives the snapshot columns compact dtypes - categoricals for the
+   repeated text columns, float32 prices and a datetime64 scraped_at - so a
+   chunk of history holds a fraction of the object-dtype memory
+3. frame_records() in etl_io.py widens the float32 columns back before
+   anything is written
+'''
+
+import os
+
+import pandas as pd
+from sqlalchemy import text
+
+CHUNKSIZE = int( os.getenv( "ETL_CHUNKSIZE", "50000" ))
+
+CATEGORY_COLUMNS = [ "platform", "brand", "stock_status", "display_type" ]
+FLOAT32_COLUMNS = [ "sale_price", "original_cost", "discount", "rating" ]
+
+
+def typed( frame ):
+    """Compact dtypes for the snapshot columns that are present"""
+    for c in CATEGORY_COLUMNS:
+        if c in frame:
+            frame[ c ] = frame[ c ].astype( "category" )
+    for c in FLOAT32_COLUMNS:
+        if c in frame:
+            frame[ c ] = pd.to_numeric( frame[ c ], errors = "coerce" ).astype( "float32" )
+    if "scraped_at" in frame:
+        frame[ "scraped_at" ] = pd.to_datetime( frame[ "scraped_at" ], errors = "coerce" )
+    return frame
+
+
+def read_chunks( engine, sql, params = None, chunksize = None, dtypes = True ):
+    """
+    Yield the result of `sql` chunk by chunk, typed unless dtypes = False.
+    `sql` is a string or a text() clause whose parameters carry their types
+    ( see watermark_query() in etl_state.py )
+    """
+    chunksize = CHUNKSIZE if chunksize is None else chunksize
+    convert = typed if dtypes else ( lambda frame: frame )
+    sql = text( sql ) if isinstance( sql, str ) else sql
+
+    if not chunksize:
+        yield convert( pd.read_sql( sql, engine, params = params ))
+        return
+
+    if engine.dialect.name == "sqlite":
+        # an open SQLite read blocks the writes the caller does between
+        # chunks, so the ( local / test ) database is read up front
+        data = pd.read_sql( sql, engine, params = params )
+        for i in range( 0, len( data ), chunksize ):
+            yield convert( data.iloc[ i:i + chunksize ].copy() )
+        return
+
+    with engine.connect().execution_options( stream_results = True ) as conn:
+        for chunk in pd.read_sql( sql, conn, params = params, chunksize = chunksize ):
+            yield convert( chunk )
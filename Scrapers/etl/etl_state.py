@@ -0,0 +1,144 @@
+'''
+ETL state table - remembers how far every incremental job got
+
+Every job stores the max scraped_at it has processed ( its watermark ). The
+next run reads raw rows from that scraped_at on, oldest first. A scraper
+stamps one scraped_at on its whole crawl and commits while it runs, so rows
+at the watermark may have arrived after the last ETL run - they are read
+again, every write of them is an upsert or skips duplicate keys.
+'''
+
+import sys
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import DateTime, bindparam, select, text
+
+from schema import ensure_table
+from etl_io import upsert_frame
+from etl_bulk import replace_table
+from etl_read import read_chunks
+from change_detection import CHANGED_ONLY, ChangeFilter
+
+
+def full_refresh_requested():
+    """`python croma_std.py --full` ignores the watermark and rebuilds everything"""
+    return "--full" in sys.argv
+
+
+def get_watermark( engine, job ):
+    table = ensure_table( engine, "etl_state" )
+    with engine.connect() as conn:
+        value = conn.execute(
+            select( table.c.watermark ).where( table.c.job == job )
+        ).scalar()
+    return pd.Timestamp( value ) if value is not None else None
+
+
+def set_watermark( engine, job, watermark ):
+    if watermark is None or pd.isna( watermark ):
+        return
+    ensure_table( engine, "etl_state" )
+    upsert_frame(
+        pd.DataFrame([{
+            "job": job,
+            "watermark": pd.Timestamp( watermark ).to_pydatetime(),
+            "updated_at": datetime.now(),
+        }]),
+        "etl_state", engine, key_columns = [ "job" ]
+    )
+
+
+def watermark_query( sql ):
+    """
+    text( sql ) with :watermark bound as a DateTime. SQLite stores datetimes as
+    text with microseconds and compares them as strings, a plain datetime
+    parameter is sent without them and "10:00:00.000000" > "10:00:00" would
+    count rows at the watermark as newer
+    """
+    return text( sql ).bindparams( bindparam( "watermark", type_ = DateTime ))
+
+
+def stamp_version( engine, table_name ):
+    """Bump the version of `table_name` so readers caching it reload ( see table_versions )"""
+    now = datetime.now()
+    ensure_table( engine, "table_versions" )
+    upsert_frame(
+        pd.DataFrame([{
+            "table_name": table_name,
+            "version": int( now.timestamp() * 1_000_000 ),
+            "updated_at": now,
+        }]),
+        "table_versions", engine, key_columns = [ "table_name" ]
+    )
+
+
+def _new_rows_sql( engine, source_table, job ):
+    watermark = None if full_refresh_requested() else get_watermark( engine, job )
+    if watermark is None:
+        return text( f"select * from { source_table } order by scraped_at" ), None, True
+
+    print( f"Reading { source_table } rows from { watermark } on" )
+    return (
+        watermark_query( f"select * from { source_table } where scraped_at >= :watermark order by scraped_at" ),
+        { "watermark": watermark.to_pydatetime() },
+        False
+    )
+
+
+def read_new_rows( engine, source_table, job ):
+    """
+    Raw rows from the job's watermark on.
+    Returns ( data, full ) - full is True when everything was read
+    ( first run or --full ) and the target table must be rebuilt.
+    """
+    sql, params, full = _new_rows_sql( engine, source_table, job )
+    return pd.read_sql( sql, engine, params = params ), full
+
+
+def iter_new_rows( engine, source_table, job, dtypes = True ):
+    """Like read_new_rows(), but returns ( chunks, full ) with the rows streamed in chunks"""
+    sql, params, full = _new_rows_sql( engine, source_table, job )
+    return read_chunks( engine, sql, params, dtypes = dtypes ), full
+
+
+def track_watermark( chunks, seen ):
+    """Pass chunks through and keep the newest scraped_at in seen[ "watermark" ]"""
+    for chunk in chunks:
+        if not chunk.empty:
+            latest = chunk[ "scraped_at" ].max()
+            if seen.get( "watermark" ) is None or latest > seen[ "watermark" ]:
+                seen[ "watermark" ] = latest
+        yield chunk
+
+
+def standardize_in_chunks( engine, source_table, table_name, job, standardize ):
+    """
+    Run `standardize` over the new raw rows chunk by chunk. A full run bulk
+    loads the chunks into a shadow table and swaps it in, an incremental run
+    upserts every chunk on ( product_id, scraped_at ). Rows that repeat the
+    previous snapshot of their product are dropped ( change_detection.py ).
+    The watermark only moves once every chunk is written.
+    """
+    chunks, full = iter_new_rows( engine, source_table, job, dtypes = False )
+    standardized = ( standardize( chunk ).dropna( subset = [ "scraped_at" ] ) for chunk in chunks )
+    seen = {}
+
+    # the watermark follows every row read, stored or not
+    standardized = track_watermark( standardized, seen )
+    changes = ChangeFilter( engine, full ) if CHANGED_ONLY else None
+    if changes is not None:
+        standardized = changes.filter_chunks( standardized )
+
+    if full:
+        rows = replace_table( engine, table_name, standardized )
+    else:
+        ensure_table( engine, table_name )
+        rows = 0
+        for data in standardized:
+            rows += upsert_frame( data, table_name, engine, key_columns = [ "product_id", "scraped_at" ] )
+
+    if changes is not None:
+        changes.save()
+    set_watermark( engine, job, seen.get( "watermark" ))
+    return rows
@@ -0,0 +1,257 @@
+'''
+Canonical product identity across platforms
+
+The same TV gets a different model_id on every platform - Amazon takes the
+last code-looking token of the title, Flipkart reads a spec line, Croma the
+Model Number label. This step matches the listings of tv_platform_latest_master
+and writes canonical_model_map: ( platform, model_id ) -> canonical_model_id.
+
+1. Model codes are normalized ( upper case, letters and digits only ) and
+   every code-looking token of the title is kept as a candidate code too.
+   Placeholder ids ( UNKNOWN, N/A ), codes without a digit and codes shorter
+   than MIN_CODE_LENGTH count as no code
+2. Listings are blocked by ( brand, screen size in inches ), only listings of
+   the same block are ever compared
+3. Inside a block an inverted index of code 4-grams yields the candidate
+   pairs, so the work grows with the matches and not with the square of the
+   catalog. Shared or contained codes are a match, other candidates are
+   scored with difflib on model code and cleaned title
+4. Matches are merged with union-find, two listings of the same platform are
+   never merged. The canonical id of a group is the Croma model number if
+   there is one, then Flipkart, then Amazon
+'''
+
+import os, re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from db_connection import get_engine
+from etl_bulk import replace_table
+
+MATCH_THRESHOLD = float( os.getenv( "IDENTITY_MATCH_THRESHOLD", "0.85" ))
+MIN_CODE_LENGTH = 5
+GRAM = 4
+MAX_POSTINGS = 50
+
+# what the scrapers and *_std steps put in for a missing model number,
+# after normalize_code() - shared by unrelated TVs, never a match
+PLACEHOLDER_CODES = { "UNKNOWN", "NA", "NONE", "NULL", "NAN" }
+
+# the model number label of Croma is the most reliable, Amazon's is a guess
+PLATFORM_PREFERENCE = { "croma": 0, "flipkart": 1, "amazon": 2 }
+
+NON_ALNUM_RE = re.compile( r"[^A-Z0-9]" )
+TOKEN_RE = re.compile( r"[A-Z0-9\-/]+" )
+INCH_RE = re.compile( r"(\d{2,3}(?:\.\d)?)\s*(?:-|\s)?(?:INCH|INCHES|IN\b|\")" )
+CM_RE = re.compile( r"(\d{2,3}(?:\.\d+)?)\s*CM\b" )
+NOISE_RE = re.compile( r"\([^)]*\)|\d{2,3}(?:\.\d+)?\s*(?:CM|INCH|INCHES|IN\b|\")|[^A-Z0-9 ]" )
+
+
+def normalize_code( code ):
+    if code is None or pd.isna( code ):
+        return ""
+    return NON_ALNUM_RE.sub( "", str( code ).upper() )
+
+
+def is_model_code( code ):
+    """A normalized code that can identify a TV - long enough, with a digit, no placeholder"""
+    return (
+        len( code ) >= MIN_CODE_LENGTH
+        and code not in PLACEHOLDER_CODES
+        and re.search( "[0-9]", code ) is not None
+    )
+
+
+def title_codes( title ):
+    """Code-looking tokens of a title - letters and digits, at least MIN_CODE_LENGTH long"""
+    codes = set()
+    for token in TOKEN_RE.findall( str( title or "" ).upper() ):
+        code = normalize_code( token )
+        if len( code ) >= MIN_CODE_LENGTH and re.search( "[A-Z]", code ) and re.search( "[0-9]", code ):
+            codes.add( code )
+    return codes
+
+
+def screen_size( title ):
+    """Screen size in whole inches from the title, None if it has none"""
+    title = str( title or "" ).upper()
+    m = INCH_RE.search( title )
+    if m:
+        return round( float( m.group( 1 )))
+    m = CM_RE.search( title )
+    if m:
+        return round( float( m.group( 1 )) / 2.54 )
+    return None
+
+
+def clean_title( title, brand ):
+    title = NOISE_RE.sub( " ", str( title or "" ).upper() )
+    if brand:
+        title = title.replace( str( brand ).upper(), " " )
+    return " ".join( title.split() )
+
+
+def _pair_score( a, b ):
+    if ( a[ "code" ] and a[ "code" ] == b[ "code" ] ) or a[ "codes" ] & b[ "codes" ]:
+        return 1.0
+    for x in a[ "codes" ]:
+        for y in b[ "codes" ]:
+            if ( x in y or y in x ) and min( len( x ), len( y )) >= MIN_CODE_LENGTH:
+                return 0.9
+    if not ( a[ "code" ] and b[ "code" ] ):
+        # no model code to compare, the title has to carry the match alone
+        return SequenceMatcher( None, a[ "title" ], b[ "title" ] ).ratio()
+    return (
+        0.5 * SequenceMatcher( None, a[ "code" ], b[ "code" ] ).ratio() +
+        0.5 * SequenceMatcher( None, a[ "title" ], b[ "title" ] ).ratio()
+    )
+
+
+class UnionFind:
+
+    def __init__( self, n ):
+        self.parent = list( range( n ))
+
+    def find( self, i ):
+        while self.parent[ i ] != i:
+            self.parent[ i ] = self.parent[ self.parent[ i ]]
+            i = self.parent[ i ]
+        return i
+
+    def union( self, i, j ):
+        self.parent[ self.find( i )] = self.find( j )
+
+
+def _blocking_keys( listing ):
+    """The model code and 4-grams of the candidate codes, title words when there is no code"""
+    keys = { listing[ "code" ] } if listing[ "code" ] else set()
+    for code in listing[ "codes" ]:
+        keys.update( code[ i:i + GRAM ] for i in range( len( code ) - GRAM + 1 ))
+    if not listing[ "codes" ]:
+        keys.update( word for word in listing[ "title" ].split() if len( word ) > 3 )
+    return keys
+
+
+def candidate_pairs( block ):
+    """
+    Pairs of one ( brand, size ) block worth scoring. Listings are looked up
+    in an inverted index key -> listings instead of comparing every pair,
+    keys shared by more than MAX_POSTINGS listings say nothing and are skipped.
+    """
+    index = defaultdict( list )
+    for i, listing in block:
+        for key in _blocking_keys( listing ):
+            index[ key ].append( i )
+
+    pairs = set()
+    for ids in index.values():
+        if len( ids ) > MAX_POSTINGS:
+            continue
+        for x, i in enumerate( ids ):
+            for j in ids[ x + 1: ]:
+                pairs.add(( min( i, j ), max( i, j )))
+    return pairs
+
+
+def resolve( latest_tvs ):
+    """( platform, model_id ) -> canonical_model_id for every listing"""
+    tvs = (
+        latest_tvs.dropna( subset = [ "platform", "model_id" ] )
+                  .drop_duplicates( subset = [ "platform", "model_id" ] )
+                  .reset_index( drop = True )
+    )
+
+    listings = []
+    for row in tvs.itertuples( index = False ):
+        # placeholder ids ( UNKNOWN, N/A ... ) and codes too short to mean
+        # anything are no code at all, neither for scoring nor for blocking
+        code = normalize_code( row.model_id )
+        code = code if is_model_code( code ) else ""
+        listings.append({
+            "platform": str( row.platform ),
+            "model_id": row.model_id,
+            "brand": str( row.brand or "" ).upper(),
+            "code": code,
+            "codes": ({ code } if code else set() ) | title_codes( row.full_name ),
+            "title": clean_title( row.full_name, row.brand ),
+            "size": screen_size( row.full_name ),
+        })
+
+    blocks = defaultdict( list )
+    for i, listing in enumerate( listings ):
+        blocks[( listing[ "brand" ], listing[ "size" ] )].append(( i, listing ))
+
+    uf = UnionFind( len( listings ))
+    # weakest match that put a listing in its group, None when it stands alone
+    best = [ None ] * len( listings )
+    members = { i: { listings[ i ][ "platform" ].lower() } for i in range( len( listings )) }
+
+    for block in blocks.values():
+        if len( block ) < 2:
+            continue
+        pairs = []
+        for i, j in candidate_pairs( block ):
+            a, b = listings[ i ], listings[ j ]
+            if a[ "platform" ].lower() == b[ "platform" ].lower():
+                continue
+            score = _pair_score( a, b )
+            if score >= MATCH_THRESHOLD:
+                pairs.append(( score, i, j ))
+
+        # strongest matches first, a group never gets two listings of one platform
+        for score, i, j in sorted( pairs, reverse = True ):
+            ri, rj = uf.find( i ), uf.find( j )
+            if ri == rj or members[ ri ] & members[ rj ]:
+                continue
+            uf.union( ri, rj )
+            members[ uf.find( rj )] = members.pop( ri ) | members.pop( rj )
+            for k in ( i, j ):
+                best[ k ] = score if best[ k ] is None else min( best[ k ], score )
+
+    groups = defaultdict( list )
+    for i in range( len( listings )):
+        groups[ uf.find( i )].append( i )
+
+    rows = []
+    for ids in groups.values():
+        canonical = min(
+            ids,
+            key = lambda i: (
+                PLATFORM_PREFERENCE.get( listings[ i ][ "platform" ].lower(), 9 ),
+                len( listings[ i ][ "code" ] ) or 99
+            )
+        )
+        for i in ids:
+            rows.append({
+                "platform": listings[ i ][ "platform" ],
+                "model_id": listings[ i ][ "model_id" ],
+                "canonical_model_id": listings[ canonical ][ "model_id" ],
+                "group_size": len( ids ),
+                "match_score": None if best[ i ] is None else round( best[ i ], 3 ),
+            })
+
+    return pd.DataFrame( rows, columns = [ "platform", "model_id", "canonical_model_id", "group_size", "match_score" ] )
+
+
+def run( engine, latest_tvs = None ):
+    # Read latest platform level TV data
+    if latest_tvs is None:
+        latest_tvs = pd.read_sql( "select * from tv_platform_latest_master", engine )
+
+    canonical_model_map = resolve( latest_tvs )
+
+    # Loaded into a shadow table and swapped in, readers never see it half written
+    replace_table( engine, "canonical_model_map", canonical_model_map )
+
+    matched = canonical_model_map[ canonical_model_map[ "group_size" ] > 1 ]
+    print( "canonical_model_map table created successfully" )
+    print( "Listings:", len( canonical_model_map ), " matched across platforms:", len( matched ))
+    print( "Canonical models:", canonical_model_map[ "canonical_model_id" ].nunique() )
+
+    return canonical_model_map
+
+
+if __name__ == "__main__":
+    run( get_engine() )
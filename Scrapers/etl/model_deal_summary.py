@@ -0,0 +1,76 @@
+import json
+
+import pandas as pd
+from db_connection import get_engine
+from etl_bulk import replace_table
+
+
+def run( engine, latest_tvs = None ):
+    # Read latest platform level TV data
+    # One row per model and platform with its newest price
+
+    if latest_tvs is None:
+        latest_tvs = pd.read_sql( "select * from tv_platform_latest_master", engine )
+
+    # Only listings with a real price take part in a deal, like the old best-deals query
+    priced = latest_tvs[( latest_tvs[ "sale_price" ] > 0 ) & ( latest_tvs[ "original_cost" ] > 0 )].copy()
+    priced[ "platform" ] = priced[ "platform" ].astype( str )
+    priced[ "sale_price" ] = priced[ "sale_price" ].astype( "float64" ).round( 2 )
+
+    # Per model price summary across platforms
+    # /products/best-deals reads this table instead of aggregating the catalog per request
+
+    summary = (
+        priced
+        .groupby( "model_id" )
+        .agg(
+            full_name = ( "full_name", "min" ),
+            brand = ( "brand", "min" ),
+            display_type = ( "display_type", "min" ),
+            image_url = ( "image_url", "min" ),
+            platform_count = ( "platform", "nunique" ),
+            min_price = ( "sale_price", "min" ),
+            max_price = ( "sale_price", "max" ),
+            avg_price = ( "sale_price", "mean" ),
+            original_cost = ( "original_cost", "max" ),
+            max_discount = ( "discount", "max" ),
+            avg_rating = ( "rating", "mean" ),
+            stock_status = ( "stock_status", "min" ),
+        )
+        .reset_index()
+    )
+
+    summary[ "price_difference" ] = summary[ "max_price" ] - summary[ "min_price" ]
+    summary[ "savings_percent" ] = ( summary[ "price_difference" ] / summary[ "max_price" ] * 100 ).round( 1 )
+    summary[ "avg_price" ] = summary[ "avg_price" ].round( 2 )
+    summary[ "avg_rating" ] = summary[ "avg_rating" ].astype( "float64" ).round( 2 )
+
+    summary[ "max_discount" ] = summary[ "max_discount" ].astype( "float64" )
+
+    # discount and rating stay NULL when no platform has one, the API pages
+    # through never NULL copies of them with a keyset ( unrated models last )
+    summary[ "discount_sort" ] = summary[ "max_discount" ].fillna( 0 )
+    summary[ "rating_sort" ] = summary[ "avg_rating" ].fillna( 0 )
+
+    # Platforms and their price of every model
+    by_model = priced.sort_values( "platform" ).groupby( "model_id" )
+    summary[ "platforms" ] = summary[ "model_id" ].map( by_model[ "platform" ].agg( lambda p: ",".join( p.unique() )))
+    platform_prices = {
+        model_id: json.dumps( dict( zip( group[ "platform" ], group[ "sale_price" ] )))
+        for model_id, group in by_model[[ "platform", "sale_price" ]]
+    }
+    summary[ "platform_prices" ] = summary[ "model_id" ].map( platform_prices )
+
+    # Save deal summary table
+    # Loaded into a shadow table and swapped in, readers never see it half written
+    replace_table( engine, "model_deal_summary", summary )
+
+    # Simple confirmation message
+    print( "model_deal_summary table created successfully" )
+    print( "Total models:", len( summary ), " on more than one platform:", ( summary[ "platform_count" ] > 1 ).sum() )
+
+    return summary
+
+
+if __name__ == "__main__":
+    run( get_engine() )
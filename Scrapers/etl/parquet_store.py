@@ -0,0 +1,163 @@
+'''
+Columnar Parquet copy of the unified price history
+
+1. unify_tv writes every chunk it appends to tvs_unified here as well, as
+   Parquet files partitioned by day: <ETL_PARQUET_DIR>/scraped_date=2026-01-31/
+2. The files of a run are staged and only published when the run succeeded,
+   a full rebuild ( --full ) replaces the whole store
+3. read_history() loads only the columns and days asked for, memory mapped,
+   so offline analytics and backfills do not have to pull tvs_unified from
+   MySQL. Rows repeating a snapshot key are dropped there, the store can
+   hold a snapshot twice ( see read_history )
+4. The store is off unless ETL_PARQUET_DIR is set, pyarrow is only needed
+   when it is on
+
+Usage:
+    from parquet_store import read_history
+    prices = read_history(
+        columns = [ "platform", "model_id", "sale_price", "scraped_at" ],
+        start = "2026-01-01", end = "2026-01-31",
+        platforms = [ "amazon", "flipkart" ]
+    )
+'''
+
+import os, shutil, uuid
+
+import pandas as pd
+
+PARQUET_DIR = os.getenv( "ETL_PARQUET_DIR", "" )
+PARTITION = "scraped_date"
+# one snapshot per product per scrape, the unique key of tvs_unified
+KEY = [ "platform", "product_id", "scraped_at" ]
+
+
+def enabled():
+    return bool( PARQUET_DIR )
+
+
+def arrow_schema():
+    """Fixed file schema from the managed tvs_unified columns, so a column that
+    happens to be empty in one chunk does not get a different type"""
+    import pyarrow as pa
+    from sqlalchemy import DateTime, Double
+    from schema import snapshot_columns
+
+    fields = []
+    for column in snapshot_columns():
+        if isinstance( column.type, Double ):
+            fields.append( pa.field( column.name, pa.float64() ))
+        elif isinstance( column.type, DateTime ):
+            fields.append( pa.field( column.name, pa.timestamp( "us" )))
+        else:
+            fields.append( pa.field( column.name, pa.string() ))
+    return pa.schema( fields )
+
+
+class SnapshotBatch:
+    """
+    The Parquet files of one ETL run. They are written to a staging folder
+    ( ignored by readers, its name starts with _ ) and only published once
+    the rows are safely in tvs_unified, so a failed run leaves no duplicates.
+    """
+
+    def __init__( self, base = None ):
+        self.base = base or PARQUET_DIR
+        self.staging = os.path.join( self.base, f"_staging-{ uuid.uuid4().hex }" )
+        self.rows = 0
+
+    def write( self, frame ):
+        """Stage a chunk of unified rows, one new file per day it touches"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if frame.empty:
+            return 0
+
+        schema = arrow_schema()
+        frame = frame.reindex( columns = schema.names )
+        frame[ "scraped_at" ] = pd.to_datetime( frame[ "scraped_at" ], errors = "coerce" )
+        frame = frame.dropna( subset = [ "scraped_at" ] )
+        # categoricals of a typed read would give every file its own dictionary
+        for c in frame.columns[ frame.dtypes == "category" ]:
+            frame[ c ] = frame[ c ].astype( object )
+        for c in frame.columns[ frame.dtypes == "float32" ]:
+            frame[ c ] = frame[ c ].astype( "float64" ).round( 2 )
+
+        days = frame[ "scraped_at" ].dt.strftime( "%Y-%m-%d" )
+        for day, part in frame.groupby( days ):
+            path = os.path.join( self.staging, f"{ PARTITION }={ day }" )
+            os.makedirs( path, exist_ok = True )
+            pq.write_table(
+                pa.Table.from_pandas( part, schema = schema, preserve_index = False ),
+                os.path.join( path, f"part-{ uuid.uuid4().hex }.parquet" )
+            )
+        self.rows += len( frame )
+        return len( frame )
+
+    def tee( self, chunks ):
+        """Stage every chunk on its way through"""
+        for chunk in chunks:
+            self.write( chunk )
+            yield chunk
+
+    def publish( self, replace = False ):
+        """Move the staged files into the store, replace = True drops the old days first"""
+        if replace and os.path.isdir( self.base ):
+            for name in os.listdir( self.base ):
+                if name.startswith( PARTITION + "=" ):
+                    shutil.rmtree( os.path.join( self.base, name ))
+
+        if os.path.isdir( self.staging ):
+            for day in os.listdir( self.staging ):
+                target = os.path.join( self.base, day )
+                os.makedirs( target, exist_ok = True )
+                for name in os.listdir( os.path.join( self.staging, day )):
+                    os.replace( os.path.join( self.staging, day, name ), os.path.join( target, name ))
+        self.discard()
+
+    def discard( self ):
+        shutil.rmtree( self.staging, ignore_errors = True )
+
+
+def read_history( columns = None, start = None, end = None, platforms = None, base = None ):
+    """
+    Unified history from the store.
+    columns - only these columns are read ( all when None )
+    start / end - first and last day ( "YYYY-MM-DD", inclusive ), only the
+                  matching day partitions are opened
+    platforms - only these platforms
+    """
+    import pyarrow.parquet as pq
+
+    base = base or PARQUET_DIR
+    if not base or not os.path.isdir( base ):
+        return pd.DataFrame( columns = columns )
+
+    filters = []
+    if start is not None:
+        filters.append(( PARTITION, ">=", str( start )[ :10 ] ))
+    if end is not None:
+        filters.append(( PARTITION, "<=", str( end )[ :10 ] ))
+    if platforms:
+        filters.append(( "platform", "in", list( platforms )))
+
+    # the key is always read, so duplicates go away whatever was asked for
+    read_columns = None if columns is None else list( dict.fromkeys([ *columns, *KEY ]))
+    table = pq.read_table(
+        base,
+        columns = read_columns,
+        filters = filters or None,
+        partitioning = "hive",
+        memory_map = True
+    )
+    frame = table.to_pandas()
+
+    # rows tvs_unified skipped as duplicates ( INSERT IGNORE ) are staged as
+    # well, and a run that crashed after publishing but before moving its
+    # watermarks offers the same rows again next time
+    frame = frame.drop_duplicates( subset = KEY )
+    if columns is not None:
+        return frame[ columns ]
+    if PARTITION in frame:
+        frame = frame.drop( columns = PARTITION )
+    return frame
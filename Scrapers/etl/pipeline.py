@@ -0,0 +1,128 @@
+'''
+In-process ETL runner
+
+1. Every step is a run( engine, **inputs ) function of one of the ETL scripts,
+   declared with the names of the outputs it needs and the name of its output
+2. Outputs are DataFrames kept in memory and handed to the steps that need
+   them, so a table written by one step is not read back by the next
+3. Steps whose inputs are ready form a wave and run together on a thread pool,
+   the waves run one after the other - the end of a wave is the barrier
+4. Steps declared with process=True ( the CPU heavy *_std jobs ) run on a
+   process pool instead, each child opens its own engine. Their output stays
+   in the database, only success and timing come back
+5. Every step logs its own wall time. A failing step does not stop its wave,
+   the failures are collected per step and only the steps depending on a
+   failed step are skipped
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class Step:
+
+    def __init__( self, name, func, inputs = (), output = None, process = False ):
+        self.name = name
+        self.func = func
+        self.process = process
+        # input name -> keyword argument of func, None only waits for that step
+        self.inputs = inputs if isinstance( inputs, dict ) else { i: i for i in inputs }
+        self.output = output or name
+
+    def __repr__( self ):
+        return f"Step( { self.name } )"
+
+
+def waves( steps ):
+    """Group the steps into waves, every step only depends on earlier waves"""
+    done = set()
+    pending = list( steps )
+    while pending:
+        ready = [ s for s in pending if all( i in done for i in s.inputs ) ]
+        if not ready:
+            raise ValueError( f"Unresolved inputs for { pending }" )
+        yield ready
+        done.update( s.output for s in ready )
+        pending = [ s for s in pending if s not in ready ]
+
+
+def _run_step( func, engine, kwargs ):
+    start = time.perf_counter()
+    output = func( engine, **kwargs )
+    return output, time.perf_counter() - start
+
+
+def _run_step_in_process( func, kwargs ):
+    # engines can not cross a process boundary, every child connects on its own
+    from db_connection import get_engine
+    engine = get_engine()
+    try:
+        _, seconds = _run_step( func, engine, kwargs )
+    finally:
+        engine.dispose()
+    return None, seconds
+
+
+def run_pipeline( steps, engine, max_workers = 4 ):
+    """
+    Run the steps wave by wave.
+    Returns { output name: value }, the step timings and { step name: error }
+    """
+    results = {}
+    timings = {}
+    failures = {}
+    broken = set()          # outputs of failed or skipped steps
+    started = time.perf_counter()
+
+    for wave in waves( steps ):
+        runnable = []
+        for step in wave:
+            missing = [ i for i in step.inputs if i in broken ]
+            if missing:
+                print( f" Skipping { step.name }, waiting on failed { ', '.join( missing ) }" )
+                broken.add( step.output )
+            else:
+                runnable.append( step )
+        if not runnable:
+            continue
+
+        print( f"\n Running { ', '.join( s.name for s in runnable ) }" )
+
+        threaded = [ s for s in runnable if not s.process ]
+        forked = [ s for s in runnable if s.process ]
+        futures = {}
+        pools = []
+
+        if threaded:
+            pools.append( ThreadPoolExecutor( max_workers = min( max_workers, len( threaded ))))
+            for s in threaded:
+                futures[ s ] = pools[ -1 ].submit( _run_step, s.func, engine, _step_kwargs( s, results ))
+        if forked:
+            pools.append( ProcessPoolExecutor( max_workers = min( max_workers, len( forked ))))
+            for s in forked:
+                futures[ s ] = pools[ -1 ].submit( _run_step_in_process, s.func, _step_kwargs( s, results ))
+
+        # barrier - the next wave only starts when every step of this one is done
+        for pool in pools:
+            pool.shutdown( wait = True )
+
+        for step, future in futures.items():
+            try:
+                results[ step.output ], timings[ step.name ] = future.result()
+                print( f" { step.name } completed in { timings[ step.name ]:.1f}s" )
+            except Exception as e:
+                print( f" Failed at { step.name }: { repr( e ) }" )
+                failures[ step.name ] = e
+                broken.add( step.output )
+
+    print( f"\n ETL Pipeline Finished in { time.perf_counter() - started:.1f}s" )
+    for name, seconds in timings.items():
+        print( f"   { name:<20} { seconds:8.1f}s" )
+    for name, error in failures.items():
+        print( f"   { name:<20} FAILED { repr( error ) }" )
+
+    return results, timings, failures
+
+
+def _step_kwargs( step, results ):
+    return { arg: results[ name ] for name, arg in step.inputs.items() if arg }
@@ -1,33 +1,56 @@
-import subprocess
 import sys
 
-files = [
-    "db_connection.py",
-
-    "croma_std.py",
-    "flipkart_std.py",
-    "amazon_std.py",
-    "unify_tv.py",
-
-    "tv_brand_master.py",
-    "tv_platform_master.py",
-    "tv_product_master.py",
-    "tv_price_master.py",
-
-    
-    "tv_analytics.py"
-
-    
+import croma_std, flipkart_std, amazon_std, unify_tv
+import tv_price_master, tv_brand_master, tv_platform_master, tv_product_master
+import identity_resolution, model_deal_summary, tv_analytics
+
+from db_connection import get_engine
+from pipeline import Step, run_pipeline
+from schema import ensure_table
+
+steps = [
+    # the three platforms are independent of each other and CPU bound,
+    # they run side by side in separate processes
+    Step( "croma_std", croma_std.run, output = "croma_tv_standardized", process = True ),
+    Step( "flipkart_std", flipkart_std.run, output = "flipkart_tv_standardized", process = True ),
+    Step( "amazon_std", amazon_std.run, output = "amazon_tv_standardized", process = True ),
+
+    # unify_tv waits for all three, then it and tv_price_master read their
+    # new rows by watermark
+    Step(
+        "unify_tv", unify_tv.run,
+        inputs = { "croma_tv_standardized": None, "flipkart_tv_standardized": None, "amazon_tv_standardized": None },
+        output = "tvs_unified"
+    ),
+    Step( "tv_price_master", tv_price_master.run, inputs = { "tvs_unified": None }, output = "latest_tvs" ),
+
+    # the masters all start from the latest prices handed over in memory
+    Step( "tv_brand_master", tv_brand_master.run, inputs = [ "latest_tvs" ], output = "tv_brand_master" ),
+    Step( "tv_platform_master", tv_platform_master.run, inputs = [ "latest_tvs" ], output = "tv_platform_master" ),
+    Step( "tv_product_master", tv_product_master.run, inputs = [ "latest_tvs" ], output = "tv_product_master" ),
+    Step( "model_deal_summary", model_deal_summary.run, inputs = [ "latest_tvs" ], output = "model_deal_summary" ),
+    Step( "identity_resolution", identity_resolution.run, inputs = [ "latest_tvs" ], output = "canonical_model_map" ),
+
+    Step(
+        "tv_analytics", tv_analytics.run,
+        inputs = {
+            "latest_tvs": "tv_prices",
+            "tv_product_master": "tv_products",
+            "tv_brand_master": "tv_brand",
+            "tv_platform_master": "tv_platform",
+        },
+        output = "tv_analytics"
+    ),
 ]
 
-for f in files:
-    print(f"\n Running {f}")
-    result = subprocess.run([sys.executable, f])
 
-    if result.returncode != 0:
-        print(f" Failed at {f}. Stopping pipeline.")
-        break
-    else:
-        print(f" {f} completed")
+if __name__ == "__main__":
+    engine = get_engine()
+
+    # created once up front, the steps of a wave share them - parallel steps
+    # creating a missing table at the same time would fail with "already exists"
+    for name in ( "etl_state", "table_versions", "product_content_hash" ):
+        ensure_table( engine, name )
 
-print("\n ETL Pipeline Finished")
+    results, timings, failures = run_pipeline( steps, engine )
+    sys.exit( 1 if failures else 0 )
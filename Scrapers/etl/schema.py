@@ -0,0 +1,341 @@
+'''
+Managed schema for the tables the ETL writes
+
+Tables used to be created by DataFrame.to_sql( if_exists="replace" ), which
+gives no keys and no indexes. They are now declared here once and created
+with ensure_table(), so keys survive every refresh and the same definition
+works on MySQL and on SQLite.
+'''
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import (
+    MetaData, Table, Column, String, Text, Double, DateTime, BigInteger, Integer,
+    UniqueConstraint, Index, inspect, text
+)
+
+metadata = MetaData()
+
+
+# Columns shared by the standardized tables and tvs_unified
+def snapshot_columns():
+    return [
+        Column( "platform", String( 20 )),
+        Column( "product_id", String( 64 )),
+        Column( "brand", String( 100 )),
+        Column( "model_id", String( 100 )),
+        Column( "full_name", Text ),
+        Column( "sale_price", Double ),
+        Column( "original_cost", Double ),
+        Column( "discount", Double ),
+        Column( "rating", Double ),
+        Column( "stock_status", String( 30 )),
+        Column( "scraped_at", DateTime, nullable = False ),
+        Column( "product_url", Text ),
+        Column( "image_url", Text ),
+        Column( "display_type", String( 50 )),
+        Column( "screen_resolution", String( 50 )),
+    ]
+
+
+def standardized_table( name ):
+    return Table(
+        name, metadata,
+        *snapshot_columns(),
+        # one snapshot per product per scrape - the upsert key
+        UniqueConstraint( "product_id", "scraped_at", name = f"uq_{ name }_snapshot" ),
+    )
+
+croma_tv_standardized = standardized_table( "croma_tv_standardized" )
+flipkart_tv_standardized = standardized_table( "flipkart_tv_standardized" )
+amazon_tv_standardized = standardized_table( "amazon_tv_standardized" )
+
+
+# Price history of every platform - append only
+tvs_unified = Table(
+    "tvs_unified", metadata,
+    Column( "id", BigInteger().with_variant( Integer, "sqlite" ), primary_key = True, autoincrement = True ),
+    *snapshot_columns(),
+    UniqueConstraint( "platform", "product_id", "scraped_at", name = "uq_tvs_unified_snapshot" ),
+    Index( "idx_tvs_unified_model_scraped", "model_id", "scraped_at" ),
+    Index( "idx_tvs_unified_platform_scraped", "platform", "scraped_at" ),
+)
+
+
+# Newest snapshot of every model on every platform - what the API serves
+tv_platform_latest_master = Table(
+    "tv_platform_latest_master", metadata,
+    Column( "platform", String( 20 ), primary_key = True ),
+    Column( "model_id", String( 100 ), primary_key = True ),
+    Column( "brand", String( 100 )),
+    Column( "product_id", String( 64 )),
+    Column( "full_name", Text ),
+    Column( "sale_price", Double ),
+    Column( "original_cost", Double ),
+    Column( "discount", Double ),
+    Column( "stock_status", String( 30 )),
+    # only changed snapshots are stored ( change_detection.py ), scraped_at
+    # is the last price change and last_seen the last scrape that saw it
+    Column( "scraped_at", DateTime, nullable = False ),
+    Column( "product_url", Text ),
+    Column( "rating", Double ),
+    Column( "display_type", String( 50 )),
+    Column( "image_url", Text ),
+    Column( "screen_resolution", String( 50 )),
+    Column( "last_seen", DateTime ),
+    # the API's lookups - one model's prices and history, brand filters,
+    # price range, recent price changes and the newest scrapes ( check_query_plans.py )
+    Index( "idx_tv_platform_latest_master_model_scraped", "model_id", "scraped_at" ),
+    Index( "idx_tv_platform_latest_master_brand", "brand" ),
+    Index( "idx_tv_platform_latest_master_sale_price", "sale_price" ),
+    Index( "idx_tv_platform_latest_master_scraped", "scraped_at" ),
+    Index( "idx_tv_platform_latest_master_last_seen", "last_seen" ),
+)
+
+
+# One row per brand and model id ( tv_product_master.py ) - placeholder ids
+# like UNKNOWN are shared by many brands, model_id alone is not unique.
+# model_id comes first so a lookup by model is a key prefix seek
+tv_product_master = Table(
+    "tv_product_master", metadata,
+    Column( "model_id", String( 100 ), primary_key = True ),
+    Column( "brand", String( 100 ), primary_key = True ),
+    Column( "full_name", Text ),
+    Column( "display_type", String( 50 )),
+    Index( "idx_tv_product_master_brand", "brand" ),
+)
+
+
+# Listings per brand and per platform ( tv_brand_master.py, tv_platform_master.py )
+tv_brand_master = Table(
+    "tv_brand_master", metadata,
+    Column( "brand", String( 100 ), primary_key = True ),
+    Column( "total_models", BigInteger ),
+    Column( "total_listings", BigInteger ),
+    Column( "in_stock_count", BigInteger ),
+)
+
+tv_platform_master = Table(
+    "tv_platform_master", metadata,
+    Column( "platform", String( 20 ), primary_key = True ),
+    Column( "total_listings", BigInteger ),
+    Column( "unique_models", BigInteger ),
+    Column( "in_stock_count", BigInteger ),
+)
+
+
+# Price summary of every model across platforms ( model_deal_summary.py ),
+# the sort columns of /products/best-deals are indexed together with model_id
+# so every page is a range scan from the previous page's last row
+model_deal_summary = Table(
+    "model_deal_summary", metadata,
+    Column( "model_id", String( 100 ), primary_key = True ),
+    Column( "full_name", Text ),
+    Column( "brand", String( 100 )),
+    Column( "display_type", String( 50 )),
+    Column( "image_url", Text ),
+    Column( "platform_count", Integer, nullable = False ),
+    Column( "min_price", Double, nullable = False ),
+    Column( "max_price", Double, nullable = False ),
+    Column( "avg_price", Double, nullable = False ),
+    Column( "price_difference", Double, nullable = False ),
+    Column( "savings_percent", Double, nullable = False ),
+    Column( "original_cost", Double ),
+    Column( "max_discount", Double ),
+    Column( "avg_rating", Double ),
+    # max_discount / avg_rating with NULL as 0, only used for sorting
+    Column( "discount_sort", Double, nullable = False ),
+    Column( "rating_sort", Double, nullable = False ),
+    Column( "platforms", String( 255 )),
+    Column( "platform_prices", Text ),
+    Column( "stock_status", String( 30 )),
+    Index( "idx_model_deal_summary_savings", "price_difference", "model_id" ),
+    Index( "idx_model_deal_summary_price", "min_price", "model_id" ),
+    Index( "idx_model_deal_summary_discount", "discount_sort", "model_id" ),
+    Index( "idx_model_deal_summary_rating", "rating_sort", "model_id" ),
+    Index( "idx_model_deal_summary_brand", "brand" ),
+)
+
+
+# Last content hash and heartbeat of every scraped product ( change_detection.py )
+product_content_hash = Table(
+    "product_content_hash", metadata,
+    Column( "platform", String( 20 ), primary_key = True ),
+    Column( "product_id", String( 64 ), primary_key = True ),
+    Column( "content_hash", String( 16 ), nullable = False ),
+    Column( "changed_at", DateTime ),
+    Column( "last_seen", DateTime ),
+)
+
+
+# Same TV across platforms ( identity_resolution.py )
+canonical_model_map = Table(
+    "canonical_model_map", metadata,
+    Column( "platform", String( 20 ), primary_key = True ),
+    Column( "model_id", String( 100 ), primary_key = True ),
+    Column( "canonical_model_id", String( 100 ), nullable = False ),
+    Column( "group_size", Integer, nullable = False ),
+    Column( "match_score", Double ),
+    Index( "idx_canonical_model_map_canonical", "canonical_model_id" ),
+)
+
+
+# Watermarks of the incremental jobs
+etl_state = Table(
+    "etl_state", metadata,
+    Column( "job", String( 100 ), primary_key = True ),
+    Column( "watermark", DateTime ),
+    Column( "updated_at", DateTime ),
+)
+
+
+# Version stamp of the tables other processes cache ( the API's catalog snapshot ),
+# bumped by the ETL every time it changes one of them
+table_versions = Table(
+    "table_versions", metadata,
+    Column( "table_name", String( 100 ), primary_key = True ),
+    Column( "version", BigInteger, nullable = False ),
+    Column( "updated_at", DateTime ),
+)
+
+
+def ensure_table( engine, name ):
+    """
+    Create the table ( and its indexes ) if it does not exist yet. An old
+    to_sql table without the keys declared here is migrated to them, any
+    other existing table gets the nullable columns and the indexes declared
+    here since it was created
+    """
+    table = metadata.tables[ name ]
+    inspector = inspect( engine )
+    if not inspector.has_table( name ):
+        table.create( engine, checkfirst = True )
+        return table
+
+    if not has_managed_keys( engine, name ):
+        migrate_keys( engine, name )
+        return table
+
+    columns = { column[ "name" ] for column in inspector.get_columns( name ) }
+    missing = [ c for c in table.columns if c.name not in columns and c.nullable ]
+    if missing:
+        with engine.begin() as conn:
+            for column in missing:
+                conn.execute( text(
+                    f"ALTER TABLE { name } ADD COLUMN { column.name } { column.type.compile( dialect = engine.dialect ) }"
+                ))
+
+    existing = { index[ "name" ] for index in inspector.get_indexes( name ) }
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create( engine )
+    return table
+
+
+def has_managed_keys( engine, name ):
+    """
+    True when `name` exists with the primary key and unique constraints
+    declared here - False for a missing table or an old to_sql table
+    without keys
+    """
+    table = metadata.tables[ name ]
+    inspector = inspect( engine )
+    if not inspector.has_table( name ):
+        return False
+
+    primary_key = inspector.get_pk_constraint( name ).get( "constrained_columns" ) or []
+    if primary_key != [ c.name for c in table.primary_key.columns ]:
+        return False
+
+    unique = { tuple( u[ "column_names" ] ) for u in inspector.get_unique_constraints( name ) }
+    return all(
+        tuple( c.name for c in constraint.columns ) in unique
+        for constraint in table.constraints if isinstance( constraint, UniqueConstraint )
+    )
+
+
+def migrate_keys( engine, name ):
+    """
+    Copy an old to_sql table into the managed definition and swap it in.
+    Rows repeating a key are dropped - the newest scrape is kept where the
+    table has scraped_at - as are rows with NULL in a NOT NULL column.
+    Returns the number of rows kept
+    """
+    # etl_bulk imports this module
+    from etl_bulk import _create_shadow, _swap
+
+    table = metadata.tables[ name ]
+    shadow = f"{ name }__shadow"
+    old = { column[ "name" ] for column in inspect( engine ).get_columns( name ) }
+    columns = ", ".join( c.name for c in table.columns if c.name in old )
+    required = [ f"{ c.name } IS NOT NULL" for c in table.columns if c.name in old and not c.nullable ]
+    newest = "ORDER BY scraped_at DESC" if "scraped_at" in old else ""
+
+    _create_shadow( engine, name, shadow, None )
+    try:
+        with engine.begin() as conn:
+            ignore = "IGNORE" if engine.dialect.name == "mysql" else "OR IGNORE"
+            rows = conn.execute( text(
+                f"INSERT { ignore } INTO { shadow } ( { columns } ) "
+                f"SELECT { columns } FROM { name } WHERE { ' AND '.join( required ) or '1=1' } { newest }"
+            )).rowcount
+    except Exception:
+        with engine.begin() as conn:
+            conn.execute( text( f"DROP TABLE IF EXISTS { shadow }" ))
+        raise
+
+    _swap( engine, name, shadow )
+    print( f"{ name }: migrated to its managed keys, { rows } rows kept" )
+    return rows
+
+
+def _month_start( value ):
+    return value.replace( day = 1, hour = 0, minute = 0, second = 0, microsecond = 0 )
+
+def _next_month( value ):
+    return ( value.replace( day = 28 ) + timedelta( days = 4 )).replace( day = 1 )
+
+
+def ensure_monthly_partitions( engine, name, through ):
+    """
+    MySQL only - RANGE partition `name` by month of scraped_at, with partitions
+    up to the month of `through` and a catch-all pmax. Partitions that already
+    exist are kept, missing months are split out of pmax.
+    """
+    if engine.dialect.name != "mysql":
+        return
+
+    with engine.begin() as conn:
+        existing = [
+            row[0] for row in conn.execute( text( """
+                SELECT partition_name FROM information_schema.partitions
+                WHERE table_schema = DATABASE() AND table_name = :name
+                  AND partition_name IS NOT NULL
+            """ ), { "name": name })
+        ]
+
+        if existing:
+            month = datetime.strptime( max( p for p in existing if p != "pmax" ), "p%Y%m" )
+            month = _next_month( month )
+        else:
+            first = conn.execute( text( f"SELECT MIN( scraped_at ) FROM { name }" )).scalar()
+            month = _month_start( first or through )
+
+        partitions = []
+        while month <= _month_start( through ):
+            upper = _next_month( month )
+            partitions.append(
+                f"PARTITION p{ month:%Y%m} VALUES LESS THAN ( TO_DAYS( '{ upper:%Y-%m-%d}' ))"
+            )
+            month = upper
+
+        if existing and not partitions:
+            return
+        partitions_sql = ", ".join( partitions + [ "PARTITION pmax VALUES LESS THAN MAXVALUE" ] )
+
+        if existing:
+            conn.execute( text( f"ALTER TABLE { name } REORGANIZE PARTITION pmax INTO ( { partitions_sql } )" ))
+        else:
+            # every unique key of a partitioned table must contain the partition column
+            conn.execute( text( f"ALTER TABLE { name } DROP PRIMARY KEY, ADD PRIMARY KEY ( id, scraped_at )" ))
+            conn.execute( text( f"ALTER TABLE { name } PARTITION BY RANGE ( TO_DAYS( scraped_at )) ( { partitions_sql } )" ))
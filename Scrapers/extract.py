@@ -0,0 +1,138 @@
+'''
+Shared extraction layer for the Flipkart, Amazon and Croma scrapers
+
+1. Every regex is compiled once at import time instead of on every card / <li>
+2. Resolution and panel type are table driven - a table is an ordered list of
+   ( pattern, label ), the first pattern that matches wins, exactly like the
+   old if / elif chains. Every platform keeps its own table so its output
+   does not change
+3. Brand detection uses one alternation regex for all known brands instead of
+   building a new pattern per brand per card
+'''
+
+import re
+
+
+# =========================
+# COMMON PATTERNS
+# =========================
+NON_DIGIT_RE = re.compile( r"\D" )
+INT_RE = re.compile( r"\d+" )
+DECIMAL_RE = re.compile( r"\d+(\.\d+)?" )
+YEAR_RE = re.compile( r"\b(19|20)\d{2}\b" )
+
+# Flipkart card
+FLIPKART_SIZE_RE = re.compile( r'(\d{2,3})\s*[-"]?\s*(inch|inches|")' )
+FLIPKART_PID_RE = re.compile( r"pid=([A-Z0-9]+)" )
+MODEL_ID_RE = re.compile( r"Model\s*ID[:\s]*(.+)", re.I )
+SOUND_RE = re.compile( r"Total\s*Sound\s*Output[:\s]*(.+)", re.I )
+WARRANTY_RE = re.compile( r"Warranty", re.I )
+
+# Amazon card
+AMAZON_SIZE_INCH_RE = re.compile( r"(\d{2,3})\s*(inch|inches|\")" )
+AMAZON_SIZE_CM_RE = re.compile( r"(\d{2,3})\s*cm" )
+AMAZON_ASIN_RE = re.compile( r"/dp/([A-Z0-9]{10})" )
+TITLE_PUNCT_RE = re.compile( r"[()\[\],]" )
+DISCOUNT_RE = re.compile( "% off" )
+UNAVAILABLE_RE = re.compile( "unavailable", re.I )
+
+# Croma card
+CROMA_PID_RE = re.compile( r"/p/(\d+)" )
+CROMA_MODEL_LABEL_RE = re.compile( "Model Number", re.I )
+
+
+# =========================
+# CLASSIFIER TABLES
+# =========================
+def _table( rows, flags = re.I ):
+    return [ ( re.compile( pattern, flags ), label ) for pattern, label in rows ]
+
+FLIPKART_RESOLUTION = _table([
+    ( r"HD\s*Ready", "HD" ),
+    ( r"Full\s*HD", "Full HD" ),
+    ( r"Ultra\s*HD|\b4K\b", "4K" ),
+    ( r"\b8K\b", "8K" ),
+])
+
+FLIPKART_PANEL = _table([
+    ( r"Mini\s*LED", "Mini LED" ),
+    ( r"Neo\s*QLED", "Neo QLED" ),
+    ( r"\bQLED\b", "QLED" ),
+    ( r"\bOLED\b", "OLED" ),
+    ( r"Nano\s*Cell", "NanoCell" ),
+    ( r"\bLED\b", "LED" ),
+])
+
+AMAZON_RESOLUTION = _table([
+    ( r"8k|4320p|7680", "8K" ),
+    ( r"4k|ultra hd|uhd|2160p|3840", "4K" ),
+    ( r"full hd|fhd|1080p", "Full HD" ),
+    ( r"\bhd\b|720p", "HD" ),
+])
+
+AMAZON_PANEL = _table([
+    ( r"MINI LED", "Mini LED" ),
+    ( r"QLED", "QLED" ),
+    ( r"OLED", "OLED" ),
+    ( r"NANOCELL", "NanoCell" ),
+    ( r"ULED", "ULED" ),
+    ( r"CRYSTAL", "Crystal LED" ),
+    ( r"LED", "LED" ),
+])
+
+CROMA_RESOLUTION = _table([
+    ( r"\b8K\b", "8K" ),
+    ( r"ULTRA\s*HD|\b4K\b", "4K" ),
+    ( r"FULL\s*HD", "Full HD" ),
+    ( r"HD\s*READY|\bHD\b", "HD" ),
+])
+
+CROMA_PANEL = _table([
+    ( r"MINI\s*LED", "Mini LED" ),
+    ( r"QNED", "QNED" ),
+    ( r"QLED", "QLED" ),
+    ( r"OLED", "OLED" ),
+    ( r"NANOCELL", "NanoCell" ),
+    ( r"\bLED\b", "LED" ),
+])
+
+
+def classify( text, table, default = None ):
+    """Label of the first pattern in `table` found in `text`"""
+    if not text:
+        return default
+    for pattern, label in table:
+        if pattern.search( text ):
+            return label
+    return default
+
+
+# =========================
+# BRAND DETECTION
+# =========================
+class BrandMatcher:
+    """
+    Finds a known brand in a title with a single regex pass.
+    When several brands appear the longest one wins, like the old loop over
+    brands sorted by length.
+    """
+
+    def __init__( self, brands ):
+        self.brands = list( brands )
+        self.by_lower = {}
+        for b in self.brands:
+            self.by_lower.setdefault( b.lower(), b )
+        self.rank = { b: i for i, b in enumerate( self.by_lower ) }
+        alternation = "|".join(
+            re.escape( b ) for b in sorted( self.by_lower, key = len, reverse = True )
+        )
+        self.pattern = re.compile( rf"\b(?:{ alternation })\b" )
+
+    def find( self, title ):
+        if not title:
+            return None
+        found = { m.group( 0 ) for m in self.pattern.finditer( title.lower() ) }
+        if not found:
+            return None
+        best = min( found, key = lambda b: ( -len( b ), self.rank[ b ] ))
+        return self.by_lower[ best ]
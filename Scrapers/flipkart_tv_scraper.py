@@ -3,24 +3,42 @@
 2. Identify How to scrap the data without knowing that our scraper is a bot.
 3. To confuse Flipkart Bot Catcher, Take a link - That link should be like price range and sorting link, to behave not like bot
 4. Take Some price ranges
-5. use request.Session() to save cookies 
+5. use one shared http client ( fetch_engine.FetchEngine ) to save cookies 
 6. Take 1st price range - containing link
 7. Use span tag to find how many products( total_products) are there in that price range - for loop
 8. Then use math.ceil to find how many pages are there in that price cetagery using total_products / 24
 9. And Every page for all cetogeries has 24 constant products expect last page
 10. To get all the products for every page use a if condition like - The products of the current page is != 24 
-11. Try to fetch the page until product count of the current page == 24, using some delay for every time untill 5
+11. Try to fetch the page until product count of the current page == 24, untill 6 times
 12. Connect to Db and  Then Extract all the required data and append the data to db
+13. All price ranges and pages are fetched in parallel - a per host token bucket replaces the
+    fixed delays, so flipkart still sees the same request rate as a page by page crawl
+14. Finished ( price range, page ) units and stored product ids are checkpointed ( checkpoint.py )
+    once the writer committed their rows, a crawl that crashed is resumed where it stopped on the next start
+15. Distributed mode ( work_queue.py ): `plan` queues every ( price range, page ) unit, any number of
+    `work` processes on any host lease pages from the queue and write to the shared DB
 Note: Using price ranges and some sort by technique is manditory because our scraper 
     will be blocked if we take a single link and we can extract all the products.
 
 '''
 
 
-from bs4 import BeautifulSoup as bs
-import requests, time, re, random, math
+from parser_backend import make_soup
+import asyncio, os, re, random, math, sys
 from datetime import datetime
 import mysql.connector
+from fetch_engine import FetchEngine
+from db_writer import BufferedWriter
+from checkpoint import CrawlCheckpoint
+from work_queue import open_queue, run_worker, worker_name
+from parse_pool import ParsePipeline, parse_workers_from_env
+from extract import (
+    classify, FLIPKART_RESOLUTION, FLIPKART_PANEL, FLIPKART_SIZE_RE, FLIPKART_PID_RE,
+    MODEL_ID_RE, YEAR_RE, SOUND_RE, WARRANTY_RE, NON_DIGIT_RE
+)
+
+# Point this at a local fixture server to crawl recorded listing pages
+BASE_URL = os.getenv( "FLIPKART_BASE_URL", "https://www.flipkart.com" )
 
 def get_mysql_connection():
     return mysql.connector.connect(
@@ -28,7 +46,7 @@ def get_mysql_connection():
         user="root",
         password="Kpkr@153",
         database="colabcloud",
-        autocommit=True
+        autocommit=False
     )
 
 user_agents = [
@@ -54,10 +72,10 @@ price_ranges = [
     ( "60000+", 60000, "Max" ),
 ]
 
-def get_url( min_p, max_p, page ):
+def get_url( min_p, max_p, page, base = BASE_URL ):
     
     base_url = (
-        "https://www.flipkart.com/search?q=tv"
+        f"{ base }/search?q=tv"
         "&otracker=search&otracker1=search"
         "&marketplace=FLIPKART&as-show=on&as=off"
         "&sort=price_asc"
@@ -67,18 +85,6 @@ def get_url( min_p, max_p, page ):
     base_url += f"&page={ page }"
     return base_url
  
-def fetch_page( session, url, retries = 5 ):
-    for i in range( retries ):
-        try:
-            r = session.get( url, headers = get_headers(), timeout = 30 )
-            if r.status_code == 200:
-                return r
-            if r.status_code == 429:
-                time.sleep(( 2 ** i ) * 3)
-        except:
-            time.sleep(( 2 ** i ) * 2)
-    return None  
-
 def get_total_products_and_pages( soup, per_page = 24 ):
     span = soup.find( "span", class_ = "_Omnvo" )
     if not span:
@@ -91,23 +97,6 @@ def get_total_products_and_pages( soup, per_page = 24 ):
     total_pages = math.ceil( total_products / per_page )
     return total_products, total_pages
    
-def smart_delay( base = 2, end = 2 ):
-    time.sleep( base + random.uniform( 0, end ))
-    
-def scrap_page_until_last_product( session, url, expected_products_count, retry_page = 6 ):
-    for _ in range( retry_page ):
-        r = fetch_page( session, url )
-        # if r is none skip page
-        if not r:
-            continue
-        soup = bs( r.text, "lxml" )
-        cards = soup.find_all( "div", class_ = "nZIRY7" )
-        if len( cards ) == expected_products_count:
-            return soup, cards
-        # if len of cards != expected_products_count - then retry the page with 3 - 5 delay untill len of cards == 24
-        smart_delay( 3, 2 )
-    return soup, cards  
-
 def extract_product_details( tv ):
     
     title = tv.find( "div", class_ = "RG5Slk" )
@@ -116,13 +105,13 @@ def extract_product_details( tv ):
   
     brand = name.split()[0] if name and name.split() else None
     
-    i = re.search( r'(\d{2,3})\s*[-"]?\s*(inch|inches|")', name.lower() ) if name else None
+    i = FLIPKART_SIZE_RE.search( name.lower() ) if name else None
     size_of_screen = int( i.group(1) ) if i else None
     
     return title, name, brand, size_of_screen
 
 def extract_pid( url ):
-    m = re.search( r'pid=([A-Z0-9]+)', url )
+    m = FLIPKART_PID_RE.search( url )
     return m.group(1) if m else None
     
 def extract_product_url( tv ):
@@ -146,49 +135,29 @@ def extract_ul_list_details(tv):
         txt = li.get_text(strip=True)
 
         # Model ID
-        m = re.search(r"Model\s*ID[:\s]*(.+)", txt, re.I)
+        m = MODEL_ID_RE.search( txt )
         if m:
             model = m.group(1)
             continue
 
         # Launch Year
-        y = re.search(r"\b(19|20)\d{2}\b", txt)
+        y = YEAR_RE.search( txt )
         if "Launch Year" in txt and y:
             year = y.group(0)
             continue
 
-        # Screen Resolution (REGEX ONLY)
-        if re.search(r"HD\s*Ready", txt, re.I):
-            screen_resolution = "HD"
-        elif re.search(r"Full\s*HD", txt, re.I):
-            screen_resolution = "Full HD"
-        elif re.search(r"Ultra\s*HD|\b4K\b", txt, re.I):
-            screen_resolution = "4K"
-        elif re.search(r"\b8K\b", txt, re.I):
-            screen_resolution = "8K"
-
-        # Panel Technology (REGEX ONLY)
-        if re.search(r"Mini\s*LED", txt, re.I):
-            panel_technology = "Mini LED"
-        elif re.search(r"Neo\s*QLED", txt, re.I):
-            panel_technology = "Neo QLED"
-        elif re.search(r"\bQLED\b", txt, re.I):
-            panel_technology = "QLED"
-        elif re.search(r"\bOLED\b", txt, re.I):
-            panel_technology = "OLED"
-        elif re.search(r"Nano\s*Cell", txt, re.I):
-            panel_technology = "NanoCell"
-        elif re.search(r"\bLED\b", txt, re.I):
-            panel_technology = "LED"
+        # Screen Resolution and Panel Technology ( table driven, see extract.py )
+        screen_resolution = classify( txt, FLIPKART_RESOLUTION, screen_resolution )
+        panel_technology = classify( txt, FLIPKART_PANEL, panel_technology )
 
         # Sound
-        s = re.search(r"Total\s*Sound\s*Output[:\s]*(.+)", txt, re.I)
+        s = SOUND_RE.search( txt )
         if s:
             sound = s.group(1)
             continue
 
         # Warranty
-        if re.search(r"Warranty", txt, re.I):
+        if WARRANTY_RE.search( txt ):
             warranty = txt
 
     return model, year, screen_resolution, panel_technology, sound, warranty
@@ -202,7 +171,7 @@ def extract_prices( tv ):
     original_price = int(op.get_text(strip=True).replace("₹", "").replace(",", "")) if op else None
 
     dp = tv.find( "div", class_="HQe8jr" )
-    discount = int(re.sub(r"\D", "", dp.get_text())) if dp else None
+    discount = int(NON_DIGIT_RE.sub("", dp.get_text())) if dp else None
     return selling_price, original_price, discount
 
 def extract_assured_product( tv ):
@@ -218,17 +187,193 @@ def extract_ratings( tv ):
     rating_value = float(rv.get_text()) if rv else None
 
     rc = tv.find( "div", class_="a7saXW" )
-    rating_count = int(re.sub(r"\D", "", rc.get_text())) if rc else None
+    rating_count = int(NON_DIGIT_RE.sub("", rc.get_text())) if rc else None
     return rating_value, rating_count
 
-scraped_time = datetime.now().replace(second=0, microsecond=0)
+
+def find_cards( soup ):
+    return soup.find_all( "div", class_ = "nZIRY7" )
+
+card_class_re = re.compile( r'class="[^"]*\bnZIRY7\b' )
+
+def count_cards( html ):
+    # Cheap product count on the raw html, the real parse happens later ( maybe in another process )
+    return len( card_class_re.findall( html ))
+
+def parse_card( tv, scraped_time ):
+    
+    title, name, brand, size_of_screen = extract_product_details( tv )
+
+    product_url = extract_product_url( tv )
+    
+    pid = extract_pid( product_url ) if product_url else None
+
+    image_url = extract_image_url( tv )
+
+    model, year, screen_resolution, panel_technology, sound, warranty = extract_ul_list_details( tv )
+
+    selling_price, original_price, discount = extract_prices( tv )
+
+    assured = extract_assured_product( tv )
+    
+    unavailable = extract_unavailable_product( tv )
+
+    rating_value, rating_count = extract_ratings( tv )
+    
+    return (
+        "flipkart", pid,
+        brand, name, size_of_screen, model, year, screen_resolution, panel_technology, sound, warranty,
+        selling_price, original_price, discount, assured,
+        rating_value, rating_count,
+        product_url, image_url, unavailable,
+        scraped_time
+    )
+
+def parse_page( html, scraped_time ):
+    # Runs inline or inside a parse worker process - returns plain row tuples
+    soup = make_soup( html )
+    return [ parse_card( tv, scraped_time ) for tv in find_cards( soup ) ]
+
+async def fetch_listing_page( engine, url, expected_products_count = None, retry_page = 6 ):
+    # Every page except the last one must have 24 products - refetch until it does
+    # the token bucket spaces out the retries, no extra sleep needed
+    html = None
+    for _ in range( retry_page ):
+        page_html = await engine.fetch( url )
+        # if html is none skip page
+        if not page_html:
+            continue
+        html = page_html
+        if expected_products_count is None or count_cards( html ) == expected_products_count:
+            break
+    return html
+
+async def fetch_page_count( engine, lable, min_p, max_p ):
+    # Fetching the first page to know how many pages the range has
+    html = await engine.fetch( get_url( min_p, max_p, 1 ) )
+    # if all retries failed to load the page, we will skip that page / url & go to nxt 
+    if not html:
+        return None, None
+    
+    soup = make_soup( html )
     
-session = requests.Session()
-session.get( "https://www.flipkart.com", headers = get_headers() )
-smart_delay( 2, 1 )
+    total_products, total_pages = get_total_products_and_pages( soup )
+    if total_pages:
+        print( f"{lable}: Contains {total_pages} Pages with {total_products} Products" )
+    return html, total_pages
+
+async def crawl_price_range( engine, lable, min_p, max_p, handle_page, checkpoint = None ):
+
+    # Pages finished by an earlier attempt of this run are not fetched again
+    done = checkpoint.done_pages( lable ) if checkpoint else set()
+    planned = checkpoint.planned_pages( lable ) if checkpoint else 0
+    if planned and len( done ) >= planned:
+        print( f"{lable}: All {planned} Pages done in an earlier attempt" )
+        return 0
+
+    html = None
+    if planned:
+        # the page count is known from the earlier attempt
+        total_pages = planned
+    else:
+        html, total_pages = await fetch_page_count( engine, lable, min_p, max_p )
+        if not total_pages:
+            return 0
+        if checkpoint:
+            checkpoint.add_units(( lable, page ) for page in range( 1, total_pages + 1 ))
+
+    async def load( page ):
+        expected = 24 if page < total_pages else None
+        if page == 1 and html and ( expected is None or count_cards( html ) == expected ):
+            return page, html
+        return page, await fetch_listing_page( engine, get_url( min_p, max_p, page ), expected )
+
+    # All pages of the range are requested together - the engine keeps them polite
+    p = 0
+    pages = [ page for page in range( 1, total_pages + 1 ) if page not in done ]
+    for next_page in asyncio.as_completed([ load( page ) for page in pages ]):
+        page, page_html = await next_page
+        if not page_html:
+            continue
+        cards_count = count_cards( page_html )
+        print( f"{lable} Page {page}: {cards_count} Products" )
+        # handle_page marks the page in the checkpoint once its rows are with the
+        # writer, it is done with the writer's next commit
+        handle_page( lable, page, page_html )
+        p += cards_count
 
-conn = get_mysql_connection()
-cursor = conn.cursor()
+    # Total Products Scraped for the following price range
+    print( f"Total Products Scraped in {lable}: {p}" )
+    return p
+
+async def crawl( handle_page, checkpoint = None ):
+    async with FetchEngine( headers = get_headers ) as engine:
+        # Visit home page first to collect cookies like a normal browser
+        await engine.fetch( BASE_URL )
+        # Every price range is crawled in parallel
+        counts = await asyncio.gather(*[
+            crawl_price_range( engine, lable, min_p, max_p, handle_page, checkpoint )
+            for lable, min_p, max_p in price_ranges
+        ])
+    return sum( counts )
+
+# ---------------- distributed crawl ( work_queue.py ) ----------------
+# Requests per second of one worker process - every worker has its own bucket
+WORKER_RATE = float( os.getenv( "FLIPKART_WORKER_RATE", "0.4" ))
+# Pages one worker leases and fetches together
+WORKER_BATCH = int( os.getenv( "FLIPKART_WORKER_BATCH", "4" ))
+
+async def plan( queue ):
+    # Planner - count the pages of every price range and queue one unit per page
+    scraped_time = datetime.now().replace( second = 0, microsecond = 0 )
+    async with FetchEngine( headers = get_headers ) as engine:
+        await engine.fetch( BASE_URL )
+        counts = await asyncio.gather(*[
+            fetch_page_count( engine, lable, min_p, max_p ) for lable, min_p, max_p in price_ranges
+        ])
+
+    units = []
+    for ( lable, min_p, max_p ), ( _, total_pages ) in zip( price_ranges, counts ):
+        for page in range( 1, ( total_pages or 0 ) + 1 ):
+            units.append(( f"{lable}:{page}", {
+                "lable": lable, "min_p": min_p, "max_p": max_p,
+                "page": page, "total_pages": total_pages, "scraped_at": scraped_time
+            }))
+    queued = queue.enqueue( units )
+    print( f"Queued {queued} pages of {len( price_ranges )} price ranges" )
+    return queued
+
+async def work( queue, write_rows, flush = None, worker = None ):
+    # Worker - run_worker ( work_queue.py ) leases the pages and completes them once
+    # the writer committed their rows, the pages of a lease are fetched together here
+    worker = worker or worker_name()
+    loop = asyncio.get_running_loop()
+    async with FetchEngine( rate = WORKER_RATE, headers = get_headers ) as engine:
+        await engine.fetch( BASE_URL )
+
+        async def load( task ):
+            unit = task.payload
+            expected = 24 if unit[ "page" ] < unit[ "total_pages" ] else None
+            return task, await fetch_listing_page( engine, get_url( unit[ "min_p" ], unit[ "max_p" ], unit[ "page" ] ), expected )
+
+        async def load_all( tasks ):
+            return await asyncio.gather(*[ load( task ) for task in tasks ])
+
+        def handle( tasks ):
+            # runs in run_worker's thread, the fetches run on this event loop with the shared engine
+            done = {}
+            for task, html in asyncio.run_coroutine_threadsafe( load_all( tasks ), loop ).result():
+                if not html:
+                    continue
+                rows = parse_page( html, datetime.fromisoformat( task.payload[ "scraped_at" ] ))
+                write_rows( rows )
+                done[ task.id ] = len( rows )
+                print( f"{worker} {task.unit}: {len( rows )} Products" )
+            if flush:
+                flush()
+            return done
+
+        return await asyncio.to_thread( run_worker, queue, handle, WORKER_BATCH, worker )
 
 insert_sql = """
 INSERT INTO flipkart_products_new (
@@ -240,85 +385,71 @@ INSERT INTO flipkart_products_new (
 ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
 """
 
-total_products_scraped = 0 
-
-# Getting min and max price form price_ranges 
-for lable, min_p, max_p in price_ranges:
-    
-    print( f"\nScraping {lable}" )
-    
-    # Making the complete url
-    price_range_url = get_url( min_p, max_p, 1 )
-    
-    # Fetching the page 
-    r = fetch_page( session, price_range_url )
-    # if all retries failed to load the page, we will skip that page / url & go to nxt 
-    if not r:
-        continue
-    
-    soup = bs( r.text, "lxml" )
-    
-    total_products, total_pages = get_total_products_and_pages( soup )
-    if not total_pages:
-        continue
-    print( f"Contains {total_pages} Pages with {total_products} Products" )
-    p = 0
-    
-    for page in range( 1, total_pages + 1 ):
-        url = get_url( min_p, max_p, page )
-        
-        if page < total_pages:
-            soup, cards = scrap_page_until_last_product( session, url, 24 )
+def main():
+    # A crashed crawl is resumed - same scraped_at, finished pages and stored products are skipped
+    checkpoint = CrawlCheckpoint( "flipkart" )
+    scraped_time = checkpoint.scraped_at
+
+    conn = get_mysql_connection()
+
+    def write_rows( rows ):
+        # platform_product_id is the second column, a product already stored in this run is skipped
+        writer.add_many( checkpoint.new_rows( rows, 1 ))
+
+    # Rows are buffered and written in batches of 250 inside one transaction each,
+    # anything left in the buffer is written even if the crawl stops with an error.
+    # Products and pages are checkpointed after the commit that stored their rows
+    with BufferedWriter(
+        conn, insert_sql, batch_size = 250, on_flush = lambda rows: checkpoint.committed( rows, 1 )
+    ) as writer:
+
+        # Pipeline mode ( SCRAPER_PARSE_WORKERS=n ) - pages are parsed by n worker processes
+        # while the fetcher keeps downloading, the writer stays the only DB user
+        workers = parse_workers_from_env()
+        if workers:
+            with ParsePipeline( parse_page, write_rows, workers = workers ) as pipeline:
+
+                def handle_page( lable, page, html ):
+                    pipeline.submit(
+                        html, scraped_time,
+                        after = lambda rows: checkpoint.unit_written( lable, page, len( rows ))
+                    )
+
+                total_products_scraped = asyncio.run( crawl( handle_page, checkpoint ) )
         else:
-            r = fetch_page( session, url )
-            soup = bs( r.text, "lxml" )
-            cards = soup.find_all( "div", class_ = "nZIRY7" )
-        print( f"Page {page}: {len(cards)} Products" )
-        
-        for tv in cards:
-
-            title, name, brand, size_of_screen = extract_product_details( tv )
-
-            product_url = extract_product_url( tv )
-            
-            pid = extract_pid( product_url )
-
-            image_url = extract_image_url( tv )
-
-            model, year, screen_resolution, panel_technology, sound, warranty = extract_ul_list_details( tv )
-
-            selling_price, original_price, discount = extract_prices( tv )
-
-            assured = extract_assured_product( tv )
-            
-            unavailable = extract_unavailable_product( tv )
-
-            rating_value, rating_count = extract_ratings( tv )
-            
-            cursor.execute(
-                insert_sql,
-                (
-                    "flipkart", pid,
-                    brand, name, size_of_screen, model, year, screen_resolution, panel_technology, sound, warranty,
-                    selling_price, original_price, discount, assured,
-                    rating_value, rating_count,
-                    product_url, image_url, unavailable,
-                    scraped_time
-                )
-            )
-        p += len(cards)
-             
-        # DELAY FOR EVERY PAGE FOR 2 - 3 SECONDS 
-        smart_delay( 2, 1 )
-        
-    # Total Products Scraped for the following price range
-    print(f"Total Products Scraped in {lable}: {p}")
-    total_products_scraped += p   
-    
-    # DELAY FOR EVERY Price range FOR 5 - 8 SECONDS
-    smart_delay( 5, 3 )
-    
-cursor.close()
-conn.close()
 
-print( f"\nScraping Completed & Total Products Scraped are : {total_products_scraped}" )  
\ No newline at end of file
+            def handle_page( lable, page, html ):
+                rows = parse_page( html, scraped_time )
+                write_rows( rows )
+                checkpoint.unit_written( lable, page, len( rows ))
+
+            total_products_scraped = asyncio.run( crawl( handle_page, checkpoint ) )
+
+    conn.close()
+    checkpoint.finish()
+    checkpoint.close()
+
+    print( f"\nScraping Completed & Total Products Scraped are : {total_products_scraped}" )
+    print( f"Rows written: {writer.written} in {writer.commits} commits" )
+
+def main_distributed( mode ):
+    # python flipkart_tv_scraper.py plan - queue the pages of a new crawl
+    # python flipkart_tv_scraper.py work - run one worker, start as many as wanted on any host
+    queue = open_queue( "flipkart", get_mysql_connection )
+    if mode == "plan":
+        queue.clear()
+        asyncio.run( plan( queue ))
+    else:
+        conn = get_mysql_connection()
+        with BufferedWriter( conn, insert_sql, batch_size = 250 ) as writer:
+            pages = asyncio.run( work( queue, writer.add_many, writer.flush ))
+        conn.close()
+        print( f"Pages done by this worker: {pages}  Rows written: {writer.written}" )
+    print( f"Queue: {queue.counts()}" )
+    queue.close()
+
+if __name__ == "__main__":
+    if len( sys.argv ) > 1 and sys.argv[1] in ( "plan", "work" ):
+        main_distributed( sys.argv[1] )
+    else:
+        main()
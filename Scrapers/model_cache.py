@@ -0,0 +1,58 @@
+'''
+Persistent product_id -> model_number cache for the Croma deep scrape
+
+1. Stored in a small local SQLite file, so it survives between runs
+2. Before the deep scrape the listings are checked against the cache, only
+   new products or products older than ttl_days open their product page
+3. After a product page is scraped its model number is saved again, which
+   also refreshes its age
+'''
+
+import sqlite3, threading
+from datetime import datetime, timedelta
+
+
+class ModelNumberCache:
+
+    def __init__( self, path = "croma_model_cache.sqlite", ttl_days = 7 ):
+        self.ttl = timedelta( days = ttl_days )
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect( path, check_same_thread = False )
+        self.conn.execute( """
+            CREATE TABLE IF NOT EXISTS model_numbers (
+                product_id   TEXT PRIMARY KEY,
+                model_number TEXT NOT NULL,
+                verified_at  TEXT NOT NULL
+            )
+        """ )
+        self.conn.commit()
+
+    def fresh( self, product_ids ):
+        """model numbers of the given products that were verified within the TTL"""
+        oldest = ( datetime.now() - self.ttl ).isoformat( sep = " " )
+        found = {}
+        ids = list( product_ids )
+        with self.lock:
+            # stay below SQLite's bound parameter limit
+            for i in range( 0, len( ids ), 500 ):
+                chunk = ids[ i:i + 500 ]
+                rows = self.conn.execute(
+                    f"SELECT product_id, model_number FROM model_numbers "
+                    f"WHERE verified_at >= ? AND product_id IN ({ ','.join( '?' * len( chunk )) })",
+                    [ oldest, *chunk ]
+                )
+                found.update( rows )
+        return found
+
+    def put_many( self, items ):
+        """items - ( product_id, model_number ) pairs"""
+        now = datetime.now().isoformat( sep = " " )
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO model_numbers VALUES (?, ?, ?)",
+                [ ( pid, model, now ) for pid, model in items ]
+            )
+            self.conn.commit()
+
+    def close( self ):
+        self.conn.close()
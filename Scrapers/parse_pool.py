@@ -0,0 +1,69 @@
+'''
+Parse worker pool shared by the scrapers ( pipeline mode )
+
+1. Fetchers only download pages and push the raw html bytes with submit()
+2. A ProcessPoolExecutor of parse workers runs BeautifulSoup + the extract_*
+   helpers, so parsing uses every core instead of blocking the fetcher
+3. Workers return plain row tuples, one writer thread hands them to the
+   single DB / CSV writer in the same order the pages were submitted.
+   submit( ..., after = f ) calls f( rows ) once the page's rows are with
+   the writer ( the checkpoint marks the page there )
+4. The pending queue is bounded, a fetcher waits when parsing falls behind
+
+parse_page must be a top level function of an importable module, it is
+called as parse_page( html_bytes, *args ) inside the worker process.
+'''
+
+import os, queue, threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+def parse_workers_from_env( default = 0 ):
+    """SCRAPER_PARSE_WORKERS=n turns pipeline mode on with n parse processes"""
+    return int( os.getenv( "SCRAPER_PARSE_WORKERS", default ))
+
+
+class ParsePipeline:
+
+    def __init__( self, parse_page, write_rows, workers = None, max_pending = 64 ):
+        self.parse_page = parse_page
+        self.write_rows = write_rows
+        self.executor = ProcessPoolExecutor( max_workers = workers )
+        self.pending = queue.Queue( maxsize = max_pending )
+        self.rows_written = 0
+        self.errors = 0
+        self.writer = threading.Thread( target = self._drain, daemon = True )
+        self.writer.start()
+
+    def submit( self, html, *args, after = None ):
+        if isinstance( html, str ):
+            html = html.encode( "utf-8" )
+        self.pending.put(( self.executor.submit( self.parse_page, html, *args ), after ))
+
+    def _drain( self ):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            future, after = item
+            try:
+                rows = future.result()
+                self.write_rows( rows )
+                self.rows_written += len( rows )
+                if after:
+                    after( rows )
+            except Exception as e:
+                self.errors += 1
+                print( f"Parse worker failed: {e}" )
+
+    def close( self ):
+        """Wait until every submitted page is parsed and written"""
+        self.pending.put( None )
+        self.writer.join()
+        self.executor.shutdown()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        self.close()
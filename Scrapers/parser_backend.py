@@ -0,0 +1,112 @@
+'''
+Pluggable HTML parser backend for the scrapers
+
+1. SCRAPER_PARSER=bs4 ( default ) builds a full BeautifulSoup tree like before
+2. SCRAPER_PARSER=lxml parses with lxml.html and wraps the elements in LxmlNode
+3. LxmlNode answers the small part of the BeautifulSoup API the extract_*
+   helpers use ( find, find_all, get_text, select_one, [ "attr" ] ... ) with
+   cached XPath queries, so every extract_* function keeps its signature and
+   works with both backends
+'''
+
+import os
+
+PARSER = os.getenv( "SCRAPER_PARSER", "bs4" )
+
+
+def make_soup( html, parser = None, features = "lxml" ):
+    """Parse a page with the configured backend ( features is only used by bs4 )"""
+    parser = parser or PARSER
+    if parser == "lxml":
+        import lxml.html
+        if isinstance( html, str ):
+            html = html.encode( "utf-8" )
+        return LxmlNode( lxml.html.fromstring( html ))
+    from bs4 import BeautifulSoup
+    return BeautifulSoup( html, features )
+
+
+_xpath_cache = {}
+
+def _xpath( name, class_, attrs ):
+    key = ( name, class_, tuple( sorted( attrs.items() )))
+    query = _xpath_cache.get( key )
+    if query is None:
+        from lxml import etree
+        path = f".//{ name or '*' }"
+        if class_:
+            if " " in class_:
+                # bs4 compares a class string with spaces against the whole attribute
+                path += f"[@class='{ class_ }']"
+            else:
+                path += f"[contains(concat(' ', normalize-space(@class), ' '), ' { class_ } ')]"
+        for attr, value in sorted( attrs.items() ):
+            path += f"[@{ attr }]" if value is True else f"[@{ attr }='{ value }']"
+        query = _xpath_cache[ key ] = etree.XPath( path )
+    return query
+
+
+class LxmlNode:
+    """BeautifulSoup look-alike around one lxml element"""
+
+    __slots__ = ( "el", )
+
+    def __init__( self, el ):
+        self.el = el
+
+    def find_all( self, name = None, attrs = None, class_ = None, string = None, limit = None, **kwargs ):
+        attrs = { **( attrs or {} ), **kwargs }
+        if "class" in attrs:
+            class_ = attrs.pop( "class" )
+        found = []
+        for el in _xpath( name, class_, attrs )( self.el ):
+            # like bs4, string= only matches elements holding a single text node
+            if string is not None and ( len( el ) or not string.search( el.text or "" )):
+                continue
+            found.append( LxmlNode( el ))
+            if limit and len( found ) >= limit:
+                break
+        return found
+
+    def find( self, name = None, attrs = None, class_ = None, string = None, **kwargs ):
+        found = self.find_all( name, attrs, class_, string, limit = 1, **kwargs )
+        return found[0] if found else None
+
+    def select( self, css ):
+        return [ LxmlNode( el ) for el in self.el.cssselect( css ) ]
+
+    def select_one( self, css ):
+        found = self.el.cssselect( css )
+        return LxmlNode( found[0] ) if found else None
+
+    def find_parent( self, name = None ):
+        el = self.el.getparent()
+        while el is not None and name and el.tag != name:
+            el = el.getparent()
+        return LxmlNode( el ) if el is not None else None
+
+    def find_next_sibling( self, name = None ):
+        el = self.el.getnext()
+        while el is not None and name and el.tag != name:
+            el = el.getnext()
+        return LxmlNode( el ) if el is not None else None
+
+    def get_text( self, separator = "", strip = False ):
+        parts = self.el.itertext()
+        if strip:
+            parts = ( p.strip() for p in parts )
+            parts = [ p for p in parts if p ]
+        return separator.join( parts )
+
+    @property
+    def text( self ):
+        return self.get_text()
+
+    def get( self, key, default = None ):
+        return self.el.get( key, default )
+
+    def __getitem__( self, key ):
+        value = self.el.get( key )
+        if value is None:
+            raise KeyError( key )
+        return value
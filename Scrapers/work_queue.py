@@ -0,0 +1,256 @@
+'''
+Crawl work queue shared by scraper processes and hosts
+
+1. A planner enqueues the crawl units of a run - ( price range, page ) for
+   Flipkart and Amazon, one product page for Croma - as rows of the
+   crawl_queue table, a unit key is only queued once
+2. Any number of workers lease units. A lease hides the unit from the other
+   workers for visibility_timeout seconds, a worker that dies simply lets
+   the lease run out and the unit is handed out again
+3. A worker completes its units once their rows are committed by its DB
+   writer, a unit that failed is released for another attempt, after
+   max_attempts it is parked as failed
+4. SqliteWorkQueue is for worker processes on one machine, MySQLWorkQueue
+   puts the table in the shared MySQL database so workers on several hosts
+   can pull from it ( SELECT ... FOR UPDATE SKIP LOCKED, MySQL 8 )
+
+checkpoint.py resumes a single crawl process, this queue spreads one crawl
+over many. Every worker process has its own politeness bucket, N workers
+against one site send N times the request rate of one.
+
+Backend selection ( open_queue ):
+    CRAWL_QUEUE=sqlite ( default, file CRAWL_QUEUE_PATH=crawl_queue.sqlite )
+    CRAWL_QUEUE=mysql  ( the scraper's own MySQL connection )
+'''
+
+import json, os, socket, sqlite3, threading, time
+from collections import namedtuple
+
+QUEUE_BACKEND = os.getenv( "CRAWL_QUEUE", "sqlite" )
+QUEUE_PATH = os.getenv( "CRAWL_QUEUE_PATH", "crawl_queue.sqlite" )
+VISIBILITY_TIMEOUT = int( os.getenv( "CRAWL_VISIBILITY_TIMEOUT", "600" ))
+MAX_ATTEMPTS = int( os.getenv( "CRAWL_MAX_ATTEMPTS", "5" ))
+
+Task = namedtuple( "Task", [ "id", "unit", "payload", "attempts" ])
+
+
+def worker_name():
+    return f"{ socket.gethostname() }-{ os.getpid() }"
+
+
+class WorkQueue:
+    """Table backed queue, subclasses only differ in SQL dialect"""
+
+    placeholder = "?"
+    now = None
+    ddl = ()
+    insert_ignore = None
+    lock_rows = ""
+    begin = None
+
+    def __init__( self, conn, name, visibility_timeout = VISIBILITY_TIMEOUT, max_attempts = MAX_ATTEMPTS ):
+        self.conn = conn
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        cursor = self.conn.cursor()
+        for statement in self.ddl:
+            cursor.execute( statement )
+        self.conn.commit()
+
+    def _sql( self, sql ):
+        return sql.replace( "?", self.placeholder ).replace( "{now}", self.now )
+
+    def _in( self, ids ):
+        return ", ".join( [ self.placeholder ] * len( ids ))
+
+    def enqueue( self, units ):
+        """units - ( unit key, payload dict ) pairs, returns how many were new"""
+        rows = [ ( self.name, unit, json.dumps( payload, default = str )) for unit, payload in units ]
+        if not rows:
+            return 0
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.executemany( self._sql( self.insert_ignore ), rows )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def lease( self, worker = None, limit = 1 ):
+        """Lease up to `limit` units for `worker`, [] when nothing is available"""
+        worker = worker or worker_name()
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                if self.begin:
+                    cursor.execute( self.begin )
+                cursor.execute(
+                    self._sql(
+                        "SELECT id FROM crawl_queue WHERE queue = ? AND attempts < ? AND "
+                        "( status = 'pending' OR ( status = 'leased' AND lease_until < {now} )) "
+                        f"ORDER BY id LIMIT ? { self.lock_rows }"
+                    ),
+                    ( self.name, self.max_attempts, limit )
+                )
+                ids = [ row[0] for row in cursor.fetchall() ]
+                if ids:
+                    cursor.execute(
+                        self._sql(
+                            "UPDATE crawl_queue SET status = 'leased', worker = ?, attempts = attempts + 1, "
+                            f"lease_until = {{now}} + ? WHERE id IN ( { self._in( ids ) } )"
+                        ),
+                        ( worker, self.visibility_timeout, *ids )
+                    )
+                    cursor.execute(
+                        self._sql( f"SELECT id, unit, payload, attempts FROM crawl_queue WHERE id IN ( { self._in( ids ) } ) ORDER BY id" ),
+                        ids
+                    )
+                    tasks = [ Task( i, unit, json.loads( payload ), attempts ) for i, unit, payload, attempts in cursor.fetchall() ]
+                else:
+                    tasks = []
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return tasks
+
+    def _update( self, sql, ids, *params ):
+        if not ids:
+            return
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute( self._sql( sql.format( ids = self._in( ids ), now = "{now}" )), ( *params, *ids ))
+            self.conn.commit()
+
+    def complete( self, task_ids ):
+        self._update( "UPDATE crawl_queue SET status = 'done', lease_until = NULL WHERE id IN ( {ids} )", list( task_ids ))
+
+    def release( self, task_ids, error = None ):
+        """Give units back for another attempt, failed once they used max_attempts"""
+        self._update(
+            "UPDATE crawl_queue SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_until = NULL, error = ? WHERE id IN ( {ids} )",
+            list( task_ids ), self.max_attempts, error
+        )
+
+    def extend( self, task_ids ):
+        """Keep the lease of units that take longer than the visibility timeout"""
+        self._update( "UPDATE crawl_queue SET lease_until = {now} + ? WHERE id IN ( {ids} )", list( task_ids ), self.visibility_timeout )
+
+    def counts( self ):
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute( self._sql( "SELECT status, COUNT(*) FROM crawl_queue WHERE queue = ? GROUP BY status" ), ( self.name, ))
+            found = dict( cursor.fetchall() )
+            self.conn.commit()
+        return found
+
+    def clear( self ):
+        """Drop every unit of this queue - a planner starting a new crawl"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute( self._sql( "DELETE FROM crawl_queue WHERE queue = ?" ), ( self.name, ))
+            self.conn.commit()
+
+    def close( self ):
+        self.conn.close()
+
+
+class SqliteWorkQueue( WorkQueue ):
+
+    now = "(( julianday( 'now' ) - 2440587.5 ) * 86400.0 )"
+    insert_ignore = "INSERT OR IGNORE INTO crawl_queue ( queue, unit, payload ) VALUES ( ?, ?, ? )"
+    # takes the write lock first, two processes never lease the same unit
+    begin = "BEGIN IMMEDIATE"
+    ddl = (
+        """
+        CREATE TABLE IF NOT EXISTS crawl_queue (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            queue       TEXT NOT NULL,
+            unit        TEXT NOT NULL,
+            payload     TEXT NOT NULL,
+            status      TEXT NOT NULL DEFAULT 'pending',
+            attempts    INTEGER NOT NULL DEFAULT 0,
+            worker      TEXT,
+            lease_until REAL,
+            error       TEXT,
+            UNIQUE ( queue, unit )
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_crawl_queue_status ON crawl_queue ( queue, status, id )",
+    )
+
+    def __init__( self, name, path = QUEUE_PATH, **kwargs ):
+        conn = sqlite3.connect( path, check_same_thread = False, timeout = 30 )
+        super().__init__( conn, name, **kwargs )
+
+
+class MySQLWorkQueue( WorkQueue ):
+
+    placeholder = "%s"
+    now = "UNIX_TIMESTAMP( NOW( 6 ))"
+    insert_ignore = "INSERT IGNORE INTO crawl_queue ( queue, unit, payload ) VALUES ( ?, ?, ? )"
+    # a worker skips the rows another worker is leasing right now instead of waiting
+    lock_rows = "FOR UPDATE SKIP LOCKED"
+    ddl = (
+        """
+        CREATE TABLE IF NOT EXISTS crawl_queue (
+            id          BIGINT AUTO_INCREMENT PRIMARY KEY,
+            queue       VARCHAR( 50 ) NOT NULL,
+            unit        VARCHAR( 255 ) NOT NULL,
+            payload     TEXT NOT NULL,
+            status      VARCHAR( 10 ) NOT NULL DEFAULT 'pending',
+            attempts    INT NOT NULL DEFAULT 0,
+            worker      VARCHAR( 100 ),
+            lease_until DOUBLE,
+            error       TEXT,
+            UNIQUE KEY uq_crawl_queue_unit ( queue, unit ),
+            KEY idx_crawl_queue_status ( queue, status, id )
+        )
+        """,
+    )
+
+    def __init__( self, name, connect, **kwargs ):
+        super().__init__( connect(), name, **kwargs )
+
+
+def open_queue( name, mysql_connect = None ):
+    """The queue of one scraper, CRAWL_QUEUE picks the backend"""
+    if QUEUE_BACKEND == "mysql":
+        if mysql_connect is None:
+            raise ValueError( f"CRAWL_QUEUE=mysql needs a MySQL connection for the {name} queue" )
+        return MySQLWorkQueue( name, mysql_connect )
+    return SqliteWorkQueue( name )
+
+
+def run_worker( queue, handle, batch = 1, worker = None, wait_seconds = 0 ):
+    """
+    Lease `batch` units at a time and hand them to handle( tasks ), which
+    returns { task id: rows } for the units it finished - after their rows
+    are committed. The rest of the batch is released for another attempt.
+    Stops when the queue is empty, or keeps polling for wait_seconds.
+    Returns the number of finished units.
+    """
+    worker = worker or worker_name()
+    finished = 0
+    idle_since = None
+    while True:
+        tasks = queue.lease( worker, batch )
+        if not tasks:
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since >= wait_seconds:
+                return finished
+            time.sleep( 1 )
+            continue
+        idle_since = None
+
+        try:
+            done = handle( tasks ) or {}
+        except Exception as e:
+            print( f"Worker {worker} failed on {len( tasks )} units: {e}" )
+            queue.release([ t.id for t in tasks ], repr( e ))
+            continue
+
+        queue.complete( done )
+        queue.release([ t.id for t in tasks if t.id not in done ], "no result" )
+        finished += len( done )
@@ -3,6 +3,7 @@ Admin Dashboard API Routes
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func
 from datetime import datetime, timedelta, timezone
@@ -10,6 +11,7 @@ from datetime import datetime, timedelta, timezone
 from db import get_db
 from models import User, Wishlist, PriceAlert, AlertNotification, UserRole
 from auth.dependencies import require_admin
+from pagination import encode_cursor, decode_cursor, keyset_filter
 
 router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 
@@ -117,10 +119,14 @@ async def get_users(
     search: str = None,
     role: str = None,
     verified: bool = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    """Get paginated list of users"""
+    """
+    Get paginated list of users, newest first.
+    Pass next_cursor of a page as `cursor` for the next one, `page` still works.
+    """
     
     query = db.query(User)
     
@@ -138,9 +144,19 @@ async def get_users(
     
     total = query.count()
     
-    users = query.order_by(User.created_at.desc()).offset(
-        (page - 1) * page_size
-    ).limit(page_size).all()
+    # newest first, id breaks ties - the order of idx_users_created
+    query = query.order_by(User.created_at.desc(), User.id.desc())
+    if cursor:
+        query = query.filter(
+            keyset_filter([User.created_at, User.id], decode_cursor(cursor, ("created_at", "desc")), descending=True)
+        )
+    else:
+        query = query.offset((page - 1) * page_size)
+    users = query.limit(page_size).all()
+
+    next_cursor = None
+    if len(users) == page_size:
+        next_cursor = encode_cursor(("created_at", "desc"), (users[-1].created_at, users[-1].id))
     
     return {
         "users": [
@@ -160,7 +176,8 @@ async def get_users(
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": (total + page_size - 1) // page_size,
+        "next_cursor": next_cursor
     }
 
 
@@ -0,0 +1,107 @@
+"""
+Search latency benchmark - the old LIKE query against search_index.py
+
+1. A synthetic catalog shaped like tv_platform_latest_master ( brands,
+   model codes, names, display types ) is built at 10x, 100x and 1000x
+   BENCH_BASE_ROWS rows ( default 500, about today's catalog )
+2. The old /products/search query - LOWER( col ) LIKE '%q%' over four
+   columns, ORDER BY sale_price LIMIT 50 - runs on an in-memory SQLite copy
+3. The same queries run against a SearchIndex built over the same rows
+4. p50 / p95 per query in milliseconds, plus the index build time
+
+SQLite stands in for MySQL, both have to scan every row for a leading % LIKE.
+
+Usage:
+    python bench_search.py
+    BENCH_BASE_ROWS=300 BENCH_SCALES=10,100 python bench_search.py
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import time
+
+from search_index import SearchIndex
+
+BASE_ROWS = int(os.getenv("BENCH_BASE_ROWS", "500"))
+SCALES = [int(n) for n in os.getenv("BENCH_SCALES", "10,100,1000").split(",")]
+REPEAT = int(os.getenv("BENCH_REPEAT", "20"))
+
+BRANDS = ["Samsung", "LG", "Sony", "TCL", "Xiaomi", "OnePlus", "Hisense", "Vu", "Acer", "Panasonic"]
+SERIES = {"Samsung": "UA", "LG": "OLED", "Sony": "KD", "TCL": "P", "Xiaomi": "L", "OnePlus": "Y",
+          "Hisense": "E", "Vu": "GloLED", "Acer": "AR", "Panasonic": "TH"}
+DISPLAY_TYPES = ["LED", "QLED", "OLED", "Mini LED", "Neo QLED"]
+SIZES = [32, 43, 50, 55, 65, 75, 85]
+PLATFORMS = ["amazon", "flipkart", "Croma"]
+
+QUERIES = ["samsung", "55", "oled", "ua55", "sony 65 4k", "samsng"]
+
+COLUMNS = ["platform", "model_id", "brand", "full_name", "display_type", "sale_price", "original_cost"]
+
+LIKE_SQL = """
+    SELECT platform, model_id FROM catalog
+    WHERE sale_price > 0 AND original_cost > 0
+      AND (LOWER(brand) LIKE :q OR LOWER(full_name) LIKE :q
+           OR LOWER(display_type) LIKE :q OR LOWER(model_id) LIKE :q)
+    ORDER BY sale_price ASC
+    LIMIT 50
+"""
+
+
+def synthetic_catalog(rows, seed=7):
+    rng = random.Random(seed)
+    catalog = []
+    for n in range(rows):
+        brand = rng.choice(BRANDS)
+        size = rng.choice(SIZES)
+        display_type = rng.choice(DISPLAY_TYPES)
+        model_id = f"{SERIES[brand]}{size}{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}{rng.randint(1000, 9999)}{n % 97}"
+        full_name = f"{brand} {size} inch {rng.choice(['4K Ultra HD', 'Full HD', '8K'])} Smart {display_type} TV {model_id}"
+        sale_price = float(rng.randint(9000, 300000))
+        catalog.append((
+            PLATFORMS[n % 3], model_id, brand, full_name, display_type,
+            sale_price, round(sale_price * rng.uniform(1.05, 1.8)),
+        ))
+    return catalog
+
+
+def timed(func, repeat=REPEAT):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append((time.perf_counter() - start) * 1000)
+    seconds.sort()
+    return statistics.median(seconds), seconds[int(len(seconds) * 0.95) - 1]
+
+
+def run_scale(scale):
+    rows = synthetic_catalog(BASE_ROWS * scale)
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE catalog ({', '.join(COLUMNS)})")
+    conn.executemany(f"INSERT INTO catalog VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+    conn.execute("CREATE INDEX idx_catalog_sale_price ON catalog (sale_price)")
+
+    start = time.perf_counter()
+    columns = dict(zip(COLUMNS, zip(*rows)))
+    index = SearchIndex(columns, range(len(rows)))
+    build = time.perf_counter() - start
+
+    print(f"\n{len(rows):,} rows ({scale}x) - index built in {build:.2f}s")
+    print(f"{'query':<14}{'LIKE p50':>10}{'p95':>9}{'index p50':>11}{'p95':>9}{'speedup':>9}{'hits':>7}")
+    for q in QUERIES:
+        like_repeat = max(3, REPEAT // scale)
+        like_p50, like_p95 = timed(
+            lambda: conn.execute(LIKE_SQL.replace(":q", "?"), (f"%{q}%",) * 4).fetchall(), like_repeat
+        )
+        index_p50, index_p95 = timed(lambda: index.search(q))
+        hits = len(index.search(q))
+        print(f"{q:<14}{like_p50:10.2f}{like_p95:9.2f}{index_p50:11.2f}{index_p95:9.2f}{like_p50 / index_p50:8.1f}x{hits:7}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    for scale in SCALES:
+        run_scale(scale)
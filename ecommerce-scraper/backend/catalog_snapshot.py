@@ -0,0 +1,267 @@
+"""
+In-memory catalog snapshot - tv_platform_latest_master held by the API process
+
+1. The table is small ( one row per model and platform ), it is loaded once
+   into column tuples plus row-id indexes per brand, platform and model
+2. A snapshot is never changed after it is built, requests only read it
+3. The ETL writes a version stamp into table_versions whenever it updates the
+   table. CatalogStore polls the stamp every CATALOG_REFRESH_SECONDS and builds
+   a new snapshot when it changed. The swap is one attribute assignment, a
+   request sees either the old or the new snapshot, never a mix of both
+4. Without a stamp row count and newest last_seen stand in for the version.
+   scraped_at only moves when a price changes, last_seen on every scrape
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from search_index import SearchIndex
+
+TABLE = "tv_platform_latest_master"
+REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+COLUMNS = [
+    "platform", "model_id", "brand", "full_name", "display_type",
+    "sale_price", "original_cost", "discount", "rating", "stock_status",
+    "scraped_at", "last_seen", "product_url", "image_url",
+]
+
+# /products can be sorted by these, each has its sorted row order ( sorted_ids )
+PRODUCT_SORT_COLUMNS = ["sale_price", "original_cost", "discount", "rating", "scraped_at"]
+
+
+def _null_first(value):
+    # MySQL sorts NULL before every value in ascending order
+    return (value is not None, value)
+
+
+class CatalogSnapshot:
+    """Immutable column store of tv_platform_latest_master with lookup indexes"""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.loaded_at = datetime.now()
+        self.size = len(rows)
+        self.columns = {
+            name: tuple(values)
+            for name, values in zip(COLUMNS, zip(*rows) if rows else [()] * len(COLUMNS))
+        }
+
+        sale_price = self.columns["sale_price"]
+        original_cost = self.columns["original_cost"]
+        # rows the product endpoints show - a real sale price and MRP
+        self.priced = tuple(
+            i for i in range(self.size)
+            if (sale_price[i] or 0) > 0 and (original_cost[i] or 0) > 0
+        )
+
+        # lookups are case insensitive like the MySQL collation they replace
+        self.by_brand = self._index("brand")
+        self.by_platform = self._index("platform")
+        self.by_model = self._index("model_id")
+
+        # token index over model id, brand, name and display type ( search_index.py )
+        self.search_index = SearchIndex(self.columns, self.priced)
+
+        brands = self.columns["brand"]
+        counts = {}
+        for brand in brands:
+            if brand:
+                counts[brand] = counts.get(brand, 0) + 1
+        self.brand_counts = [
+            {"brand": brand, "count": count}
+            for brand, count in sorted(counts.items(), key=lambda item: -item[1])
+        ]
+
+        prices = [p for p in sale_price if p is not None and p > 0]
+        self.min_price = min(prices) if prices else None
+        self.max_price = max(prices) if prices else None
+
+        self.platforms = sorted({p for p in self.columns["platform"] if p is not None})
+
+        # sorted row ids per column, filled on first use ( see sorted_ids )
+        self._sorted = {}
+
+    def _index(self, column):
+        index = {}
+        for i, value in enumerate(self.columns[column]):
+            if value is not None:
+                index.setdefault(str(value).lower(), []).append(i)
+        return {key: tuple(ids) for key, ids in index.items()}
+
+    def row(self, i):
+        return {name: values[i] for name, values in self.columns.items()}
+
+    def rows(self, ids):
+        return [self.row(i) for i in ids]
+
+    def sort_key(self, column, i):
+        """( value, platform, model_id ) of row i - its position in sorted_ids( column )"""
+        return [self.columns[column][i], self.columns["platform"][i], self.columns["model_id"][i]]
+
+    def _order(self, key):
+        value, platform, model_id = key
+        return (_null_first(value), platform, model_id)
+
+    def sorted_ids(self, column):
+        """Priced row ids in ( column, platform, model_id ) order, NULLs first"""
+        ids = self._sorted.get(column)
+        if ids is None:
+            ids = tuple(sorted(self.priced, key=lambda i: self._order(self.sort_key(column, i))))
+            # two requests may build the same order at once, both results are equal
+            self._sorted[column] = ids
+        return ids
+
+    # ---------------- endpoint queries ----------------
+
+    def page_ids(self, column, descending, page_size, after=None, page=1):
+        """
+        One page of sorted_ids( column ), the page_size rows after the sort key
+        `after` ( a cursor ) or page number `page`. The cursor is found by
+        bisection, so it also works on a snapshot swapped in since it was made.
+        """
+        ids = self.sorted_ids(column)
+        if after is not None:
+            position = lambda i: self._order(self.sort_key(column, i))
+            if descending:
+                end = bisect_left(ids, self._order(after), key=position)
+            else:
+                start = bisect_right(ids, self._order(after), key=position)
+        elif descending:
+            end = len(ids) - (page - 1) * page_size
+        else:
+            start = (page - 1) * page_size
+
+        if descending:
+            return ids[max(end - page_size, 0):max(end, 0)][::-1]
+        return ids[start:start + page_size]
+
+    def filter(self, brand=None, min_price=None, max_price=None, display_type=None, in_stock_only=False):
+        if brand:
+            needle = brand.lower()
+            candidates = sorted(i for key, ids in self.by_brand.items() if needle in key for i in ids)
+            priced = set(self.priced)
+            ids = [i for i in candidates if i in priced]
+        else:
+            ids = self.priced
+
+        sale_price = self.columns["sale_price"]
+        if min_price is not None:
+            ids = [i for i in ids if sale_price[i] >= min_price]
+        if max_price is not None:
+            ids = [i for i in ids if sale_price[i] <= max_price]
+        if display_type:
+            display_types = self.columns["display_type"]
+            ids = [i for i in ids if display_types[i] == display_type]
+        if in_stock_only:
+            stock_status = self.columns["stock_status"]
+            ids = [i for i in ids if stock_status[i] == "in_stock"]
+        return self.rows(ids)
+
+    def compare(self, model_id):
+        priced = set(self.priced)
+        sale_price = self.columns["sale_price"]
+        ids = [i for i in self.by_model.get(model_id.lower(), ()) if i in priced]
+        return self.rows(sorted(ids, key=lambda i: sale_price[i]))
+
+    def search(self, q, limit=50):
+        return self.rows(self.search_index.search(q, limit))
+
+    def search_models(self, q):
+        """model_ids of every row matching q, for the deals search"""
+        model_ids = self.columns["model_id"]
+        return sorted({model_ids[i] for i in self.search_index.match(q)})
+
+    def platform_brands(self, platform):
+        brands = self.columns["brand"]
+        found = {brands[i] for i in self.by_platform.get(platform.lower(), ()) if brands[i] is not None}
+        return sorted(found, key=str.lower)
+
+    def platform_brand_models(self, platform, brand):
+        """Row ids of one brand on one platform with a price, cheapest first"""
+        brands = self.columns["brand"]
+        sale_price = self.columns["sale_price"]
+        brand = brand.lower()
+        ids = [
+            i for i in self.by_platform.get(platform.lower(), ())
+            if brands[i] is not None and brands[i].lower() == brand and (sale_price[i] or 0) > 0
+        ]
+        return sorted(ids, key=lambda i: sale_price[i])
+
+
+class CatalogStore:
+    """Holds the current snapshot and swaps in a new one when the ETL stamp changes"""
+
+    def __init__(self, engine, refresh_seconds=REFRESH_SECONDS):
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def read_version(self, conn):
+        try:
+            stamp = conn.execute(
+                text("SELECT version FROM table_versions WHERE table_name = :name"),
+                {"name": TABLE}
+            ).scalar()
+        except SQLAlchemyError:
+            conn.rollback()
+            stamp = None
+        if stamp is not None:
+            return str(stamp)
+
+        count, newest = conn.execute(text(f"SELECT COUNT(*), MAX(last_seen) FROM {TABLE}")).one()
+        return f"{count}:{newest}"
+
+    def refresh(self, force=False):
+        """Build a new snapshot if the version changed, True when one was swapped in"""
+        with self._lock:
+            start = time.perf_counter()
+            with self.engine.connect() as conn:
+                version = self.read_version(conn)
+                if not force and self.snapshot is not None and self.snapshot.version == version:
+                    return False
+                rows = conn.execute(
+                    text(f"SELECT {', '.join(COLUMNS)} FROM {TABLE} ORDER BY platform, model_id")
+                ).all()
+
+            self.snapshot = CatalogSnapshot(rows, version)
+            print(f"📦 Catalog snapshot {version}: {len(rows)} rows in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def get(self):
+        """The current snapshot, loaded on first use if startup could not load it"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            self.refresh()
+            snapshot = self.snapshot
+        return snapshot
+
+    def _poll(self):
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ Catalog refresh failed: {e}")
+
+    def start(self):
+        try:
+            self.refresh(force=True)
+        except Exception as e:
+            print(f"❌ Catalog snapshot not loaded: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
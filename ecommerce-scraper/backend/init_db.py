@@ -2,6 +2,8 @@
 Database Initialization Script
 """
 
+from sqlalchemy import inspect
+
 from db import engine, SessionLocal
 from models import Base, User, UserRole
 from auth.security import SecurityUtils
@@ -13,6 +15,19 @@ def create_tables():
     print("✅ Tables created")
 
 
+def create_missing_indexes():
+    """Create indexes added to a model after its table existed (create_all skips those tables)"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                print(f"✅ Index created: {index.name}")
+
+
 def create_admin(email="admin@offerzone.com", password="Admin@123"):
     """Create admin user"""
     db = SessionLocal()
@@ -62,6 +77,7 @@ def create_user(email="user@offerzone.com", password="User@123"):
 if __name__ == "__main__":
     print("\n🚀 Initializing Database...")
     create_tables()
+    create_missing_indexes()
     create_admin()
     create_user()
     print("\n✅ Done!\n")
\ No newline at end of file
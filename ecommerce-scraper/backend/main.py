@@ -2,14 +2,15 @@
 Main FastAPI Application - OfferZone TV Price Intelligence
 """
 
-from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi import FastAPI, Depends, Query, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, text
+from sqlalchemy import text, bindparam
 from typing import List, Optional
 from contextlib import asynccontextmanager
 from datetime import date, timedelta
+import json
 import os
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
@@ -59,14 +60,25 @@ from schemas import (
 from auth import auth_router, get_current_active_user, require_admin
 from wishlist import wishlist_router
 from alerts import alerts_router
+from catalog_snapshot import CatalogStore, PRODUCT_SORT_COLUMNS
+from pagination import encode_cursor, decode_cursor, keyset_sql, keyset_params
+from price_history import daily_prices, last_seen_date
+
+
+# Catalog read endpoints answer from this in-memory snapshot of tv_platform_latest_master
+catalog = CatalogStore(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan - create tables on startup"""
+    """Application lifespan - create tables and load the catalog on startup"""
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables ready")
+
+    catalog.start()
     yield
+
+    catalog.stop()
     print("👋 Shutting down")
 
 
@@ -96,6 +108,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # keyset pagination cursor of /products and /products/best-deals
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ======================================================
@@ -116,7 +130,12 @@ app.include_router(settings_router)
 # ======================================================
 @app.get("/")
 def health():
-    return {"status": "API running", "auth": "enabled"}
+    snapshot = catalog.snapshot
+    return {
+        "status": "API running",
+        "auth": "enabled",
+        "catalog_version": snapshot.version if snapshot else None,
+    }
 
 
 # ======================================================
@@ -125,29 +144,24 @@ def health():
 
 @app.get("/products", response_model=List[TVProductOut])
 def get_products(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    sort_by: str = Query("sale_price"),
-    order: str = Query("asc"),
-    db: Session = Depends(get_db)
+    sort_by: str = Query("sale_price", regex=f"^({'|'.join(PRODUCT_SORT_COLUMNS)})$"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = None,
 ):
-    query = db.query(TVPlatformLatest).filter(
-        TVPlatformLatest.sale_price > 0,
-        TVPlatformLatest.original_cost > 0
-    )
-
-    if hasattr(TVPlatformLatest, sort_by):
-        column = getattr(TVPlatformLatest, sort_by)
-        query = query.order_by(
-            column.desc() if order == "desc" else column.asc()
-        )
+    """
+    Products in ( sort_by, platform, model_id ) order. Pass the X-Next-Cursor
+    header of a page as `cursor` for the next one, `page` still works.
+    """
+    snapshot = catalog.get()
+    after = decode_cursor(cursor, (sort_by, order)) if cursor else None
+    ids = snapshot.page_ids(sort_by, order == "desc", page_size, after=after, page=page)
 
-    return (
-        query
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+    if len(ids) == page_size:
+        response.headers["X-Next-Cursor"] = encode_cursor((sort_by, order), snapshot.sort_key(sort_by, ids[-1]))
+    return snapshot.rows(ids)
 
 
 @app.get("/products/filter", response_model=List[TVProductOut])
@@ -157,39 +171,13 @@ def filter_products(
     max_price: Optional[float] = None,
     display_type: Optional[str] = None,
     in_stock_only: bool = False,
-    db: Session = Depends(get_db)
 ):
-    query = db.query(TVPlatformLatest).filter(
-        TVPlatformLatest.sale_price > 0,
-        TVPlatformLatest.original_cost > 0
-    )
-
-    if brand:
-        query = query.filter(TVPlatformLatest.brand.ilike(f"%{brand}%"))
-    if min_price is not None:
-        query = query.filter(TVPlatformLatest.sale_price >= min_price)
-    if max_price is not None:
-        query = query.filter(TVPlatformLatest.sale_price <= max_price)
-    if display_type:
-        query = query.filter(TVPlatformLatest.display_type == display_type)
-    if in_stock_only:
-        query = query.filter(TVPlatformLatest.stock_status == "in_stock")
-
-    return query.all()
+    return catalog.get().filter(brand, min_price, max_price, display_type, in_stock_only)
 
 
 @app.get("/products/compare", response_model=List[TVProductOut])
-def compare_products(model_id: str, db: Session = Depends(get_db)):
-    results = (
-        db.query(TVPlatformLatest)
-        .filter(
-            TVPlatformLatest.model_id == model_id,
-            TVPlatformLatest.sale_price > 0,
-            TVPlatformLatest.original_cost > 0
-        )
-        .order_by(TVPlatformLatest.sale_price.asc())
-        .all()
-    )
+def compare_products(model_id: str):
+    results = catalog.get().compare(model_id)
 
     if not results:
         raise HTTPException(status_code=404, detail="No valid priced products found")
@@ -198,29 +186,24 @@ def compare_products(model_id: str, db: Session = Depends(get_db)):
 
 
 @app.get("/products/search", response_model=List[TVProductOut])
-def search_products(q: str = Query(..., min_length=1), db: Session = Depends(get_db)):
-    keyword = f"%{q.strip().lower()}%"
-
-    return (
-        db.query(TVPlatformLatest)
-        .filter(
-            TVPlatformLatest.sale_price > 0,
-            TVPlatformLatest.original_cost > 0,
-            or_(
-                func.lower(TVPlatformLatest.brand).like(keyword),
-                func.lower(TVPlatformLatest.full_name).like(keyword),
-                func.lower(TVPlatformLatest.display_type).like(keyword),
-                func.lower(TVPlatformLatest.model_id).like(keyword),
-            )
-        )
-        .order_by(TVPlatformLatest.sale_price.asc())
-        .limit(50)
-        .all()
-    )
+def search_products(q: str = Query(..., min_length=1)):
+    return catalog.get().search(q, limit=50)
+
+
+# Sort keys of the deals grid -> indexed columns of model_deal_summary
+# (discount_sort / rating_sort are max_discount / avg_rating with NULL as 0)
+DEAL_SORT_COLUMNS = {
+    "savings": "price_difference",
+    "price": "min_price",
+    "discount": "discount_sort",
+    "rating": "rating_sort",
+}
+SORT_ONLY_COLUMNS = {"discount_sort", "rating_sort"}
 
 
 @app.get("/products/best-deals")
 def get_best_deals(
+    response: Response,
     search: Optional[str] = None,
     brands: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -231,85 +214,89 @@ def get_best_deals(
     order: str = Query("desc", regex="^(asc|desc)$"),
     page: int = Query(1, ge=1),
     page_size: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    """
+    Deals from model_deal_summary ( refreshed by the ETL after tv_price_master ).
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one as an
+    index range scan, `page` still works for jumping to a page number.
+    """
+    sort_column = DEAL_SORT_COLUMNS[sort_by]
+    direction = "DESC" if order == "desc" else "ASC"
+
+    conditions = []
+    params = {"limit": page_size}
+
+    brand_list = [b.strip() for b in brands.split(",") if b.strip()] if brands else []
+    if brand_list:
+        conditions.append("brand IN :brands")
+        params["brands"] = brand_list
+    if min_price is not None:
+        conditions.append("min_price >= :min_price")
+        params["min_price"] = min_price
+    if max_price is not None:
+        conditions.append("min_price <= :max_price")
+        params["max_price"] = max_price
+    if min_discount is not None:
+        conditions.append("max_discount >= :min_discount")
+        params["min_discount"] = min_discount
+    if min_rating is not None:
+        conditions.append("avg_rating >= :min_rating")
+        params["min_rating"] = min_rating
+    if search:
+        # the catalog's search index picks the models, the summary table only filters by them
+        search_models = catalog.get().search_models(search)
+        if not search_models:
+            return []
+        conditions.append("model_id IN :search_models")
+        params["search_models"] = search_models
+
+    if cursor:
+        # keyset - continue right after the last row of the previous page
+        params.update(keyset_params(decode_cursor(cursor, (sort_by, order))))
+        conditions.append(keyset_sql([sort_column, "model_id"], order == "desc"))
+        paging = "LIMIT :limit"
+    else:
+        params["offset"] = (page - 1) * page_size
+        paging = "LIMIT :limit OFFSET :offset"
+
+    query = text(f"""
+        SELECT
+            model_id, full_name, brand, display_type, image_url,
+            platform_count, min_price, max_price, avg_price,
+            price_difference, original_cost, max_discount, avg_rating,
+            platforms, platform_prices, stock_status, savings_percent,
+            discount_sort, rating_sort
+        FROM model_deal_summary
+        WHERE {" AND ".join(conditions) or "1=1"}
+        ORDER BY {sort_column} {direction}, model_id {direction}
+        {paging}
+    """)
+    if brand_list:
+        query = query.bindparams(bindparam("brands", expanding=True))
+    if search:
+        query = query.bindparams(bindparam("search_models", expanding=True))
+
     try:
-        query = text("""
-            WITH price_stats AS (
-                SELECT 
-                    model_id,
-                    MIN(full_name) as full_name,
-                    MIN(brand) as brand,
-                    MIN(display_type) as display_type,
-                    MIN(image_url) as image_url,
-                    COUNT(DISTINCT platform) as platform_count,
-                    MIN(sale_price) as min_price,
-                    MAX(sale_price) as max_price,
-                    AVG(sale_price) as avg_price,
-                    MAX(sale_price) - MIN(sale_price) as price_difference,
-                    MAX(original_cost) as original_cost,
-                    MAX(discount) as max_discount,
-                    AVG(rating) as avg_rating,
-                    GROUP_CONCAT(DISTINCT platform) as platforms,
-                    GROUP_CONCAT(DISTINCT CONCAT(platform, ':', sale_price)) as platform_prices,
-                    MIN(stock_status) as stock_status
-                FROM tv_platform_latest_master
-                WHERE sale_price > 0 AND original_cost > 0
-                GROUP BY model_id
-                HAVING COUNT(DISTINCT platform) >= 1
-            )
-            SELECT 
-                model_id, full_name, brand, display_type, image_url,
-                platform_count, min_price, max_price, avg_price,
-                price_difference, original_cost, max_discount, avg_rating,
-                platforms, platform_prices, stock_status,
-                ROUND((price_difference / max_price) * 100, 1) as savings_percent
-            FROM price_stats
-            WHERE 1=1
-            {brand_filter}
-            {price_filter}
-            {discount_filter}
-            {rating_filter}
-            {search_filter}
-            ORDER BY {sort_column} {sort_order}
-            LIMIT :limit OFFSET :offset
-        """.format(
-            brand_filter="AND brand IN ({})".format(
-                ",".join([f"'{b.strip()}'" for b in brands.split(",")])
-            ) if brands else "",
-            price_filter=f"AND min_price >= {min_price}" if min_price else "" +
-                        f" AND min_price <= {max_price}" if max_price else "",
-            discount_filter=f"AND max_discount >= {min_discount}" if min_discount else "",
-            rating_filter=f"AND avg_rating >= {min_rating}" if min_rating else "",
-            search_filter=f"AND (LOWER(full_name) LIKE '%{search.lower()}%' OR LOWER(brand) LIKE '%{search.lower()}%' OR LOWER(model_id) LIKE '%{search.lower()}%')" if search else "",
-            sort_column={
-                "savings": "price_difference",
-                "price": "min_price",
-                "discount": "max_discount",
-                "rating": "avg_rating"
-            }.get(sort_by, "price_difference"),
-            sort_order=order.upper()
-        ))
-
-        result = db.execute(query, {"limit": page_size, "offset": (page - 1) * page_size})
+        result = db.execute(query, params)
 
         deals = []
         for row in result:
             row_dict = dict(row._mapping)
-            platform_prices = {}
-            if row_dict.get("platform_prices"):
-                for pp in row_dict["platform_prices"].split(","):
-                    if ":" in pp:
-                        platform, price = pp.split(":")
-                        platform_prices[platform] = float(price)
-            row_dict["platform_prices"] = platform_prices
-            row_dict["platforms"] = row_dict.get("platforms", "").split(",") if row_dict.get("platforms") else []
+            row_dict["platform_prices"] = json.loads(row_dict["platform_prices"]) if row_dict.get("platform_prices") else {}
+            row_dict["platforms"] = row_dict["platforms"].split(",") if row_dict.get("platforms") else []
             deals.append(row_dict)
-
-        return deals
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    if len(deals) == page_size:
+        last = deals[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor((sort_by, order), (last[sort_column], last["model_id"]))
+
+    # the sort copies only feed the cursor, max_discount / avg_rating stay null when unknown
+    return [{k: v for k, v in deal.items() if k not in SORT_ONLY_COLUMNS} for deal in deals]
+
 
 # ======================================================
 # ANALYTICS ENDPOINTS
@@ -462,30 +449,18 @@ def get_best_statistics(db: Session = Depends(get_db)):
 # ======================================================
 
 @app.get("/platforms/list", response_model=List[str])
-def get_platforms(db: Session = Depends(get_db)):
-    platforms = (
-        db.query(TVPlatformLatest.platform)
-        .distinct()
-        .order_by(TVPlatformLatest.platform)
-        .all()
-    )
-    return [p[0] for p in platforms]
+def get_platforms():
+    return catalog.get().platforms
 
 
 @app.get("/platforms/{platform}/brands", response_model=List[str])
-def get_brands_by_platform(platform: str, db: Session = Depends(get_db)):
-    brands = (
-        db.query(TVPlatformLatest.brand)
-        .filter(TVPlatformLatest.platform == platform)
-        .distinct()
-        .order_by(TVPlatformLatest.brand)
-        .all()
-    )
+def get_brands_by_platform(platform: str):
+    brands = catalog.get().platform_brands(platform)
 
     if not brands:
         raise HTTPException(status_code=404, detail="Platform not found or no brands")
 
-    return [b[0] for b in brands]
+    return brands
 
 
 @app.get("/platforms/{platform}/brands/{brand}/models", response_model=List[TVProductOut])
@@ -494,28 +469,15 @@ def get_models_by_platform_brand(
     brand: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=50),
-    db: Session = Depends(get_db)
 ):
-    base_query = (
-        db.query(TVPlatformLatest)
-        .filter(
-            TVPlatformLatest.platform == platform,
-            TVPlatformLatest.brand == brand,
-            TVPlatformLatest.sale_price > 0
-        )
-    )
+    snapshot = catalog.get()
+    ids = snapshot.platform_brand_models(platform, brand)
 
-    total = base_query.count()
-    if total == 0:
+    if not ids:
         raise HTTPException(status_code=404, detail="No models found")
 
-    return (
-        base_query
-        .order_by(TVPlatformLatest.sale_price.asc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+    start = (page - 1) * page_size
+    return snapshot.rows(ids[start:start + page_size])
 
 
 # ======================================================
@@ -523,26 +485,14 @@ def get_models_by_platform_brand(
 # ======================================================
 
 @app.get("/filters/brands")
-def get_all_brands(db: Session = Depends(get_db)):
-    result = db.execute(text("""
-        SELECT DISTINCT brand, COUNT(*) as count
-        FROM tv_platform_latest_master
-        WHERE brand IS NOT NULL AND brand != ''
-        GROUP BY brand
-        ORDER BY count DESC
-    """))
-    return [{"brand": row.brand, "count": row.count} for row in result]
+def get_all_brands():
+    return catalog.get().brand_counts
 
 
 @app.get("/filters/price-range")
-def get_price_range(db: Session = Depends(get_db)):
-    result = db.execute(text("""
-        SELECT MIN(sale_price) as min_price, MAX(sale_price) as max_price
-        FROM tv_platform_latest_master
-        WHERE sale_price > 0
-    """))
-    row = result.fetchone()
-    return {"min_price": row.min_price or 0, "max_price": row.max_price or 500000}
+def get_price_range():
+    snapshot = catalog.get()
+    return {"min_price": snapshot.min_price or 0, "max_price": snapshot.max_price or 500000}
 
 
 # ======================================================
@@ -568,29 +518,10 @@ def get_price_history_chart(
         end_date = date.today()
         start_date = end_date - timedelta(days=days)
 
-        result = db.execute(text("""
-            SELECT 
-                platform,
-                DATE(scraped_at) as price_date,
-                MIN(sale_price) as min_price,
-                MIN(full_name) as full_name,
-                MIN(brand) as brand
-            FROM tv_platform_latest_master
-            WHERE model_id = :model_id
-                AND sale_price > 0
-                AND DATE(scraped_at) >= :start_date
-                AND DATE(scraped_at) <= :end_date
-            GROUP BY platform, DATE(scraped_at)
-            ORDER BY price_date
-        """), {
-            "model_id": model_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-
-        rows = result.fetchall()
+        # prices carried forward between changes, see price_history.py
+        data = daily_prices(db, model_id, start_date, end_date)
 
-        if not rows:
+        if not data:
             empty_chart = create_empty_chart(f"No price history for last {days} days")
             return {
                 "model_id": model_id,
@@ -603,7 +534,6 @@ def get_price_history_chart(
                 }
             }
 
-        data = [dict(row._mapping) for row in rows]
         product_name = data[0].get('full_name', model_id)
 
         return {
@@ -639,26 +569,8 @@ def get_best_price_chart(
         end_date = date.today()
         start_date = end_date - timedelta(days=days)
 
-        result = db.execute(text("""
-            SELECT 
-                platform,
-                DATE(scraped_at) as price_date,
-                MIN(sale_price) as min_price,
-                MIN(full_name) as full_name
-            FROM tv_platform_latest_master
-            WHERE model_id = :model_id
-                AND sale_price > 0
-                AND DATE(scraped_at) >= :start_date
-                AND DATE(scraped_at) <= :end_date
-            GROUP BY platform, DATE(scraped_at)
-            ORDER BY price_date, min_price
-        """), {
-            "model_id": model_id,
-            "start_date": start_date,
-            "end_date": end_date
-        })
-
-        rows = result.fetchall()
+        # every platform's price carried forward between changes, see price_history.py
+        rows = daily_prices(db, model_id, start_date, end_date)
         print(f"[DEBUG] Best price - Found {len(rows)} rows for model_id: {model_id}")
 
         if not rows:
@@ -674,12 +586,12 @@ def get_best_price_chart(
         product_name = None
 
         for row in rows:
-            price_date = row.price_date
+            price_date = row["price_date"]
             if price_date not in date_prices:
                 date_prices[price_date] = {}
-            date_prices[price_date][row.platform] = float(row.min_price)
+            date_prices[price_date][row["platform"]] = row["min_price"]
             if not product_name:
-                product_name = row.full_name
+                product_name = row["full_name"]
 
         best_price_data = []
         for price_date in sorted(date_prices.keys()):
@@ -895,16 +807,11 @@ def get_price_history_data(
 ):
     """Return price history data from tvs_unified table"""
     try:
-        # First, get the date range from the actual data (not today's date)
-        date_range_result = db.execute(text("""
-            SELECT 
-                MIN(DATE(scraped_at)) as min_date,
-                MAX(DATE(scraped_at)) as max_date
-            FROM tvs_unified
-            WHERE model_id = :model_id AND sale_price > 0
-        """), {"model_id": model_id}).fetchone()
+        # First, get the date range from the actual data (not today's date) -
+        # the last scrape that still listed the model, its price may be older
+        last_seen = last_seen_date(db, model_id)
         
-        if not date_range_result or not date_range_result.max_date:
+        if not last_seen:
             # No data found
             product_info = db.execute(text("""
                 SELECT full_name, brand, image_url 
@@ -927,32 +834,11 @@ def get_price_history_data(
             }
         
         # Use the latest date in database as end_date
-        end_date = date_range_result.max_date
+        end_date = last_seen
         start_date = end_date - timedelta(days=days)
         
-        # Query all price history data
-        result = db.execute(text("""
-            SELECT 
-                platform,
-                DATE(scraped_at) as price_date,
-                MIN(sale_price) as price,
-                MIN(full_name) as full_name,
-                MIN(brand) as brand,
-                MIN(image_url) as image_url
-            FROM tvs_unified
-            WHERE model_id = :model_id
-                AND sale_price > 0
-                AND DATE(scraped_at) >= :start_date
-                AND DATE(scraped_at) <= :end_date
-            GROUP BY platform, DATE(scraped_at)
-            ORDER BY price_date ASC
-        """), {
-            "model_id": model_id, 
-            "start_date": start_date,
-            "end_date": end_date
-        })
-        
-        rows = result.fetchall()
+        # Daily prices of every platform, carried forward between changes
+        rows = daily_prices(db, model_id, start_date, end_date)
         
         if not rows:
             return {
@@ -975,13 +861,13 @@ def get_price_history_data(
         
         for row in rows:
             if not product_name:
-                product_name = row.full_name
-                brand = row.brand
-                image_url = row.image_url
+                product_name = row["full_name"]
+                brand = row["brand"]
+                image_url = row["image_url"]
             
-            platform = row.platform
-            price = float(row.price)
-            date_str = str(row.price_date)
+            platform = row["platform"]
+            price = row["min_price"]
+            date_str = str(row["price_date"])
             all_prices.append({"price": price, "date": date_str, "platform": platform})
             
             if platform not in platforms_data:
@@ -72,6 +72,12 @@ class User(Base):
         cascade="all, delete-orphan"
     )
 
+    # Indexes
+    __table_args__ = (
+        # admin user list - newest first, keyset paginated
+        Index('idx_users_created', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email}, role={self.role}, verified={self.is_verified})>"
 
@@ -176,13 +182,24 @@ class TVPlatformLatest(Base):
     product_url = Column(String(500))
     rating = Column(Float)
     image_url = Column("image_url", String(500))
+    # scraped_at is the last price change, last_seen the last scrape that listed it
+    last_seen = Column(DateTime)
+
+    # Created by the ETL (Scrapers/etl/schema.py), kept in step with it
+    __table_args__ = (
+        Index('idx_tv_platform_latest_master_model_scraped', 'model_id', 'scraped_at'),
+        Index('idx_tv_platform_latest_master_brand', 'brand'),
+        Index('idx_tv_platform_latest_master_sale_price', 'sale_price'),
+        Index('idx_tv_platform_latest_master_scraped', 'scraped_at'),
+        Index('idx_tv_platform_latest_master_last_seen', 'last_seen'),
+    )
 
 
 class TVProductMaster(Base):
     __tablename__ = "tv_product_master"
 
     model_id = Column(String(100), primary_key=True)
-    brand = Column(String(100))
+    brand = Column(String(100), primary_key=True)
     full_name = Column(String(255))
     display_type = Column(String(50))
 
@@ -0,0 +1,76 @@
+"""
+Keyset pagination for the list endpoints
+
+1. A page is "the next page_size rows after the last row already shown" in
+   ( sort column, primary key ) order. The database seeks to that row through
+   a composite index on the same columns, so page 500 costs the same as page 1.
+   OFFSET had to walk and throw away every earlier row
+2. The position travels as an opaque cursor - urlsafe base64 of JSON with the
+   sort it belongs to and the key of the last row. A cursor is only accepted
+   for the sort it was made for
+3. The endpoints keep `page` for old clients, a `cursor` takes precedence
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(sort, key):
+    """Cursor after the row with `key` ( sort column value, primary key ... ) under `sort`"""
+    raw = json.dumps({"sort": list(sort), "key": [_dump(v) for v in key]})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    """The key a cursor points after, 400 if it is garbage or made for another sort"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_sort, key = data["sort"], data["key"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != list(sort):
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different sort order")
+    return [_load(v) for v in key]
+
+
+def keyset_filter(columns, key, descending=False):
+    """
+    ( c1, c2, ... ) after key as SQLAlchemy expressions, written out as
+    c1 > k1 OR ( c1 = k1 AND c2 > k2 ) ... so MySQL can use the composite index
+    """
+    conditions = []
+    for n, column in enumerate(columns):
+        step = column < key[n] if descending else column > key[n]
+        conditions.append(and_(*[c == k for c, k in zip(columns[:n], key[:n])], step))
+    return or_(*conditions)
+
+
+def keyset_sql(columns, descending=False, prefix="after"):
+    """keyset_filter() for text() queries, the key is bound as :after_0, :after_1 ..."""
+    op = "<" if descending else ">"
+    conditions = []
+    for n, column in enumerate(columns):
+        parts = [f"{c} = :{prefix}_{i}" for i, c in enumerate(columns[:n])]
+        parts.append(f"{column} {op} :{prefix}_{n}")
+        conditions.append("(" + " AND ".join(parts) + ")")
+    return "(" + " OR ".join(conditions) + ")"
+
+
+def keyset_params(key, prefix="after"):
+    return {f"{prefix}_{n}": value for n, value in enumerate(key)}
@@ -0,0 +1,125 @@
+"""
+Daily price series for the chart endpoints
+
+1. tvs_unified only gets a row when a product's price changes - the ETL drops
+   snapshots that repeat the previous one ( Scrapers/etl/change_detection.py ).
+   A day without a row means "same price as before", not "not listed"
+2. Every product is seeded with its newest row before the window and its
+   price is carried forward day by day, up to the last scrape that still
+   listed it ( product_content_hash.last_seen, the ETL's heartbeat ). A
+   price of 0 ( unavailable ) stops the carry until the next real price
+3. A platform's price of a day is the lowest of its products that day, so
+   the cross-platform best price compares every platform that had a price
+   that day, not only the ones whose price changed
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+# the product's own heartbeat, the newest of its rows when there is none
+# ( ETL_CHANGED_ONLY=0 stores every snapshot and keeps no heartbeat )
+_SNAPSHOT_COLUMNS = """
+    u.platform, u.product_id, u.scraped_at, u.sale_price,
+    u.full_name, u.brand, u.image_url, h.last_seen
+"""
+_HEARTBEAT_JOIN = """
+    LEFT JOIN product_content_hash h
+        ON h.platform = u.platform AND h.product_id = u.product_id
+"""
+
+
+def _as_date(value):
+    # SQLite hands DATE() and DATETIME columns back as text
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def last_seen_date(db, model_id):
+    """Last day any platform still listed the model, None if it was never scraped"""
+    row = db.execute(text("""
+        SELECT MAX(COALESCE(last_seen, scraped_at)) AS seen
+        FROM tv_platform_latest_master
+        WHERE model_id = :model_id
+    """), {"model_id": model_id}).fetchone()
+    return _as_date(row.seen) if row else None
+
+
+def daily_prices(db, model_id, start_date, end_date):
+    """
+    One row per platform and day between start_date and end_date ( inclusive )
+    on which the model had a price there, in date order:
+    { platform, price_date, min_price, full_name, brand, image_url }
+    """
+    params = {"model_id": model_id, "start_date": start_date, "end_date": end_date}
+
+    window = db.execute(text(f"""
+        SELECT {_SNAPSHOT_COLUMNS}
+        FROM tvs_unified u
+        {_HEARTBEAT_JOIN}
+        WHERE u.model_id = :model_id
+            AND DATE(u.scraped_at) >= :start_date
+            AND DATE(u.scraped_at) <= :end_date
+    """), params).fetchall()
+
+    # the price every product had when the window opens
+    seeds = db.execute(text(f"""
+        SELECT {_SNAPSHOT_COLUMNS}
+        FROM tvs_unified u
+        JOIN (
+            SELECT platform, product_id, MAX(scraped_at) AS scraped_at
+            FROM tvs_unified
+            WHERE model_id = :model_id AND DATE(scraped_at) < :start_date
+            GROUP BY platform, product_id
+        ) newest
+            ON newest.platform = u.platform
+            AND newest.product_id = u.product_id
+            AND newest.scraped_at = u.scraped_at
+        {_HEARTBEAT_JOIN}
+        WHERE u.model_id = :model_id
+    """), params).fetchall()
+
+    products = {}
+    for row in sorted([*seeds, *window], key=lambda r: str(r.scraped_at)):
+        products.setdefault((row.platform, row.product_id), []).append(row)
+
+    prices = {}      # ( platform, day ) -> lowest price
+    names = {}       # platform -> newest row, for the names
+    for (platform, _), snapshots in products.items():
+        newest = snapshots[-1]
+        names[platform] = newest
+        seen = max(_as_date(newest.scraped_at), _as_date(newest.last_seen) or date.min)
+
+        price = None
+        i = 0
+        day = start_date
+        while day <= min(end_date, seen):
+            changes = []
+            while i < len(snapshots) and _as_date(snapshots[i].scraped_at) <= day:
+                value = snapshots[i].sale_price
+                price = float(value) if value and value > 0 else None
+                if price is not None and _as_date(snapshots[i].scraped_at) == day:
+                    changes.append(price)
+                i += 1
+            today = min(changes) if changes else price
+            if today is not None:
+                key = (platform, day)
+                prices[key] = min(prices.get(key, today), today)
+            day += timedelta(days=1)
+
+    return [
+        {
+            "platform": platform,
+            "price_date": day,
+            "min_price": price,
+            "full_name": names[platform].full_name,
+            "brand": names[platform].brand,
+            "image_url": names[platform].image_url,
+        }
+        for (platform, day), price in sorted(prices.items(), key=lambda item: (item[0][1], item[0][0]))
+    ]
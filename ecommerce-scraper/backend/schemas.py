@@ -17,7 +17,10 @@ class TVProductOut(BaseModel):
     discount: Optional[float] = None
     rating: Optional[float] = None
     stock_status: str
+    # when the price last changed - the ETL only stores changed snapshots
     scraped_at: Optional[datetime] = None
+    # when a scrape last listed the product ( at the price above )
+    last_seen: Optional[datetime] = None
     image_url: Optional[str] = None
 
     model_config = ConfigDict(
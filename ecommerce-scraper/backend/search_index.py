@@ -0,0 +1,172 @@
+"""
+Inverted index for /products/search
+
+1. Every row's model_id, brand, full_name and display_type are split into
+   lowercase word tokens. The postings of all tokens live in two flat numpy
+   arrays ( rows and field weights, model_id > brand > name, display type ),
+   token i owns the slice offsets[i]:offsets[i + 1]
+2. A trigram index over the token vocabulary finds the tokens a query term
+   is part of, so "7500" still finds "55uq7500psf" like the old LIKE did
+3. A query term matches a token exactly, as a prefix or as a substring,
+   only a term that matches nothing falls back to fuzzy matching
+   ( "samsng" -> "samsung" )
+4. Every query term has to match a row, the row's score is the sum of the
+   best match of every term times its field weight. Ties go to the cheaper row
+
+Built together with every catalog snapshot ( catalog_snapshot.py ), so it is
+as fresh as the snapshot and never changes while requests read it.
+"""
+
+import difflib
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# column -> weight of a match in it
+FIELDS = {"model_id": 3.0, "brand": 2.0, "full_name": 1.0, "display_type": 1.0}
+
+EXACT = 1.0
+PREFIX = 0.75
+SUBSTRING = 0.5
+FUZZY = 0.4
+FUZZY_CUTOFF = 0.8
+FUZZY_CANDIDATES = 5
+
+NO_TOKENS = np.empty(0, dtype=np.int64)
+
+
+def tokenize(value):
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+
+    def __init__(self, columns, rows):
+        """columns - the snapshot's column tuples, rows - the priced row ids to index"""
+        self.row_ids = np.asarray(rows, dtype=np.int64)
+
+        token_ids = {}
+        entries_token, entries_row, entries_weight = [], [], []
+        for field, weight in FIELDS.items():
+            values = columns[field]
+            for position, i in enumerate(self.row_ids.tolist()):
+                for token in tokenize(values[i]):
+                    entries_token.append(token_ids.setdefault(token, len(token_ids)))
+                    entries_row.append(position)
+                    entries_weight.append(weight)
+
+        # vocabulary in sorted order, so a prefix is one contiguous range
+        self.vocabulary = sorted(token_ids)
+        rank = np.empty(len(token_ids), dtype=np.int64)
+        rank[[token_ids[t] for t in self.vocabulary]] = np.arange(len(self.vocabulary))
+        self.token_index = {token: i for i, token in enumerate(self.vocabulary)}
+
+        token = rank[np.asarray(entries_token, dtype=np.int64)]
+        row = np.asarray(entries_row, dtype=np.int64)
+        weight = np.asarray(entries_weight, dtype=np.float32)
+
+        # one posting per ( token, row ), keeping the best field weight
+        order = np.lexsort((-weight, row, token))
+        token, row, weight = token[order], row[order], weight[order]
+        first = np.ones(len(token), dtype=bool)
+        first[1:] = (token[1:] != token[:-1]) | (row[1:] != row[:-1])
+        token, self.postings_row, self.postings_weight = token[first], row[first], weight[first]
+        self.offsets = np.searchsorted(token, np.arange(len(self.vocabulary) + 1))
+
+        self.vocabulary_array = np.array(self.vocabulary, dtype=str)
+        trigram_tokens = {}
+        for i, t in enumerate(self.vocabulary):
+            for gram in trigrams(t):
+                trigram_tokens.setdefault(gram, []).append(i)
+        self.trigram_tokens = {gram: np.array(ids, dtype=np.int64) for gram, ids in trigram_tokens.items()}
+
+        self.sale_price = np.asarray([columns["sale_price"][i] for i in self.row_ids.tolist()], dtype=np.float64)
+
+    def expand(self, term):
+        """( vocabulary positions, match scores ) of the tokens a query term matches"""
+        # tokens are [a-z0-9]+, "{" sorts after all of them
+        start = bisect_left(self.vocabulary, term)
+        end = bisect_left(self.vocabulary, term + "{", start)
+        tokens = [np.arange(start, end)]
+        scores = [np.full(end - start, PREFIX, dtype=np.float32)]
+        if start < end and self.vocabulary[start] == term:
+            scores[0][0] = EXACT
+
+        grams = trigrams(term)
+        if grams:
+            # tokens holding the rarest trigram of the term, checked for the real substring
+            rarest = min(grams, key=lambda g: len(self.trigram_tokens.get(g, ())))
+            candidates = self.trigram_tokens.get(rarest, NO_TOKENS)
+            candidates = candidates[(candidates < start) | (candidates >= end)]
+            candidates = candidates[np.char.find(self.vocabulary_array[candidates], term) >= 0]
+            tokens.append(candidates)
+            scores.append(np.full(len(candidates), SUBSTRING, dtype=np.float32))
+
+        tokens, scores = np.concatenate(tokens), np.concatenate(scores)
+        if not len(tokens) and len(term) >= 4:
+            candidates = {self.vocabulary[i] for gram in grams for i in self.trigram_tokens.get(gram, NO_TOKENS).tolist()}
+            close = difflib.get_close_matches(term, candidates, FUZZY_CANDIDATES, FUZZY_CUTOFF)
+            tokens = np.array([self.token_index[token] for token in close], dtype=np.int64)
+            scores = np.array(
+                [FUZZY * difflib.SequenceMatcher(None, term, token).ratio() for token in close],
+                dtype=np.float32
+            )
+        return tokens, scores
+
+    def _term_scores(self, tokens, match_scores):
+        """Score of every indexed row for one term ( 0 - no match ), its best token counts"""
+        starts, ends = self.offsets[tokens], self.offsets[tokens + 1]
+        lengths = ends - starts
+
+        # gather the posting slices of all matched tokens in one go
+        slice_of = np.repeat(np.arange(len(tokens)), lengths)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        entries = np.repeat(starts, lengths) + within
+
+        best = np.zeros(len(self.row_ids), dtype=np.float32)
+        np.maximum.at(best, self.postings_row[entries], self.postings_weight[entries] * match_scores[slice_of])
+        return best
+
+    def _match(self, q):
+        """( positions, scores ) of the indexed rows matching every term of q"""
+        terms = list(dict.fromkeys(tokenize(q)))
+        if not terms:
+            return NO_TOKENS, np.empty(0, dtype=np.float32)
+
+        total = np.zeros(len(self.row_ids), dtype=np.float32)
+        matched = np.ones(len(self.row_ids), dtype=bool)
+        for term in terms:
+            best = self._term_scores(*self.expand(term))
+            total += best
+            matched &= best > 0
+        positions = np.flatnonzero(matched)
+        return positions, total[positions]
+
+    def match(self, q):
+        """Row id -> relevance of every row matching all terms of q"""
+        positions, total = self._match(q)
+        return dict(zip(self.row_ids[positions].tolist(), total.tolist()))
+
+    def search(self, q, limit=50):
+        """Row ids of the best matches, most relevant and then cheapest first"""
+        positions, total = self._match(q)
+        if len(positions) > limit:
+            # rows above the limit-th best score make the page, the cheapest
+            # rows tied with it fill it up
+            cutoff = np.partition(total, len(total) - limit)[len(total) - limit]
+            above = np.flatnonzero(total > cutoff)
+            tied = np.flatnonzero(total == cutoff)
+            need = limit - len(above)
+            if len(tied) > need:
+                tied = tied[np.argpartition(self.sale_price[positions[tied]], need - 1)[:need]]
+            keep = np.concatenate([above, tied])
+            positions, total = positions[keep], total[keep]
+        order = np.lexsort((positions, self.sale_price[positions], -total))[:limit]
+        return self.row_ids[positions[order]].tolist()